@@ -0,0 +1,43 @@
+"""add token_revocations
+
+Revision ID: 064c84907b5d
+Revises: c51e9ae92748
+Create Date: 2026-10-18 10:05:37.281954
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '064c84907b5d'
+down_revision: Union[str, Sequence[str], None] = 'c51e9ae92748'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _table_exists(name: str) -> bool:
+    # main.py 啟動時的 create_all 可能已經建好這張表；產生 SQL（--sql）時無法檢查
+    if op.get_context().as_sql:
+        return False
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if _table_exists('token_revocations'):
+        return
+    # 登出 / 停權紀錄：revoked_at（Unix 秒）之前發出的 token 一律失效
+    op.create_table('token_revocations',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('revoked_at', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('token_revocations')
@@ -0,0 +1,49 @@
+"""add composite indexes for booking / availability queries
+
+Revision ID: 7c2e9b1d4a63
+Revises: 41ad048c7f39
+Create Date: 2026-10-17 10:12:08.214530
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c2e9b1d4a63'
+down_revision: Union[str, Sequence[str], None] = '41ad048c7f39'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 同場地衝突檢查 / 當日已預約時段：venue_id + 時間範圍 (+ status)
+    # PostgreSQL 上做成 partial index，已取消的預約不進索引
+    op.create_index(
+        'ix_bookings_venue_start_end_status',
+        'bookings',
+        ['venue_id', 'start_time', 'end_time', 'status'],
+        postgresql_where=sa.text("status != 'cancelled'"),
+    )
+    # 同 user 跨場地衝突檢查 / 我的預約
+    op.create_index(
+        'ix_bookings_user_start_end',
+        'bookings',
+        ['user_id', 'start_time', 'end_time'],
+    )
+    # 可預約時段查詢
+    op.create_index(
+        'ix_available_slots_venue_start_end',
+        'available_slots',
+        ['venue_id', 'start_time', 'end_time'],
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_available_slots_venue_start_end', table_name='available_slots')
+    op.drop_index('ix_bookings_user_start_end', table_name='bookings')
+    op.drop_index('ix_bookings_venue_start_end_status', table_name='bookings')
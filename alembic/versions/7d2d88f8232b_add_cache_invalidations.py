@@ -0,0 +1,48 @@
+"""add cache_invalidations
+
+Revision ID: 7d2d88f8232b
+Revises: ce35c1a3a210
+Create Date: 2026-10-18 09:31:05.402716
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d2d88f8232b'
+down_revision: Union[str, Sequence[str], None] = 'ce35c1a3a210'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _table_exists(name: str) -> bool:
+    # main.py 啟動時的 create_all 可能已經建好這張表；產生 SQL（--sql）時無法檢查
+    if op.get_context().as_sql:
+        return False
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if _table_exists('cache_invalidations'):
+        return
+    # 可預約時段快取的失效紀錄：其他 uvicorn worker 依 created_at 輪詢後清掉自己的快取
+    op.create_table('cache_invalidations',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('venue_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_cache_invalidations_id'), 'cache_invalidations', ['id'], unique=False)
+    op.create_index(op.f('ix_cache_invalidations_created_at'), 'cache_invalidations', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_cache_invalidations_created_at'), table_name='cache_invalidations')
+    op.drop_index(op.f('ix_cache_invalidations_id'), table_name='cache_invalidations')
+    op.drop_table('cache_invalidations')
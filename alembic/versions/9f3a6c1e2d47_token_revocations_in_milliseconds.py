@@ -0,0 +1,39 @@
+"""token_revocations.revoked_at in milliseconds
+
+Revision ID: 9f3a6c1e2d47
+Revises: 064c84907b5d
+Create Date: 2026-10-17 14:12:03.518240
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9f3a6c1e2d47'
+down_revision: Union[str, Sequence[str], None] = '064c84907b5d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# 秒與毫秒的分界（約西元 5138 年的秒數），小於它的值視為舊的秒數紀錄
+_MS_THRESHOLD = 100_000_000_000
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 撤銷時間改存毫秒，同一秒內登入又登出時舊 token 也能失效
+    with op.batch_alter_table('token_revocations') as batch_op:
+        batch_op.alter_column('revoked_at', existing_type=sa.Integer(), type_=sa.BigInteger(),
+                              existing_nullable=False)
+    # 只換算舊的秒數紀錄；create_all 已經建好的表可能已經存了毫秒
+    op.execute(f"UPDATE token_revocations SET revoked_at = revoked_at * 1000 WHERE revoked_at < {_MS_THRESHOLD}")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(f"UPDATE token_revocations SET revoked_at = revoked_at / 1000 WHERE revoked_at >= {_MS_THRESHOLD}")
+    with op.batch_alter_table('token_revocations') as batch_op:
+        batch_op.alter_column('revoked_at', existing_type=sa.BigInteger(), type_=sa.Integer(),
+                              existing_nullable=False)
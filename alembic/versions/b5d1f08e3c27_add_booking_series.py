@@ -0,0 +1,74 @@
+"""add booking_series and bookings.series_id
+
+Revision ID: b5d1f08e3c27
+Revises: 7c2e9b1d4a63
+Create Date: 2026-10-17 14:03:51.730112
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5d1f08e3c27'
+down_revision: Union[str, Sequence[str], None] = '7c2e9b1d4a63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _table_exists(name: str) -> bool:
+    # main.py 啟動時的 create_all 可能已經建好這張表；產生 SQL（--sql）時無法檢查
+    if op.get_context().as_sql:
+        return False
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def _column_exists(table: str, column: str) -> bool:
+    # create_all 不會替既有的 bookings 表加欄位，但全新的資料庫會直接建出 series_id
+    if op.get_context().as_sql:
+        return False
+    return column in {c['name'] for c in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if not _table_exists('booking_series'):
+        _create_booking_series()
+
+    # 每週固定預約產生的預約指向同一個 series，整個 series 可以用一個 UPDATE 取消 / 審核
+    if not _column_exists('bookings', 'series_id'):
+        op.add_column('bookings', sa.Column('series_id', sa.Integer(), nullable=True))
+        op.create_index(op.f('ix_bookings_series_id'), 'bookings', ['series_id'], unique=False)
+        op.create_foreign_key('fk_bookings_series_id', 'bookings', 'booking_series', ['series_id'], ['id'])
+
+
+def _create_booking_series():
+    op.create_table('booking_series',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('venue_id', sa.Integer(), nullable=False),
+    sa.Column('weekday', sa.Integer(), nullable=False),
+    sa.Column('start_time', sa.Time(), nullable=False),
+    sa.Column('end_time', sa.Time(), nullable=False),
+    sa.Column('start_date', sa.Date(), nullable=False),
+    sa.Column('end_date', sa.Date(), nullable=False),
+    sa.Column('people_count', sa.Integer(), nullable=False),
+    sa.Column('contact_phone', sa.String(length=20), nullable=False),
+    sa.Column('student_ids', sa.String(length=255), nullable=False),
+    sa.Column('created_at', sa.TIMESTAMP(), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.ForeignKeyConstraint(['venue_id'], ['venues.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_booking_series_id'), 'booking_series', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('fk_bookings_series_id', 'bookings', type_='foreignkey')
+    op.drop_index(op.f('ix_bookings_series_id'), table_name='bookings')
+    op.drop_column('bookings', 'series_id')
+    op.drop_index(op.f('ix_booking_series_id'), table_name='booking_series')
+    op.drop_table('booking_series')
@@ -0,0 +1,33 @@
+"""add index for the pending review queue
+
+Revision ID: d83a4c6f2b10
+Revises: b5d1f08e3c27
+Create Date: 2026-10-17 22:41:19.508317
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd83a4c6f2b10'
+down_revision: Union[str, Sequence[str], None] = 'b5d1f08e3c27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 待審核佇列：status = pending 依 (start_time, id) keyset 分頁與計數
+    op.create_index(
+        'ix_bookings_status_start_id',
+        'bookings',
+        ['status', 'start_time', 'id'],
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_bookings_status_start_id', table_name='bookings')
@@ -0,0 +1,141 @@
+# auth.py
+# 無狀態的登入 token（JWT 格式、HS256，只用標準函式庫簽章 / 驗證）：
+#   - /login 成功後發給前端，之後以 Authorization: Bearer <token> 帶上
+#   - token 內含 user id 與 role，驗證時不查 users 表
+#   - 登出 / 停權寫進 token_revocations（該毫秒與之前發出的 token 全部失效），查詢結果放在 LRU 快取
+import os
+import hmac
+import json
+import time
+import base64
+import hashlib
+import logging
+import secrets
+from typing import NamedTuple, Optional
+
+from fastapi import Depends, Header, HTTPException
+from sqlalchemy.orm import Session
+
+from database import get_db
+from memory_cache import LRUCache
+from models import TokenRevocation
+
+AUTH_SECRET = os.getenv("AUTH_SECRET")
+if not AUTH_SECRET:
+    # 沒設定時每次啟動隨機產生：重啟或多個 worker 之間 token 不通用，正式環境務必設定
+    AUTH_SECRET = secrets.token_urlsafe(32)
+    logging.warning("⚠️ 未設定 AUTH_SECRET，使用臨時金鑰")
+AUTH_TOKEN_TTL = int(os.getenv("AUTH_TOKEN_TTL_HOURS", "12")) * 3600
+# 撤銷紀錄的快取秒數：登出後其他 worker 最慢這麼久之後拒絕舊 token
+REVOCATION_CACHE_TTL = float(os.getenv("AUTH_REVOCATION_CACHE_TTL", "60"))
+
+_HEADER = {"alg": "HS256", "typ": "JWT"}
+_revocations = LRUCache(maxsize=10000, ttl=REVOCATION_CACHE_TTL)
+
+
+class CurrentUser(NamedTuple):
+    id: int
+    role: str
+    issued_at: int   # 毫秒
+
+    @property
+    def is_admin(self) -> bool:
+        return self.role == "admin"
+
+
+# ---------------------------
+# 簽章 / 驗證
+# ---------------------------
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _sign(signing_input: str) -> str:
+    return _b64encode(hmac.new(AUTH_SECRET.encode(), signing_input.encode(), hashlib.sha256).digest())
+
+
+def _now_ms() -> int:
+    return time.time_ns() // 1_000_000
+
+
+def create_token(user_id: int, role: str, ttl: int = AUTH_TOKEN_TTL) -> str:
+    now_ms = _now_ms()
+    now = now_ms // 1000
+    # iat / exp 依 JWT 慣例為秒；撤銷比對用毫秒的 iat_ms，同一秒內先登入再登出也能讓舊 token 失效
+    payload = {"sub": str(user_id), "role": role or "student", "iat": now, "iat_ms": now_ms, "exp": now + ttl}
+    signing_input = ".".join(
+        _b64encode(json.dumps(part, separators=(",", ":")).encode()) for part in (_HEADER, payload)
+    )
+    return f"{signing_input}.{_sign(signing_input)}"
+
+
+def decode_token(token: str) -> CurrentUser:
+    """驗證簽章與期限，回傳 CurrentUser；不合法時丟出 HTTPException(401)。"""
+    try:
+        header_b64, payload_b64, signature = token.split(".")
+        if not hmac.compare_digest(signature, _sign(f"{header_b64}.{payload_b64}")):
+            raise ValueError("signature")
+        payload = json.loads(_b64decode(payload_b64))
+        issued_at = int(payload["iat_ms"]) if "iat_ms" in payload else int(payload["iat"]) * 1000
+        user = CurrentUser(id=int(payload["sub"]), role=payload["role"], issued_at=issued_at)
+        expires_at = int(payload["exp"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=401, detail="登入資訊無效，請重新登入", headers={"WWW-Authenticate": "Bearer"})
+    if expires_at <= time.time():
+        raise HTTPException(status_code=401, detail="登入已過期，請重新登入", headers={"WWW-Authenticate": "Bearer"})
+    return user
+
+
+# ---------------------------
+# 撤銷
+# ---------------------------
+def _revoked_before(db: Session, user_id: int) -> int:
+    revoked = _revocations.get(user_id)
+    if revoked is None:
+        revoked_at = db.query(TokenRevocation.revoked_at).filter(TokenRevocation.user_id == user_id).scalar()
+        revoked = int(revoked_at) if revoked_at else 0
+        _revocations.set(user_id, revoked)
+    return revoked
+
+
+def revoke_tokens(db: Session, user_id: int):
+    """讓該使用者目前為止發出的 token 全部失效（不 commit）。"""
+    now = _now_ms()
+    record = db.query(TokenRevocation).filter(TokenRevocation.user_id == user_id).first()
+    if record:
+        record.revoked_at = now
+    else:
+        db.add(TokenRevocation(user_id=user_id, revoked_at=now))
+    _revocations.set(user_id, now)
+
+
+# ---------------------------
+# FastAPI 依賴
+# ---------------------------
+def get_current_user(authorization: Optional[str] = Header(None), db: Session = Depends(get_db)) -> CurrentUser:
+    if not authorization or not authorization.lower().startswith("bearer "):
+        raise HTTPException(status_code=401, detail="請先登入", headers={"WWW-Authenticate": "Bearer"})
+    user = decode_token(authorization[7:].strip())
+    # 撤銷時間與 iat_ms 同為毫秒；同一毫秒發出的 token 也視為已撤銷
+    if user.issued_at <= _revoked_before(db, user.id):
+        raise HTTPException(status_code=401, detail="登入已失效，請重新登入", headers={"WWW-Authenticate": "Bearer"})
+    return user
+
+
+def require_admin(user: CurrentUser = Depends(get_current_user)) -> CurrentUser:
+    if not user.is_admin:
+        raise HTTPException(status_code=403, detail="需要管理員權限")
+    return user
+
+
+def resolve_user_id(user: CurrentUser, requested: Optional[int]) -> int:
+    """請求裡的 user_id 只是選填：沒帶或與 token 相同時用 token 的 user；管理員可以代替其他使用者操作。"""
+    if requested is None or requested == user.id:
+        return user.id
+    if user.is_admin:
+        return requested
+    raise HTTPException(status_code=403, detail="不可代替其他使用者操作")
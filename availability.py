@@ -0,0 +1,121 @@
+# availability.py
+# 可預約時段計算：把「開放時段」與「已被佔用的區間」都當成排序好的區間，
+# 以合併 + 雙指標掃描一次算出空閒時段，O((S + B) log(S + B))，取代原本 slots × bookings 的雙層迴圈。
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy.orm import Session
+
+from models import AvailableSlot, Booking, BookingStatus
+
+# 會佔用場地的預約狀態（已取消 / 被拒絕的不算衝突）
+ACTIVE_STATUSES = (BookingStatus.pending, BookingStatus.approved)
+
+
+def merge_intervals(intervals):
+    """把 (start, end) 區間排序並合併重疊 / 相接的部分。"""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def free_slots(slots, busy, key=None):
+    """
+    回傳 slots 中不與任何 busy 區間重疊的項目（依開始時間排序）。
+    slots：任意物件，key(slot) 需回傳 (start, end)；預設 slot 本身就有 start_time / end_time。
+    busy：(start, end) 區間，例如有效預約的起訖時間。
+    """
+    if key is None:
+        key = lambda s: (s.start_time, s.end_time)
+    ordered = sorted(slots, key=key)
+    merged = merge_intervals(busy)
+
+    result = []
+    j = 0
+    for s in ordered:
+        start, end = key(s)
+        # 合併後的 busy 區間互不重疊，依結束時間也是遞增；跳過已經結束的
+        while j < len(merged) and merged[j][1] <= start:
+            j += 1
+        if j < len(merged) and merged[j][0] < end:
+            continue
+        result.append(s)
+    return result
+
+
+def overlaps(busy, start, end) -> bool:
+    """任一 busy 區間與 [start, end) 重疊即回傳 True。"""
+    return any(b_start < end and b_end > start for b_start, b_end in busy)
+
+
+def active_bookings(db: Session, venue_ids, window_start: datetime, window_end: datetime):
+    """取出場地在 [window_start, window_end) 內的有效預約 (venue_id, start_time, end_time)。"""
+    return (
+        db.query(Booking.venue_id, Booking.start_time, Booking.end_time)
+        .filter(
+            Booking.venue_id.in_(venue_ids),
+            Booking.start_time < window_end,
+            Booking.end_time > window_start,
+            Booking.status.in_(ACTIVE_STATUSES),
+        )
+        .all()
+    )
+
+
+def find_free_slots(db: Session, venue_id: int, window_start: datetime, window_end: datetime):
+    """
+    查出場地在 [window_start, window_end) 內開始、且尚未被預約的 AvailableSlot。
+    固定兩個查詢（沒有開放時段時只有一個），回傳 (id, venue_id, start_time, end_time) 列。
+    """
+    slots = (
+        db.query(AvailableSlot.id, AvailableSlot.venue_id, AvailableSlot.start_time, AvailableSlot.end_time)
+        .filter(
+            AvailableSlot.venue_id == venue_id,
+            AvailableSlot.start_time >= window_start,
+            AvailableSlot.start_time < window_end,
+        )
+        .all()
+    )
+    if not slots:
+        return []
+    last_end = max(s.end_time for s in slots)
+    busy = [(b.start_time, b.end_time) for b in active_bookings(db, [venue_id], window_start, last_end)]
+    return free_slots(slots, busy)
+
+
+def find_free_slots_by_day(db: Session, venue_ids, range_start: datetime, range_end: datetime):
+    """
+    多場地、多天版本的 find_free_slots：固定兩個查詢取出所有時段與有效預約，
+    回傳 {venue_id: {date: [free slot, ...]}}（時段依開始時間所在的日期分組）。
+    """
+    slots = (
+        db.query(AvailableSlot.id, AvailableSlot.venue_id, AvailableSlot.start_time, AvailableSlot.end_time)
+        .filter(
+            AvailableSlot.venue_id.in_(venue_ids),
+            AvailableSlot.start_time >= range_start,
+            AvailableSlot.start_time < range_end,
+        )
+        .all()
+    )
+    result = {vid: {} for vid in venue_ids}
+    if not slots:
+        return result
+
+    last_end = max(s.end_time for s in slots)
+    busy = defaultdict(list)
+    for b in active_bookings(db, venue_ids, range_start, last_end):
+        busy[b.venue_id].append((b.start_time, b.end_time))
+
+    by_venue = defaultdict(list)
+    for s in slots:
+        by_venue[s.venue_id].append(s)
+    for vid, venue_slots in by_venue.items():
+        days = result[vid]
+        for s in free_slots(venue_slots, busy[vid]):
+            days.setdefault(s.start_time.date(), []).append(s)
+    return result
@@ -0,0 +1,236 @@
+# availability_cache.py
+# 可預約時段的行程內快取，key 為 (venue_id, date)。
+#   - 讀取：get_free_slots() 命中就不查資料庫
+#   - 寫入：預約 / 時段異動時呼叫 mark_changed()，失效紀錄寫進 cache_invalidations 並隨 transaction commit；
+#           commit 成功後本行程立即清掉對應快取
+#   - 其他 uvicorn worker：InvalidationListener 輪詢 cache_invalidations（PostgreSQL 另用 LISTEN/NOTIFY 即時喚醒）
+import os
+import logging
+import select
+import threading
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import event, inspect, text
+from sqlalchemy.orm import Session
+
+from availability import find_free_slots, find_free_slots_by_day
+from database import SessionLocal, engine
+from memory_cache import LRUCache
+from models import CacheInvalidation
+
+AVAILABILITY_CACHE_SIZE = int(os.getenv("AVAILABILITY_CACHE_SIZE", "2048"))
+# 萬一漏掉失效通知（例如直接改資料庫），最久這麼多秒後也會重新查詢
+AVAILABILITY_CACHE_TTL = float(os.getenv("AVAILABILITY_CACHE_TTL", "300"))
+AVAILABILITY_CACHE_POLL_SECONDS = float(os.getenv("AVAILABILITY_CACHE_POLL_SECONDS", "1"))
+NOTIFY_CHANNEL = "availability_invalidation"
+
+cache = LRUCache(maxsize=AVAILABILITY_CACHE_SIZE, ttl=AVAILABILITY_CACHE_TTL)
+invalidation_count = 0
+
+# 每個 (venue_id, day) 的失效次數：查詢前先記下，查完若有變動代表查到的可能是異動前的資料，不回填快取
+_generations = {}
+
+# 失效回呼：其他模組（例如 LINE 回覆快取）可註冊 fn(venue_id, day)
+_listeners = []
+
+
+def add_listener(fn):
+    _listeners.append(fn)
+
+
+def _invalidate_local(venue_id: int, day: date):
+    global invalidation_count
+    key = (venue_id, day)
+    _generations[key] = _generations.get(key, 0) + 1
+    cache.pop(key)
+    invalidation_count += 1
+    for fn in _listeners:
+        try:
+            fn(venue_id, day)
+        except Exception as e:
+            logging.error(f"快取失效回呼錯誤：{e}")
+
+
+# ---------------------------
+# 讀取
+# ---------------------------
+def get_free_slots(db: Session, venue_id: int, day: date):
+    key = (venue_id, day)
+    slots = cache.get(key)
+    if slots is None:
+        generation = _generations.get(key, 0)
+        start = datetime.combine(day, datetime.min.time())
+        slots = find_free_slots(db, venue_id, start, start + timedelta(days=1))
+        if _generations.get(key, 0) == generation:
+            cache.set(key, slots)
+    return slots
+
+
+def get_free_slots_by_day(db: Session, venue_ids, days):
+    """多場地、多天版本；全部命中就不查資料庫，否則整段區間查一次並回填快取。"""
+    result = {vid: {} for vid in venue_ids}
+    missing = False
+    for vid in venue_ids:
+        for d in days:
+            slots = cache.get((vid, d))
+            if slots is None:
+                missing = True
+                break
+            result[vid][d] = slots
+        if missing:
+            break
+    if not missing:
+        return result
+
+    generations = {(vid, d): _generations.get((vid, d), 0) for vid in venue_ids for d in days}
+    range_start = datetime.combine(days[0], datetime.min.time())
+    fresh = find_free_slots_by_day(db, venue_ids, range_start, range_start + timedelta(days=len(days)))
+    for vid in venue_ids:
+        for d in days:
+            slots = fresh[vid].get(d, [])
+            if _generations.get((vid, d), 0) == generations[(vid, d)]:
+                cache.set((vid, d), slots)
+            result[vid][d] = slots
+    return result
+
+
+# ---------------------------
+# 寫入端：標記異動
+# ---------------------------
+def mark_changed(db: Session, venue_id: int, start_time: datetime, end_time: datetime = None):
+    """
+    標記場地在 start_time ~ end_time 涵蓋的每一天有異動（不 commit）。
+    失效紀錄與 NOTIFY 隨呼叫端的 transaction 一起生效，rollback 時什麼都不會發生。
+    """
+    last = (end_time - timedelta(microseconds=1)) if end_time and end_time > start_time else start_time
+    day = start_time.date()
+    pending = db.info.setdefault("availability_changes", {})
+    while day <= last.date():
+        if (venue_id, day) not in pending:
+            record = CacheInvalidation(venue_id=venue_id, day=day)
+            db.add(record)
+            pending[(venue_id, day)] = record
+        day += timedelta(days=1)
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text("SELECT pg_notify(:channel, '')"), {"channel": NOTIFY_CHANNEL})
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _after_commit(session):
+    for (venue_id, day), record in session.info.pop("availability_changes", {}).items():
+        identity = inspect(record).identity
+        if identity:
+            listener.mark_seen(identity[0])
+        _invalidate_local(venue_id, day)
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _after_rollback(session):
+    session.info.pop("availability_changes", None)
+
+
+# ---------------------------
+# 跨 worker 失效
+# ---------------------------
+class InvalidationListener:
+    """輪詢 cache_invalidations，清掉其他 worker 寫入造成的過期快取。"""
+
+    # 只看最近這段時間的紀錄；已處理過的 id 記在 seen 裡避免重複清除
+    LOOKBACK = timedelta(seconds=30)
+    RETENTION = timedelta(minutes=10)
+
+    def __init__(self, poll_interval=AVAILABILITY_CACHE_POLL_SECONDS):
+        self.poll_interval = poll_interval
+        self._seen = LRUCache(maxsize=10000)
+        self._stop = threading.Event()
+        self._thread = None
+        self._last_prune = datetime.min
+
+    def mark_seen(self, record_id: int):
+        self._seen.set(record_id, True)
+
+    def poll(self):
+        now = datetime.now()
+        db = SessionLocal()
+        try:
+            rows = (
+                db.query(CacheInvalidation.id, CacheInvalidation.venue_id, CacheInvalidation.day)
+                .filter(CacheInvalidation.created_at >= now - self.LOOKBACK)
+                .all()
+            )
+            for r in rows:
+                if r.id in self._seen:
+                    continue
+                self.mark_seen(r.id)
+                _invalidate_local(r.venue_id, r.day)
+
+            if now - self._last_prune > timedelta(minutes=1):
+                db.query(CacheInvalidation).filter(
+                    CacheInvalidation.created_at < now - self.RETENTION
+                ).delete(synchronize_session=False)
+                db.commit()
+                self._last_prune = now
+        finally:
+            db.close()
+
+    def _open_listen_connection(self):
+        if engine.dialect.name != "postgresql":
+            return None
+        try:
+            raw = engine.raw_connection()
+            raw.detach()   # 長駐連線，不佔用連線池名額
+            conn = raw.driver_connection
+            conn.autocommit = True
+            conn.cursor().execute(f"LISTEN {NOTIFY_CHANNEL};")
+            return conn
+        except Exception as e:
+            logging.warning(f"LISTEN 失敗，改用輪詢：{e}")
+            return None
+
+    def _run(self):
+        listen_conn = self._open_listen_connection()
+        # 啟動前的紀錄與本 worker 無關，先標記為已處理
+        db = SessionLocal()
+        try:
+            for (row_id,) in db.query(CacheInvalidation.id):
+                self.mark_seen(row_id)
+        except Exception as e:
+            logging.error(f"讀取快取失效紀錄失敗：{e}")
+        finally:
+            db.close()
+
+        while not self._stop.is_set():
+            try:
+                self.poll()
+            except Exception as e:
+                logging.error(f"快取失效輪詢錯誤：{e}")
+
+            if listen_conn is None:
+                self._stop.wait(self.poll_interval)
+                continue
+            try:
+                if select.select([listen_conn], [], [], self.poll_interval)[0]:
+                    listen_conn.poll()
+                    listen_conn.notifies.clear()
+            except Exception as e:
+                logging.warning(f"LISTEN 連線中斷，改用輪詢：{e}")
+                listen_conn = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="availability-cache", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+
+listener = InvalidationListener()
+
+
+def stats() -> dict:
+    return {**cache.stats(), "invalidations": invalidation_count}
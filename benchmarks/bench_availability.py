@@ -0,0 +1,46 @@
+# benchmarks/bench_availability.py
+# 微型效能測試：每天數千個時段時，區間掃描 vs 原本的雙層迴圈
+# 用法：python -m benchmarks.bench_availability
+from availability import free_slots
+
+
+if __name__ == "__main__":
+    import random
+    import time
+    from collections import namedtuple
+    from datetime import datetime, timedelta
+
+    Slot = namedtuple("Slot", "id start_time end_time")
+    day = datetime(2030, 1, 7)
+    SLOTS = 4320      # 每 20 秒一個時段
+    BOOKINGS = 1500
+
+    slots = [Slot(i, day + timedelta(seconds=20 * i), day + timedelta(seconds=20 * (i + 1))) for i in range(SLOTS)]
+    random.seed(1)
+    busy = []
+    for _ in range(BOOKINGS):
+        s = random.randrange(SLOTS)
+        busy.append((slots[s].start_time, slots[s].end_time))
+
+    def to_seconds(dt):
+        return dt.hour * 3600 + dt.minute * 60 + dt.second
+
+    def nested_loop():
+        out = []
+        for s in slots:
+            conflict = False
+            for b_start, b_end in busy:
+                if not (to_seconds(s.end_time) <= to_seconds(b_start) or to_seconds(s.start_time) >= to_seconds(b_end)):
+                    conflict = True
+                    break
+            if not conflict:
+                out.append(s)
+        return out
+
+    t0 = time.perf_counter()
+    old = nested_loop()
+    t1 = time.perf_counter()
+    new = free_slots(slots, busy)
+    t2 = time.perf_counter()
+    assert [s.id for s in old] == [s.id for s in new]
+    print(f"{SLOTS} slots × {BOOKINGS} bookings：雙層迴圈 {(t1 - t0) * 1000:.1f} ms，區間掃描 {(t2 - t1) * 1000:.1f} ms")
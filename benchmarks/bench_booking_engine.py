@@ -0,0 +1,65 @@
+# benchmarks/bench_booking_engine.py
+# 競爭測試：N 個寫入者同時預約「同一場地」vs「各自不同場地」
+# 用法：DATABASE_URL=postgresql+psycopg2://... python -m benchmarks.bench_booking_engine
+# （SQLite 本身只允許單一寫入者，差異會小很多）
+from fastapi import HTTPException
+
+from booking_engine import booking_locks, ensure_bookable
+from models import AvailableSlot, Booking, BookingStatus, User, Venue
+
+
+if __name__ == "__main__":
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+    from datetime import datetime, timedelta
+
+    from database import Base, SessionLocal, engine
+
+    WRITERS = 8
+    HOURS = 10
+    day = datetime(2030, 1, 7)
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    users = [User(username=f"bench_u{i}_{time.time_ns()}", password="x", email=f"bench{i}_{time.time_ns()}@example.com")
+             for i in range(WRITERS)]
+    venues = [Venue(name=f"bench_v{i}_{time.time_ns()}", capacity=10) for i in range(WRITERS)]
+    db.add_all(users + venues)
+    db.flush()
+    for v in venues:
+        for d in range(2):
+            start = day + timedelta(days=d)
+            db.add(AvailableSlot(venue_id=v.id, start_time=start, end_time=start + timedelta(hours=HOURS)))
+    db.commit()
+    user_ids = [u.id for u in users]
+    venue_ids = [v.id for v in venues]
+    db.close()
+
+    def writer(user_id, venue_id, offset):
+        s = SessionLocal()
+        ok = 0
+        try:
+            for h in range(HOURS):
+                start = day + timedelta(days=offset, hours=h)
+                try:
+                    with booking_locks(s, [user_id], [venue_id]):
+                        ensure_bookable(s, user_id, venue_id, start, start + timedelta(hours=1))
+                        s.add(Booking(user_id=user_id, venue_id=venue_id, start_time=start,
+                                      end_time=start + timedelta(hours=1), people_count=1,
+                                      contact_phone="0900000000", student_ids="b",
+                                      status=BookingStatus.pending))
+                        s.commit()
+                    ok += 1
+                except HTTPException:
+                    pass
+        finally:
+            s.close()
+        return ok
+
+    for label, targets in (("同一場地", [venue_ids[0]] * WRITERS), ("不同場地", venue_ids)):
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=WRITERS) as pool:
+            results = list(pool.map(writer, user_ids, targets, [0 if label == "同一場地" else 1] * WRITERS))
+        elapsed = time.perf_counter() - t0
+        print(f"{label}: {WRITERS} writers × {HOURS} 次嘗試，成功 {sum(results)} 筆，"
+              f"{elapsed * 1000:.1f} ms（{WRITERS * HOURS / elapsed:.0f} 次/秒）")
@@ -0,0 +1,65 @@
+# benchmarks/bench_line_client.py
+# 效能測試：同步 LineBotApi（每次一條新連線、一次一則）vs line_client（keep-alive、並行），
+# 以及 LINE 回 500 時 push 的重試。LINE API 由 mock_line_api 另開行程代替。
+# 用法：LINE_CHANNEL_ACCESS_TOKEN=... python -m benchmarks.bench_line_client
+import os
+import time
+import asyncio
+import logging
+
+from line_client import LineMessagingClient
+
+
+if __name__ == "__main__":
+    import warnings
+    import mock_line_api
+    from linebot import LineBotApi
+    from linebot.models import TextSendMessage
+
+    warnings.simplefilter("ignore")
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    token = os.getenv("LINE_CHANNEL_ACCESS_TOKEN", "bench")
+    os.environ["LINE_CHANNEL_ACCESS_TOKEN"] = token
+    n = 200
+
+    base_url, process = mock_line_api.serve_in_background(8081)
+    try:
+        sync_api = LineBotApi(token, endpoint=base_url)
+        started = time.perf_counter()
+        for i in range(n):
+            sync_api.reply_message(f"sync-{i}", TextSendMessage(text="hello"))
+        t_sync = time.perf_counter() - started
+
+        async def replies():
+            client = LineMessagingClient(token, base_url=base_url)
+            started = time.perf_counter()
+            await asyncio.gather(*(client.reply(f"async-{i}", TextSendMessage(text="hello")) for i in range(n)))
+            elapsed = time.perf_counter() - started
+            await client.aclose()
+            return elapsed
+
+        t_async = asyncio.run(replies())
+        print(f"{n} 次回覆：LineBotApi {t_sync:.2f} s，line_client {t_async:.2f} s（{t_sync / t_async:.1f}x）")
+    finally:
+        process.terminate()
+
+    # 20% 的請求失敗：push 的重試次數受 retry budget 限制，reply 不重試
+    os.environ["MOCK_LINE_FAILURE_RATE"] = "0.2"
+    base_url, process = mock_line_api.serve_in_background(8082)
+    try:
+        async def flaky():
+            client = LineMessagingClient(token, base_url=base_url)
+            results = await asyncio.gather(*(client.push(f"U{i}", {"type": "text", "text": "hi"}) for i in range(n)),
+                                           return_exceptions=True)
+            replies = await asyncio.gather(*(client.reply(f"flaky-{i}", {"type": "text", "text": "hi"})
+                                             for i in range(n)), return_exceptions=True)
+            await client.aclose()
+            return (sum(isinstance(r, Exception) for r in results), sum(isinstance(r, Exception) for r in replies),
+                    client.stats())
+
+        failed, failed_replies, stats = asyncio.run(flaky())
+        print(f"失敗率 20%：{n} 次 push 最後失敗 {failed} 次，{stats['apis']['push']}，"
+              f"budget 用盡 {stats['retry_budget_exhausted']} 次")
+        print(f"reply 失敗 {failed_replies} 次，重試 {stats['apis']['reply']['retries']} 次")
+    finally:
+        process.terminate()
@@ -0,0 +1,121 @@
+# benchmarks/bench_line_integration.py
+# 效能測試：LINE 訊息湧入時 webhook 的處理量，以及同時間其他 endpoint（/health）的延遲
+#   - inline：舊做法，在 async callback 裡直接查詢並以同步 SDK 回覆，event loop 被卡住
+#   - dispatcher：callback 立即回 200，事件在背景處理，回覆走 line_client
+#   LINE API 以 mock_line_api（延遲 LINE_API_LATENCY 秒）代替；PostgreSQL 時另外比較連線池借還 vs 每次 psycopg2.connect
+# 用法：DATABASE_URL=... python -m benchmarks.bench_line_integration
+import os
+import time
+
+import psycopg2
+from fastapi import Request
+from fastapi.responses import PlainTextResponse
+
+from database import engine
+from line_integration import (
+    LINE_CHANNEL_SECRET, build_reply, dispatcher, line_client, parser, router, venue_catalog,
+)
+
+
+if __name__ == "__main__":
+    import json
+    import hmac
+    import base64
+    import hashlib
+    import asyncio
+    import timeit
+    import logging
+    import httpx
+    from fastapi import FastAPI
+
+    import mock_line_api
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    LINE_API_LATENCY = float(os.getenv("LINE_API_LATENCY", "0.05"))
+    os.environ["MOCK_LINE_LATENCY"] = str(LINE_API_LATENCY)
+    line_client.base_url, mock_process = mock_line_api.serve_in_background()
+    venue_catalog.get()
+
+    bench_app = FastAPI()
+    bench_app.include_router(router)
+
+    @bench_app.post("/callback_inline", response_class=PlainTextResponse)
+    async def callback_inline(request: Request):
+        body = await request.body()
+        for event in parser.parse(body.decode("utf-8"), request.headers["X-Line-Signature"]):
+            build_reply(event.message.text.strip())
+            time.sleep(LINE_API_LATENCY)   # 同步 SDK 的 reply_message
+        return "OK"
+
+    def signed_webhook(texts, batch):
+        events = [{
+            "type": "message",
+            "mode": "active",
+            "timestamp": int(time.time() * 1000),
+            "source": {"type": "user", "userId": f"Ubench{batch}-{i % 3}"},
+            "webhookEventId": f"bench-{batch}-{i}",
+            "deliveryContext": {"isRedelivery": False},
+            "replyToken": f"{batch:016d}{i:016d}",
+            "message": {"id": str(i), "type": "text", "text": text},
+        } for i, text in enumerate(texts)]
+        body = json.dumps({"destination": "bench", "events": events})
+        digest = hmac.new(LINE_CHANNEL_SECRET.encode(), body.encode(), hashlib.sha256).digest()
+        return body, {"X-Line-Signature": base64.b64encode(digest).decode(), "Content-Type": "application/json"}
+
+    texts = ["目前有開放的場地嗎", "可預約時段", "你好"]
+    n_webhooks, events_per_webhook = 40, 5
+    webhooks = [signed_webhook([texts[i % len(texts)] for i in range(events_per_webhook)], b)
+                for b in range(n_webhooks)]
+    n_events = n_webhooks * events_per_webhook
+
+    def p99(samples):
+        samples = sorted(samples)
+        return samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000
+
+    async def burst(path):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=bench_app), base_url="http://bench",
+                                     timeout=600) as client:
+            done = asyncio.Event()
+            health_latency = []
+
+            async def probe():
+                # 以固定時間間隔「應該送出」的時刻起算延遲，event loop 被卡住而晚送的時間也算進去
+                scheduled = time.perf_counter()
+                while not done.is_set():
+                    await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+                    assert (await client.get("/health")).status_code == 200
+                    health_latency.append(time.perf_counter() - scheduled)
+                    scheduled += 0.01
+
+            async def post(body, headers):
+                # 所有 webhook 同時送出，延遲從整批送出的時刻起算
+                assert (await client.post(path, content=body, headers=headers)).status_code == 200
+                return time.perf_counter() - started
+
+            prober = asyncio.create_task(probe())
+            await asyncio.sleep(0.05)
+            started = time.perf_counter()
+            ack_latency = await asyncio.gather(*(post(body, headers) for body, headers in webhooks))
+            await dispatcher.drain()
+            elapsed = time.perf_counter() - started
+            done.set()
+            await prober
+            await line_client.aclose()
+        print(f"{path:<16} {n_events / elapsed:7.1f} 事件/秒  webhook 回應 p99 {p99(ack_latency):8.1f} ms"
+              f"  /health p99 {p99(health_latency):8.1f} ms（{len(health_latency)} 次）")
+
+    print(f"{n_webhooks} 個 webhook × {events_per_webhook} 則訊息，LINE API 延遲 {LINE_API_LATENCY * 1000:.0f} ms，"
+          f"{dispatcher.workers} 個 worker")
+    asyncio.run(burst("/callback_inline"))
+    asyncio.run(burst("/callback"))
+    assert dispatcher.processed == n_events, dispatcher.stats()
+    assert line_client.stats()["apis"]["reply"]["errors"] == 0, line_client.stats()
+    print(f"LINE API：{line_client.stats()['apis']['reply']}")
+    dispatcher.stop()
+    mock_process.terminate()
+
+    if engine.dialect.name == "postgresql":
+        connect_args = engine.url.translate_connect_args(username="user", database="dbname")
+        t_pool = timeit.timeit(lambda: engine.raw_connection().close(), number=50) / 50
+        t_connect = timeit.timeit(lambda: psycopg2.connect(**connect_args).close(), number=10) / 10
+        print(f"取得連線：連線池 {t_pool * 1000:.2f} ms，psycopg2.connect {t_connect * 1000:.2f} ms")
@@ -0,0 +1,26 @@
+# benchmarks/bench_line_reply_cache.py
+# 效能測試：命中時的成本 vs 重新產生一次文字（不含兩次資料庫查詢，實際差距更大）
+# 用法：DATABASE_URL=... python -m benchmarks.bench_line_reply_cache
+from line_reply_cache import ReplyTextCache
+
+
+if __name__ == "__main__":
+    import timeit
+    from datetime import datetime, timedelta
+
+    start = datetime(2030, 1, 7, 8)
+    rows = [{"start_time": start + timedelta(hours=h), "end_time": start + timedelta(hours=h + 1)} for h in range(14 * 7)]
+
+    def render():
+        lines = ["🏟️ 羽球場 - 可預約時段："]
+        for r in rows:
+            lines.append(f"• {r['start_time'].strftime('%H:%M')} ～ {r['end_time'].strftime('%H:%M')}")
+        return "\n".join(lines)
+
+    cache = ReplyTextCache()
+    key = ("venue", 1, start.date())
+    n = 2000
+    t_render = timeit.timeit(render, number=n) / n
+    t_hit = timeit.timeit(lambda: cache.get(key, render), number=n) / n
+    print(f"{len(rows)} 個時段：產生文字 {t_render * 1e6:.1f} µs，快取命中 {t_hit * 1e6:.1f} µs，"
+          f"產生次數 {cache.renders}")
@@ -0,0 +1,21 @@
+# benchmarks/bench_rate_limit.py
+# 效能測試：本機 bucket 每次檢查的成本
+# 用法：python -m benchmarks.bench_rate_limit
+from rate_limit import LocalBackend, Rule
+
+
+if __name__ == "__main__":
+    import timeit
+
+    backend = LocalBackend(max_keys=10000)
+    rule = Rule(10, 60)
+
+    # 同一個 key：10 次之後被擋，6 秒後補回 1 個
+    results = [backend.take("ip:1", rule, now=0.0)[0] for _ in range(11)]
+    assert results == [True] * 10 + [False]
+    assert backend.take("ip:1", rule, now=6.0)[0]
+
+    keys = [f"ip:{i}" for i in range(50000)]
+    n = len(keys)
+    t = timeit.timeit(lambda: [backend.take(k, rule) for k in keys], number=1) / n
+    print(f"每次檢查 {t * 1e6:.2f} µs，{n} 個 key 後 bucket 數 {len(backend._buckets)}（上限 10000）")
@@ -0,0 +1,47 @@
+# benchmarks/bench_schedule_bitmap.py
+# 效能測試：衝突檢查用 bitmap vs 原本 to_seconds 的迴圈
+# 用法：python -m benchmarks.bench_schedule_bitmap
+from datetime import date, datetime, time, timedelta
+
+from schedule_bitmap import DaySchedule
+
+
+if __name__ == "__main__":
+    import random
+    import timeit
+
+    day = date(2030, 1, 7)
+    base = datetime.combine(day, time.min)
+    slots = [(base + timedelta(hours=h), base + timedelta(hours=h + 1)) for h in range(6, 23)]
+    random.seed(1)
+    bookings = [slots[i] for i in random.sample(range(len(slots)), 8)]
+    queries = [(base + timedelta(hours=h), base + timedelta(hours=h + random.choice((1, 2))))
+               for h in (random.randrange(6, 22) for _ in range(1000))]
+
+    def to_seconds(dt):
+        return dt.hour * 3600 + dt.minute * 60 + dt.second
+
+    def loop_is_free(start, end):
+        covered = any(to_seconds(s) <= to_seconds(start) and to_seconds(e) >= to_seconds(end) for s, e in slots)
+        if not covered:
+            # 跨越多個相鄰時段時逐格檢查
+            t = to_seconds(start)
+            while t < to_seconds(end):
+                if not any(to_seconds(s) <= t < to_seconds(e) for s, e in slots):
+                    return False
+                t += 3600
+        for b_start, b_end in bookings:
+            if not (to_seconds(end) <= to_seconds(b_start) or to_seconds(start) >= to_seconds(b_end)):
+                return False
+        return True
+
+    schedule = DaySchedule.from_rows(day, slots, bookings)
+    assert [loop_is_free(s, e) for s, e in queries] == [schedule.is_range_free(s, e) for s, e in queries]
+
+    n = 20
+    t_loop = timeit.timeit(lambda: [loop_is_free(s, e) for s, e in queries], number=n) / n
+    t_build = timeit.timeit(lambda: DaySchedule.from_rows(day, slots, bookings), number=n) / n
+    t_bits = timeit.timeit(lambda: [schedule.is_range_free(s, e) for s, e in queries], number=n) / n
+    print(f"{len(queries)} 次衝突檢查：to_seconds 迴圈 {t_loop * 1000:.2f} ms，"
+          f"bitmap {t_bits * 1000:.2f} ms（建立 bitmap {t_build * 1000:.3f} ms）")
+    print("first_free_run(4):", schedule.first_free_run(4))
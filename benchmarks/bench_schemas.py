@@ -0,0 +1,84 @@
+# benchmarks/bench_schemas.py
+# 效能測試：最大的幾個列表回應，原本「dict + strftime + jsonable_encoder + json」vs「response model + orjson」
+# 用法：python -m benchmarks.bench_schemas
+from datetime import datetime
+from typing import List
+
+from models import BookingStatus
+from schemas import CmsPendingBookingOut, PendingBookingPage, ReservationPage
+
+
+if __name__ == "__main__":
+    import json
+    import timeit
+    from collections import namedtuple
+    from datetime import timedelta
+
+    import orjson
+    from fastapi.encoders import jsonable_encoder
+    from pydantic import TypeAdapter
+
+    Row = namedtuple("Row", "id user_id username venue_id venue_name start_time end_time people_count "
+                            "contact_phone student_ids created_at status series_id")
+    base = datetime(2030, 1, 7, 8)
+    rows = [
+        Row(i, i % 50, f"user{i % 50}", i % 5, "羽球場", base + timedelta(hours=i), base + timedelta(hours=i + 1),
+            2, "0912345678", "A1234567,A7654321", base, BookingStatus.pending, None)
+        for i in range(200)
+    ]
+
+    def old_reservations():
+        content = {"reservations": [
+            {
+                "booking_id": b.id,
+                "venue_id": b.venue_id,
+                "venue_name": b.venue_name,
+                "start_time": b.start_time.strftime("%Y-%m-%d %H:%M:%S"),
+                "end_time": b.end_time.strftime("%Y-%m-%d %H:%M:%S"),
+                "people_count": b.people_count,
+                "contact_phone": b.contact_phone,
+                "student_ids": b.student_ids,
+                "status": b.status.value
+            }
+            for b in rows
+        ], "next_cursor": None}
+        return json.dumps(jsonable_encoder(content), ensure_ascii=False).encode()
+
+    def old_pending():
+        content = {"bookings": [
+            {
+                "booking_id": b.id,
+                "username": b.username,
+                "venue_name": b.venue_name,
+                "start_time": b.start_time.isoformat(),
+                "end_time": b.end_time.isoformat(),
+                "people_count": b.people_count,
+                "contact_phone": b.contact_phone,
+                "student_ids": b.student_ids,
+                "created_at": b.created_at.isoformat(),
+                "status": b.status.value
+            }
+            for b in rows
+        ], "next_cursor": None}
+        return json.dumps(jsonable_encoder(content), ensure_ascii=False).encode()
+
+    def old_cms():
+        return json.dumps(jsonable_encoder([r._asdict() for r in rows]), ensure_ascii=False).encode()
+
+    # 新做法：和 FastAPI 一樣先以 response model 驗證、轉成 JSON 相容物件，再交給 orjson
+    def new(adapter, content):
+        return lambda: orjson.dumps(adapter.dump_python(adapter.validate_python(content), mode="json"))
+
+    cases = [
+        ("/api/my_reservations", old_reservations,
+         new(TypeAdapter(ReservationPage), {"reservations": rows, "next_cursor": None})),
+        ("/bookings/pending", old_pending,
+         new(TypeAdapter(PendingBookingPage), {"bookings": rows, "next_cursor": None})),
+        ("/cms/pending_bookings", old_cms, new(TypeAdapter(List[CmsPendingBookingOut]), rows)),
+    ]
+    n = 50
+    for name, old_fn, new_fn in cases:
+        assert json.loads(old_fn()) == json.loads(new_fn()), name
+        t_old = timeit.timeit(old_fn, number=n) / n
+        t_new = timeit.timeit(new_fn, number=n) / n
+        print(f"{name}（{len(rows)} 筆）：原本 {t_old * 1000:.2f} ms，新版 {t_new * 1000:.2f} ms，{t_old / t_new:.1f}x")
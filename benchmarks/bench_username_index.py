@@ -0,0 +1,18 @@
+# benchmarks/bench_username_index.py
+# 效能測試：Bloom filter 查詢 vs 實際誤判率
+# 用法：python -m benchmarks.bench_username_index
+from username_index import BloomFilter
+
+
+if __name__ == "__main__":
+    import timeit
+
+    n = 50000
+    bloom = BloomFilter(n * 2)
+    for i in range(n):
+        bloom.add(f"u:student{i}")
+    assert all(f"u:student{i}" in bloom for i in range(n))
+    false_positives = sum(f"u:other{i}" in bloom for i in range(n))
+    t = timeit.timeit(lambda: "u:someone" in bloom, number=100000) / 100000
+    print(f"{n} 筆、{len(bloom.bits) / 1024:.0f} KiB、k={bloom.hash_count}："
+          f"誤判率 {false_positives / n:.4%}，每次查詢 {t * 1e6:.2f} µs")
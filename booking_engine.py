@@ -0,0 +1,148 @@
+# booking_engine.py
+# 預約寫入引擎：把「可預約時段檢查 → 衝突檢查 → 寫入」放在同一個鎖定範圍內完成，
+# 避免兩個同時送出的 /book 都通過檢查而重複預約。
+# 鎖的粒度是「使用者 + 場地」，不同場地的預約彼此不會互相等待。
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+from fastapi import HTTPException
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from availability import ACTIVE_STATUSES, overlaps
+from models import AvailableSlot, Booking, User, Venue
+from schedule_bitmap import DaySchedule
+
+# SQLite 不支援 SELECT ... FOR UPDATE，改用行程內的鎖（每個使用者 / 場地一把）
+_local_locks = defaultdict(threading.Lock)
+_local_locks_guard = threading.Lock()
+
+
+def _local_lock(key):
+    with _local_locks_guard:
+        return _local_locks[key]
+
+
+class _Busy:
+    """
+    某個使用者 / 場地的佔用時段。時間都落在格線上（一般整點、半點的預約）時每天一個 DaySchedule，
+    衝突檢查是一次位元運算；只要有一筆沒對齊，就改回逐一比對區間（結果相同，只是比較慢）。
+    """
+
+    def __init__(self):
+        self.intervals = []
+        self.days = {}
+        self.bitmap = True
+
+    def _schedule(self, start, end):
+        schedule = self.days.get(start.date())
+        if schedule is None:
+            schedule = self.days[start.date()] = DaySchedule.full_day(start.date())
+        return schedule if schedule.aligned(start, end) else None
+
+    def add(self, start, end):
+        self.intervals.append((start, end))
+        if self.bitmap:
+            schedule = self._schedule(start, end)
+            if schedule is None:
+                self.bitmap = False
+            else:
+                schedule.reserve(start, end)
+
+    def overlaps(self, start, end) -> bool:
+        if self.bitmap:
+            schedule = self._schedule(start, end)
+            if schedule is not None:
+                return not schedule.is_range_free(start, end)
+        return overlaps(self.intervals, start, end)
+
+
+@contextmanager
+def booking_locks(db: Session, user_ids, venue_ids):
+    """
+    鎖住使用者與場地後 yield ({user_id: user}, {venue_id: venue})。
+    呼叫端必須在 with 區塊內完成檢查、寫入與 commit；
+    PostgreSQL / MySQL 用 row lock（commit 時釋放），SQLite 用行程內的鎖。
+    鎖定順序固定為「使用者 id → 場地 id 由小到大」，避免死結。
+    """
+    user_ids = sorted(set(user_ids))
+    venue_ids = sorted(set(venue_ids))
+    local = db.get_bind().dialect.name == "sqlite"
+
+    locks = []
+    if local:
+        locks = [_local_lock(("user", u)) for u in user_ids] + [_local_lock(("venue", v)) for v in venue_ids]
+        for lock in locks:
+            lock.acquire()
+    try:
+        user_q = db.query(User).filter(User.id.in_(user_ids)).order_by(User.id)
+        venue_q = db.query(Venue).filter(Venue.id.in_(venue_ids)).order_by(Venue.id)
+        if not local:
+            user_q = user_q.with_for_update()
+            venue_q = venue_q.with_for_update()
+        users = {u.id: u for u in user_q.all()}
+        venues = {v.id: v for v in venue_q.all()}
+        yield users, venues
+    except BaseException:
+        db.rollback()
+        raise
+    finally:
+        for lock in reversed(locks):
+            lock.release()
+
+
+def check_bookable(db: Session, requests):
+    """
+    在鎖定範圍內一次檢查多筆 (user_id, venue_id, start_dt, end_dt)，回傳與 requests 等長的 list，
+    可預約的位置為 None，否則為對應的 HTTPException。
+    不論筆數都只用兩個查詢（開放時段、有效預約）；同一批內彼此衝突的，排在後面的會失敗。
+    """
+    if not requests:
+        return []
+    user_ids = {r[0] for r in requests}
+    venue_ids = {r[1] for r in requests}
+    window_start = min(r[2] for r in requests)
+    window_end = max(r[3] for r in requests)
+
+    slots = defaultdict(list)
+    for s in db.query(AvailableSlot.venue_id, AvailableSlot.start_time, AvailableSlot.end_time).filter(
+        AvailableSlot.venue_id.in_(venue_ids),
+        AvailableSlot.start_time <= window_end,
+        AvailableSlot.end_time >= window_start
+    ):
+        slots[s.venue_id].append((s.start_time, s.end_time))
+
+    # 同 user 跨場地 / 同場地的有效預約一次查出，再用 bitmap（或 availability.overlaps）判斷
+    user_busy = defaultdict(_Busy)
+    venue_busy = defaultdict(_Busy)
+    for b in db.query(Booking.user_id, Booking.venue_id, Booking.start_time, Booking.end_time).filter(
+        or_(Booking.user_id.in_(user_ids), Booking.venue_id.in_(venue_ids)),
+        Booking.start_time < window_end,
+        Booking.end_time > window_start,
+        Booking.status.in_(ACTIVE_STATUSES)
+    ):
+        user_busy[b.user_id].add(b.start_time, b.end_time)
+        venue_busy[b.venue_id].add(b.start_time, b.end_time)
+
+    results = []
+    for user_id, venue_id, start_dt, end_dt in requests:
+        # 需完整落在某一個可預約時段內（AvailableSlot）
+        if not any(s <= start_dt and e >= end_dt for s, e in slots[venue_id]):
+            results.append(HTTPException(status_code=400, detail="所選時間段不在可預約時段內"))
+        elif user_busy[user_id].overlaps(start_dt, end_dt):
+            results.append(HTTPException(status_code=409, detail="您在此時間段已經有其他場地的預約"))
+        elif venue_busy[venue_id].overlaps(start_dt, end_dt):
+            results.append(HTTPException(status_code=409, detail="該時段已被預約"))
+        else:
+            results.append(None)
+            user_busy[user_id].add(start_dt, end_dt)
+            venue_busy[venue_id].add(start_dt, end_dt)
+    return results
+
+
+def ensure_bookable(db: Session, user_id: int, venue_id: int, start_dt, end_dt):
+    """在鎖定範圍內檢查單筆時段是否可預約，不可預約時丟出 HTTPException。"""
+    error = check_bookable(db, [(user_id, venue_id, start_dt, end_dt)])[0]
+    if error:
+        raise error
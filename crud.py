@@ -0,0 +1,158 @@
+# crud.py
+# 多個 router 共用的查詢。
+#   - 只選需要的欄位並 JOIN venues，一次查詢取得場地名稱，不再每列 lazy load
+#   - 以 (start_time, id) 做 keyset 分頁：cursor 記住上一頁最後一筆，下一頁直接從索引位置往後讀，
+#     不需要 OFFSET 掃過前面的資料
+import base64
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import Session
+
+from models import Booking, BookingStatus, User, Venue
+
+PAGE_DEFAULT_LIMIT = 50
+PAGE_MAX_LIMIT = 200
+
+
+# ---------------------------
+# cursor 編碼
+# ---------------------------
+def encode_cursor(start_time: datetime, booking_id: int) -> str:
+    raw = f"{start_time.isoformat()}|{booking_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    """回傳 (start_time, id)；格式不符時丟出 HTTPException(400)。"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        start, booking_id = raw.split("|")
+        return datetime.fromisoformat(start), int(booking_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="cursor 格式錯誤")
+
+
+def parse_date_range(date_from: str = None, date_to: str = None):
+    """把 YYYY-MM-DD 轉成 [start, end)（date_to 當天也包含在內）。"""
+    try:
+        start = datetime.strptime(date_from.strip(), "%Y-%m-%d") if date_from else None
+        end = datetime.strptime(date_to.strip(), "%Y-%m-%d") + timedelta(days=1) if date_to else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="日期格式錯誤，需 YYYY-MM-DD")
+    return start, end
+
+
+def _page(q, cursor: str, limit: int, descending: bool):
+    """套用 (start_time, id) keyset 條件與排序，回傳 (rows, next_cursor)。"""
+    if cursor:
+        last_start, last_id = decode_cursor(cursor)
+        if descending:
+            q = q.filter(or_(
+                Booking.start_time < last_start,
+                and_(Booking.start_time == last_start, Booking.id < last_id),
+            ))
+        else:
+            q = q.filter(or_(
+                Booking.start_time > last_start,
+                and_(Booking.start_time == last_start, Booking.id > last_id),
+            ))
+    if descending:
+        q = q.order_by(Booking.start_time.desc(), Booking.id.desc())
+    else:
+        q = q.order_by(Booking.start_time, Booking.id)
+
+    # 多取一筆判斷是否還有下一頁
+    rows = q.limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].start_time, rows[-1].id)
+    return rows, next_cursor
+
+
+def _filter_range(q, date_from: datetime = None, date_to: datetime = None):
+    if date_from is not None:
+        q = q.filter(Booking.start_time >= date_from)
+    if date_to is not None:
+        q = q.filter(Booking.start_time < date_to)
+    return q
+
+
+# ---------------------------
+# 使用者的預約紀錄
+# ---------------------------
+def user_bookings_page(db: Session, user_id: int, status: BookingStatus = None,
+                       date_from: datetime = None, date_to: datetime = None,
+                       cursor: str = None, limit: int = PAGE_DEFAULT_LIMIT):
+    """
+    依開始時間由新到舊回傳 (rows, next_cursor)，沒有下一頁時 next_cursor 為 None。
+    rows 為查詢結果列：id, venue_id, venue_name, start_time, end_time, people_count,
+    contact_phone, student_ids, status。走 ix_bookings_user_start_end 索引。
+    """
+    q = (
+        db.query(
+            Booking.id,
+            Booking.venue_id,
+            Venue.name.label("venue_name"),
+            Booking.start_time,
+            Booking.end_time,
+            Booking.people_count,
+            Booking.contact_phone,
+            Booking.student_ids,
+            Booking.status,
+        )
+        .join(Venue, Venue.id == Booking.venue_id)
+        .filter(Booking.user_id == user_id)
+    )
+    if status is not None:
+        q = q.filter(Booking.status == status)
+    q = _filter_range(q, date_from, date_to)
+    return _page(q, cursor, limit, descending=True)
+
+
+# ---------------------------
+# 管理員待審核佇列
+# ---------------------------
+def _pending_filter(q, venue_id: int = None, date_from: datetime = None, date_to: datetime = None):
+    q = q.filter(Booking.status == BookingStatus.pending)
+    if venue_id is not None:
+        q = q.filter(Booking.venue_id == venue_id)
+    return _filter_range(q, date_from, date_to)
+
+
+def pending_bookings_page(db: Session, venue_id: int = None, date_from: datetime = None,
+                          date_to: datetime = None, cursor: str = None, limit: int = PAGE_DEFAULT_LIMIT):
+    """
+    待審核預約，依開始時間由早到晚（最先要用場地的排前面），回傳 (rows, next_cursor)。
+    rows 為查詢結果列：id, user_id, username, venue_id, venue_name, start_time, end_time,
+    people_count, contact_phone, student_ids, created_at, status, series_id。
+    """
+    q = (
+        db.query(
+            Booking.id,
+            Booking.user_id,
+            User.username,
+            Booking.venue_id,
+            Venue.name.label("venue_name"),
+            Booking.start_time,
+            Booking.end_time,
+            Booking.people_count,
+            Booking.contact_phone,
+            Booking.student_ids,
+            Booking.created_at,
+            Booking.status,
+            Booking.series_id,
+        )
+        .join(User, User.id == Booking.user_id)
+        .join(Venue, Venue.id == Booking.venue_id)
+    )
+    q = _pending_filter(q, venue_id, date_from, date_to)
+    return _page(q, cursor, limit, descending=False)
+
+
+def count_pending_bookings(db: Session, venue_id: int = None, date_from: datetime = None, date_to: datetime = None) -> int:
+    """待審核總筆數：只數 bookings 本身，不 JOIN、不取欄位。"""
+    q = _pending_filter(db.query(func.count(Booking.id)), venue_id, date_from, date_to)
+    return q.scalar()
@@ -64,9 +64,22 @@ else:
         DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql+psycopg2://", 1)
     logging.info("🌐 使用 Render PostgreSQL 連線")
 
+# 連線池設定：所有 router、背景 worker 與 LINE bot 共用同一個 engine
+#   DB_POOL_SIZE：常駐連線數；DB_MAX_OVERFLOW：尖峰時可額外開的連線數
+#   DB_POOL_TIMEOUT：連線都在使用中時最多等幾秒，逾時丟出 sqlalchemy.exc.TimeoutError
+#   DB_POOL_RECYCLE：連線使用超過幾秒就重建，避免被資料庫端或負載平衡器斷線
+pool_options = {}
+if not DATABASE_URL.startswith("sqlite"):
+    pool_options = {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "10")),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+    }
+
 # 建立資料庫引擎
 try:
-    engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+    engine = create_engine(DATABASE_URL, pool_pre_ping=True, **pool_options)
     logging.info("✅ 資料庫引擎建立成功")
 except Exception as e:
     logging.error(f"❌ 無法建立資料庫引擎: {e}")
@@ -0,0 +1,114 @@
+# email_outbox.py
+# 通知信的 transactional outbox：
+#   - 路由只呼叫 enqueue_email() 把信寫進 email_outbox 表，和預約狀態變更一起 commit
+#   - OutboxWorker 在背景執行緒批次取出待寄信件、共用同一個 SendGrid client 寄送，失敗時指數退避重試
+# 如此 /book 與審核 API 的回應時間不再受 SendGrid 影響。
+import os
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models import EmailOutbox, EmailStatus
+
+EMAIL_OUTBOX_ENABLED = os.getenv("EMAIL_OUTBOX_ENABLED", "1") == "1"
+
+
+def enqueue_email(db: Session, to_email: str, subject: str, html_content: str):
+    """把通知信加進目前的 transaction（不 commit），由呼叫端連同預約變更一起 commit。"""
+    db.add(EmailOutbox(to_email=to_email, subject=subject, html_content=html_content))
+
+
+def _default_sender(to_email, subject, html_content):
+    # 延後 import，讓測試可以只用假的 sender 而不需要 SendGrid 設定
+    from router.send_email import send_email
+    return send_email(to_email=to_email, subject=subject, html_content=html_content)
+
+
+class OutboxWorker:
+    """
+    背景寄信 worker。
+    sender(to_email, subject, html_content) 回傳 True 代表寄送成功；
+    測試時可傳入假的 sender 後直接呼叫 drain_once()。
+    """
+
+    def __init__(self, sender=None, session_factory=SessionLocal, batch_size=20,
+                 poll_interval=2.0, max_attempts=5, base_backoff=30):
+        self.sender = sender or _default_sender
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self._stop = threading.Event()
+        self._thread = None
+
+    def drain_once(self) -> int:
+        """取出一批到期的待寄信件並寄送，回傳這一批處理的筆數。"""
+        db = self.session_factory()
+        try:
+            now = datetime.now()
+            q = (
+                db.query(EmailOutbox)
+                .filter(EmailOutbox.status == EmailStatus.pending, EmailOutbox.next_attempt_at <= now)
+                .order_by(EmailOutbox.id)
+                .limit(self.batch_size)
+            )
+            # 多個 uvicorn worker 同時 drain 時，用 SKIP LOCKED 各自領不同的信
+            if db.get_bind().dialect.name != "sqlite":
+                q = q.with_for_update(skip_locked=True)
+            batch = q.all()
+
+            for msg in batch:
+                try:
+                    ok = self.sender(msg.to_email, msg.subject, msg.html_content)
+                    error = None if ok else "send failed"
+                except Exception as e:
+                    ok, error = False, str(e)[:500]
+
+                msg.attempts += 1
+                if ok:
+                    msg.status = EmailStatus.sent
+                    msg.sent_at = datetime.now()
+                    msg.last_error = None
+                elif msg.attempts >= self.max_attempts:
+                    msg.status = EmailStatus.failed
+                    msg.last_error = error
+                    logging.error(f"通知信寄送失敗且不再重試：outbox_id={msg.id}, error={error}")
+                else:
+                    msg.last_error = error
+                    msg.next_attempt_at = now + timedelta(seconds=self.base_backoff * 2 ** (msg.attempts - 1))
+            db.commit()
+            return len(batch)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                # 一批滿了代表可能還有積壓，立刻再取下一批
+                if self.drain_once() >= self.batch_size:
+                    continue
+            except Exception as e:
+                logging.error(f"Email outbox worker 錯誤：{e}")
+            self._stop.wait(self.poll_interval)
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="email-outbox", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+
+worker = OutboxWorker()
@@ -0,0 +1,85 @@
+# idempotency.py
+# Idempotency-Key 支援：手機在校園 Wi-Fi 逾時重送時，第二次起直接回傳第一次成功的回應，
+# 不再重跑驗證與 transaction（也不會再寄一次通知信）。
+#   - remember()：在同一個 transaction 內記下回應（和預約變更一起 commit）
+#   - commit()：remember() + commit；同一個 key 的並發請求搶先 commit 時改回傳它的回應
+#   - replay()：先查行程內快取，再查 idempotency_keys 表（唯一索引 key + user_id + endpoint）
+import os
+import json
+from datetime import datetime, timedelta
+
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from memory_cache import LRUCache
+from models import IdempotencyRecord
+
+IDEMPOTENCY_TTL = timedelta(hours=int(os.getenv("IDEMPOTENCY_TTL_HOURS", "24")))
+# 過期紀錄的清理頻率
+PURGE_INTERVAL = timedelta(minutes=10)
+
+_cache = LRUCache(maxsize=4096, ttl=600)
+_last_purge = datetime.min
+
+
+def replay(db: Session, key: str, user_id: int, endpoint: str):
+    """有紀錄時回傳重播用的 ORJSONResponse，否則回傳 None。"""
+    if not key:
+        return None
+    cache_key = (key, user_id, endpoint)
+    cached = _cache.get(cache_key)
+    if cached is None:
+        record = (
+            db.query(IdempotencyRecord.status_code, IdempotencyRecord.response_body)
+            .filter(
+                IdempotencyRecord.key == key,
+                IdempotencyRecord.user_id == user_id,
+                IdempotencyRecord.endpoint == endpoint,
+                IdempotencyRecord.expires_at > datetime.now(),
+            )
+            .first()
+        )
+        if not record:
+            return None
+        cached = (record.status_code, record.response_body)
+        _cache.set(cache_key, cached)
+    status_code, body = cached
+    return ORJSONResponse(content=json.loads(body), status_code=status_code, headers={"Idempotent-Replayed": "true"})
+
+
+def remember(db: Session, key: str, user_id: int, endpoint: str, body: dict, status_code: int = 200):
+    """把成功的回應加進目前的 transaction（不 commit）；沒有帶 key 時什麼都不做。"""
+    global _last_purge
+    if not key:
+        return
+    now = datetime.now()
+    if now - _last_purge > PURGE_INTERVAL:
+        db.query(IdempotencyRecord).filter(IdempotencyRecord.expires_at <= now).delete(synchronize_session=False)
+        _last_purge = now
+    db.add(IdempotencyRecord(
+        key=key,
+        user_id=user_id,
+        endpoint=endpoint,
+        status_code=status_code,
+        response_body=json.dumps(body, ensure_ascii=False),
+        expires_at=now + IDEMPOTENCY_TTL,
+    ))
+
+
+def commit(db: Session, key: str, user_id: int, endpoint: str, body: dict, status_code: int = 200):
+    """
+    remember() 後 commit，成功時回傳 None。
+    兩個帶同一個 key 的請求同時通過 replay() 檢查時，後 commit 的會撞到唯一索引：
+    整個 transaction rollback（狀態變更、通知信都不算數），改回傳先完成那次的重播回應。
+    """
+    remember(db, key, user_id, endpoint, body, status_code)
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        replayed = replay(db, key, user_id, endpoint)
+        if replayed is None:
+            raise
+        return replayed
+    return None
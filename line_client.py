@@ -0,0 +1,186 @@
+# line_client.py
+# LINE Messaging API 的非同步 client（取代同步的 LineBotApi 呼叫）：
+#   - 共用一個 httpx.AsyncClient，keep-alive 連線重複使用，不必每次回覆都重新握手
+#   - reply：同一個 reply token 一次最多帶 5 則訊息（LINE 的上限），超過的部分改用 push 補送；只送一次不重試
+#   - push：帶 X-Line-Retry-Key，逾時、429 / 5xx 依 retry budget 重試（重試數不超過請求數的 LINE_API_RETRY_RATIO），
+#     LINE 故障時不會被重試放大流量
+#   - stats() 提供各 API 的次數、錯誤、重試與延遲
+# 本機測試 / 效能測試時把 LINE_API_BASE_URL 指向 mock_line_api.py。
+import os
+import time
+import uuid
+import random
+import asyncio
+import logging
+from collections import deque
+
+import httpx
+
+LINE_API_BASE_URL = os.getenv("LINE_API_BASE_URL", "https://api.line.me")
+LINE_API_TIMEOUT = float(os.getenv("LINE_API_TIMEOUT", "5"))
+LINE_API_MAX_RETRIES = int(os.getenv("LINE_API_MAX_RETRIES", "2"))
+LINE_API_RETRY_RATIO = float(os.getenv("LINE_API_RETRY_RATIO", "0.1"))
+LINE_API_MAX_CONNECTIONS = int(os.getenv("LINE_API_MAX_CONNECTIONS", "20"))
+
+MAX_MESSAGES_PER_REQUEST = 5
+
+
+class LineApiError(Exception):
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(f"LINE API {status_code}: {detail}")
+        self.status_code = status_code
+
+
+def _as_list(messages) -> list:
+    """接受單則或多則訊息；每則可以是 line-bot-sdk 的 SendMessage 物件或已經是 dict。"""
+    if not isinstance(messages, (list, tuple)):
+        messages = [messages]
+    return [m if isinstance(m, dict) else m.as_json_dict() for m in messages]
+
+
+def _chunks(items, size):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+# ---------------------------
+# 統計 / retry budget
+# ---------------------------
+class _Metrics:
+    def __init__(self, samples: int = 1000):
+        self.attempts = 0
+        self.errors = 0
+        self.retries = 0
+        self._latency = deque(maxlen=samples)   # 最近 samples 次的延遲（秒）
+
+    def as_dict(self) -> dict:
+        latency = sorted(self._latency)
+
+        def percentile(p):
+            return round(latency[min(len(latency) - 1, int(len(latency) * p))] * 1000, 2) if latency else 0.0
+
+        return {
+            "attempts": self.attempts,
+            "errors": self.errors,
+            "retries": self.retries,
+            "p50_ms": percentile(0.5),
+            "p99_ms": percentile(0.99),
+            "max_ms": round(latency[-1] * 1000, 2) if latency else 0.0,
+        }
+
+
+class RetryBudget:
+    """每個請求存入 ratio 個額度、每次重試扣 1；最多累積 burst 個，低流量時也能重試幾次。"""
+
+    def __init__(self, ratio: float = LINE_API_RETRY_RATIO, burst: int = 10):
+        self.ratio = ratio
+        self.burst = burst
+        self.balance = float(burst)
+        self.exhausted = 0
+
+    def deposit(self):
+        self.balance = min(self.balance + self.ratio, self.burst)
+
+    def withdraw(self) -> bool:
+        if self.balance >= 1:
+            self.balance -= 1
+            return True
+        self.exhausted += 1
+        return False
+
+
+# ---------------------------
+# client
+# ---------------------------
+class LineMessagingClient:
+    def __init__(self, access_token: str, base_url: str = LINE_API_BASE_URL, timeout: float = LINE_API_TIMEOUT,
+                 max_retries: int = LINE_API_MAX_RETRIES, transport=None):
+        self.access_token = access_token
+        self.base_url = base_url
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.transport = transport   # 測試時可傳 httpx.ASGITransport(app=mock_line_api.app)
+        self.budget = RetryBudget()
+        self.metrics = {}
+        self.dropped_messages = 0
+        self._client = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        # AsyncClient 與建立它的 event loop 綁在一起，在第一次使用時才建立
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                transport=self.transport,
+                limits=httpx.Limits(max_connections=LINE_API_MAX_CONNECTIONS,
+                                    max_keepalive_connections=LINE_API_MAX_CONNECTIONS),
+                headers={"Authorization": f"Bearer {self.access_token}"},
+            )
+        return self._client
+
+    async def aclose(self):
+        client, self._client = self._client, None
+        if client is not None:
+            await client.aclose()
+
+    async def _post(self, name: str, path: str, payload: dict, idempotent: bool):
+        """
+        送出一個請求，必要時重試。
+        idempotent=False（reply）：只送一次，失敗直接丟出；LINE 可能其實已經回覆了，重送會重複回覆或被拒絕。
+        idempotent=True（push）：帶 X-Line-Retry-Key，LINE 會忽略重複的請求，逾時、429 / 5xx 都可以重試。
+        """
+        metrics = self.metrics.setdefault(name, _Metrics())
+        headers = {"X-Line-Retry-Key": str(uuid.uuid4())} if idempotent else {}
+        self.budget.deposit()
+        attempt = 0
+        while True:
+            metrics.attempts += 1
+            started = time.perf_counter()
+            try:
+                response = await self._get_client().post(path, json=payload, headers=headers)
+                if response.status_code < 400:
+                    return response
+                # 409：相同 retry key 的請求 LINE 已經處理過
+                if idempotent and response.status_code == 409 and attempt > 0:
+                    return response
+                error = LineApiError(response.status_code, response.text[:200])
+                retryable = response.status_code == 429 or response.status_code >= 500
+                retry_after = response.headers.get("Retry-After")
+            except (httpx.ConnectError, httpx.TimeoutException) as e:
+                error, retryable, retry_after = e, True, None
+            finally:
+                metrics._latency.append(time.perf_counter() - started)
+
+            metrics.errors += 1
+            if not idempotent or not retryable or attempt >= self.max_retries or not self.budget.withdraw():
+                raise error
+            attempt += 1
+            metrics.retries += 1
+            delay = float(retry_after) if retry_after and retry_after.isdigit() else 0.1 * 2 ** attempt
+            await asyncio.sleep(min(delay, self.timeout) * random.uniform(0.5, 1.0))
+
+    # ---------- 回覆 / 推播 ----------
+    async def reply(self, reply_token: str, messages, user_id: str = None):
+        """以 reply token 回覆；超過 5 則時，其餘訊息在有 user_id 時改用 push 送出，否則丟棄。"""
+        messages = _as_list(messages)
+        first, rest = messages[:MAX_MESSAGES_PER_REQUEST], messages[MAX_MESSAGES_PER_REQUEST:]
+        await self._post("reply", "/v2/bot/message/reply", {"replyToken": reply_token, "messages": first},
+                         idempotent=False)
+        if rest:
+            if user_id:
+                await self.push(user_id, rest)
+            else:
+                self.dropped_messages += len(rest)
+                logging.warning(f"LINE 回覆超過 {MAX_MESSAGES_PER_REQUEST} 則，丟棄 {len(rest)} 則")
+
+    async def push(self, to: str, messages):
+        messages = _as_list(messages)
+        for chunk in _chunks(messages, MAX_MESSAGES_PER_REQUEST):
+            await self._post("push", "/v2/bot/message/push", {"to": to, "messages": chunk}, idempotent=True)
+
+    def stats(self) -> dict:
+        return {
+            "apis": {name: m.as_dict() for name, m in self.metrics.items()},
+            "retry_budget": round(self.budget.balance, 2),
+            "retry_budget_exhausted": self.budget.exhausted,
+            "dropped_messages": self.dropped_messages,
+        }
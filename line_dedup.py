@@ -0,0 +1,114 @@
+# line_dedup.py
+# LINE webhook 事件去重：/callback 回應太慢或失敗時，LINE 會重送同一個事件（webhookEventId 相同、
+# deliveryContext.isRedelivery 為 true）。重送的事件再查一次資料庫、用已失效的 reply token 回覆都是浪費，
+# 所以在排入背景處理之前就擋掉。
+#   - key：webhookEventId（舊格式沒有時用 reply token）
+#   - 本機：固定容量、LINE_DEDUP_TTL 秒後過期的 LRU，記憶體有上限
+#   - 設定 LINE_DEDUP_REDIS_URL（且有安裝 redis 套件）時，另以 Redis SET NX 讓多個 uvicorn worker 共用
+import os
+import math
+import asyncio
+import logging
+
+from memory_cache import LRUCache
+
+LINE_DEDUP_TTL = float(os.getenv("LINE_DEDUP_TTL", "3600"))
+LINE_DEDUP_MAX_KEYS = int(os.getenv("LINE_DEDUP_MAX_KEYS", "100000"))
+LINE_DEDUP_REDIS_URL = os.getenv("LINE_DEDUP_REDIS_URL")
+
+
+def _event_key(event):
+    event_id = getattr(event, "webhook_event_id", None)
+    if event_id:
+        return f"event:{event_id}"
+    reply_token = getattr(event, "reply_token", None)
+    return f"reply:{reply_token}" if reply_token else None
+
+
+class RedisSeenStore:
+    """多 worker 共用的「已處理」紀錄；add() 第一次看到該 key 時回傳 True。"""
+
+    def __init__(self, url: str, prefix: str = "line:seen:"):
+        import redis   # 選用套件，只有設定 LINE_DEDUP_REDIS_URL 時才需要
+        self._redis = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def add(self, key: str, ttl: float) -> bool:
+        return bool(self._redis.set(self.prefix + key, 1, nx=True, ex=max(1, math.ceil(ttl))))
+
+    def discard(self, key: str):
+        self._redis.delete(self.prefix + key)
+
+
+def _create_shared_store():
+    if LINE_DEDUP_REDIS_URL:
+        try:
+            return RedisSeenStore(LINE_DEDUP_REDIS_URL)
+        except Exception as e:
+            logging.warning(f"⚠️ Redis 去重無法使用，只在本機去重：{e}")
+    return None
+
+
+class EventDeduplicator:
+    def __init__(self, ttl: float = LINE_DEDUP_TTL, max_keys: int = LINE_DEDUP_MAX_KEYS, shared=None):
+        self.ttl = ttl
+        self.shared = shared if shared is not None else _create_shared_store()
+        self._seen = LRUCache(maxsize=max_keys, ttl=ttl)
+        self.checked = 0
+        self.duplicates = 0
+        self.redeliveries = 0
+        self.forgotten = 0
+        self.shared_errors = 0
+
+    async def is_new(self, event) -> bool:
+        """第一次看到這個事件時記下並回傳 True；重複的事件回傳 False 並計數。排入處理失敗時需呼叫 forget()。"""
+        key = _event_key(event)
+        if key is None:
+            return True
+        self.checked += 1
+        if getattr(getattr(event, "delivery_context", None), "is_redelivery", False):
+            self.redeliveries += 1
+        if key in self._seen:
+            self.duplicates += 1
+            return False
+        self._seen.set(key, True)
+        if self.shared is not None:
+            try:
+                # Redis 是網路呼叫，不在 event loop 上等
+                if not await asyncio.to_thread(self.shared.add, key, self.ttl):
+                    self.duplicates += 1
+                    return False
+            except Exception as e:
+                # Redis 故障時只靠本機紀錄，寧可偶爾重複處理也不要漏掉事件
+                self.shared_errors += 1
+                logging.error(f"LINE 事件去重（Redis）失敗：{e}")
+        return True
+
+    async def forget(self, event):
+        """is_new() 之後沒能排入處理（例如 dispatcher 已滿）：撤銷紀錄，LINE 重送時才會再處理。"""
+        key = _event_key(event)
+        if key is None:
+            return
+        self._seen.pop(key)
+        self.forgotten += 1
+        if self.shared is not None:
+            try:
+                await asyncio.to_thread(self.shared.discard, key)
+            except Exception as e:
+                self.shared_errors += 1
+                logging.error(f"LINE 事件去重（Redis）撤銷失敗：{e}")
+
+    def stats(self) -> dict:
+        return {
+            "checked": self.checked,
+            "duplicates_dropped": self.duplicates,
+            "redeliveries": self.redeliveries,
+            "forgotten": self.forgotten,
+            "shared_store": self.shared is not None,
+            "shared_errors": self.shared_errors,
+            "size": len(self._seen),
+            "ttl": self.ttl,
+        }
+
+
+deduplicator = EventDeduplicator()
@@ -0,0 +1,97 @@
+# line_dispatcher.py
+# LINE webhook 事件的背景處理：
+#   - /callback 驗完簽章就回 200，事件交給這裡處理，不佔住 event loop 也不讓 LINE 等待
+#   - handler 可以是一般函式或 async 函式；查資料庫等阻塞工作在獨立、有上限的 thread pool 執行
+#     （LINE_WORKERS），不與 FastAPI 共用的 threadpool 搶 thread
+#   - 同一個使用者（聊天室）的事件依收到順序一個接一個處理；不同使用者之間並行
+#   - 尚未處理完的事件超過 LINE_MAX_PENDING 時直接丟棄並記錄，不讓記憶體無限堆積
+import os
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+LINE_WORKERS = int(os.getenv("LINE_WORKERS", "8"))
+LINE_MAX_PENDING = int(os.getenv("LINE_MAX_PENDING", "1000"))
+
+
+def _source_key(event) -> str:
+    """事件來源：群組 / 聊天室以整個對話為單位，其餘以使用者為單位。"""
+    source = getattr(event, "source", None)
+    for attr in ("group_id", "room_id", "user_id"):
+        value = getattr(source, attr, None)
+        if value:
+            return f"{attr}:{value}"
+    return "unknown"
+
+
+class LineEventDispatcher:
+    def __init__(self, handler, workers: int = LINE_WORKERS, max_pending: int = LINE_MAX_PENDING):
+        self.handler = handler
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self.processed = 0
+        self.failed = 0
+        self.dropped = 0
+        self._executor = None
+        self._tails = {}   # 來源 → 該來源最後一個排入的 task，下一個事件要等它結束
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="line-event")
+        return self._executor
+
+    def submit(self, event) -> bool:
+        """在 event loop 中呼叫；排入成功回傳 True，超過上限時回傳 False（事件被丟棄）。"""
+        if self.pending >= self.max_pending:
+            self.dropped += 1
+            logging.error("LINE 事件排隊數已達上限，丟棄事件")
+            return False
+        key = _source_key(event)
+        previous = self._tails.get(key)
+        self.pending += 1
+        self._tails[key] = asyncio.get_running_loop().create_task(self._run(key, previous, event))
+        return True
+
+    async def _run(self, key, previous, event):
+        try:
+            if previous is not None:
+                # 只等前一個事件結束，不論成功或失敗
+                await asyncio.wait([previous])
+            if asyncio.iscoroutinefunction(self.handler):
+                await self.handler(event)
+            else:
+                await self.run_blocking(self.handler, event)
+            self.processed += 1
+        except Exception as e:
+            self.failed += 1
+            logging.error(f"LINE 事件處理失敗：{e}")
+        finally:
+            self.pending -= 1
+            if self._tails.get(key) is asyncio.current_task():
+                del self._tails[key]
+
+    async def run_blocking(self, fn, *args):
+        """async handler 內要做阻塞工作（查資料庫）時，丟到同一個有上限的 thread pool。"""
+        return await asyncio.get_running_loop().run_in_executor(self._get_executor(), fn, *args)
+
+    async def drain(self, timeout: float = None):
+        """等待目前排入的事件全部處理完（關機前 / 測試用）。"""
+        tasks = list(self._tails.values())
+        if tasks:
+            await asyncio.wait(tasks, timeout=timeout)
+
+    def stop(self):
+        executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+            "processed": self.processed,
+            "failed": self.failed,
+            "dropped": self.dropped,
+        }
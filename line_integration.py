@@ -1,18 +1,31 @@
 # line_integration.py
 import os
+import logging
+from contextlib import contextmanager
 from fastapi import APIRouter, Request, HTTPException
 from fastapi.responses import PlainTextResponse, JSONResponse
 import psycopg2
 import psycopg2.extras
-from linebot import LineBotApi, WebhookParser
+from linebot import WebhookParser
 from linebot.exceptions import InvalidSignatureError
 from linebot.models import (
     MessageEvent, TextMessage, TextSendMessage,
     QuickReply, QuickReplyButton, MessageAction
 )
 from datetime import datetime
+from collections import defaultdict
+from availability import free_slots
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from database import SessionLocal, engine
+from slot_search import find_next_free
+from venue_catalog import catalog as venue_catalog
+from line_dispatcher import LineEventDispatcher
+from line_client import LineMessagingClient
+from line_reply_cache import reply_cache
+from line_dedup import deduplicator
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 now = datetime.now()
 
@@ -20,29 +33,36 @@ now = datetime.now()
 LINE_CHANNEL_SECRET = os.getenv("LINE_CHANNEL_SECRET")
 LINE_CHANNEL_ACCESS_TOKEN = os.getenv("LINE_CHANNEL_ACCESS_TOKEN")
 
-DB_HOST = os.getenv("DB_HOST")
-DB_PORT = os.getenv("DB_PORT", "5432")
-DB_NAME = os.getenv("DB_NAME")
-DB_USER = os.getenv("DB_USER")
-DB_PASSWORD = os.getenv("DB_PASSWORD")
-
 if not (LINE_CHANNEL_SECRET and LINE_CHANNEL_ACCESS_TOKEN):
     raise RuntimeError("請先設定 LINE_CHANNEL_SECRET 與 LINE_CHANNEL_ACCESS_TOKEN 環境變數")
 
-# LINE SDK 初始化
-line_bot_api = LineBotApi(LINE_CHANNEL_ACCESS_TOKEN)
+# LINE SDK 只用來驗證簽章、解析事件；回覆改用非同步的 line_client（keep-alive 連線、重試、統計）
+line_client = LineMessagingClient(LINE_CHANNEL_ACCESS_TOKEN)
 parser = WebhookParser(LINE_CHANNEL_SECRET)
 
 # ---------- DB helper ----------
-def get_db_connection():
-    conn = psycopg2.connect(
-        host=DB_HOST,
-        port=DB_PORT,
-        dbname=DB_NAME,
-        user=DB_USER,
-        password=DB_PASSWORD
-    )
-    return conn
+class DatabaseBusy(Exception):
+    """連線池的連線都在使用中，等待逾時"""
+
+
+@contextmanager
+def db_cursor():
+    """
+    從 database.engine 的連線池借一條連線，回傳 DictCursor。
+    離開 with 區塊時（包含提早 return 與例外）一定關閉 cursor、把連線還回池子（未 commit 的交易會被 rollback）。
+    """
+    try:
+        conn = engine.raw_connection()
+    except PoolTimeoutError:
+        raise DatabaseBusy("資料庫忙碌中，請稍後再試")
+    try:
+        cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
+        try:
+            yield cur
+        finally:
+            cur.close()
+    finally:
+        conn.close()
 
 def format_time(dt):
     if isinstance(dt, (str,)):
@@ -56,15 +76,49 @@ def format_time(dt):
     else:
         return str(dt)
 
-# ---------- helper: 取得所有場地 ----------
+# ---------- helper: 今日起尚未被預約的時段 ----------
+def fetch_free_slots(cur, today, venue_id=None):
+    """
+    回傳 today 起開放、且未被有效預約（pending / approved）佔用的時段，依場地、開始時間排序。
+    開放時段與預約各查一次，再交給 availability.free_slots 做區間掃描。
+    """
+    slot_filter = "AND s.venue_id = %s" if venue_id is not None else ""
+    booking_filter = "AND b.venue_id = %s" if venue_id is not None else ""
+    params = (today, venue_id) if venue_id is not None else (today,)
+    cur.execute(f"""
+        SELECT s.venue_id, v.name AS venue_name, s.start_time, s.end_time
+        FROM available_slots s
+        JOIN venues v ON s.venue_id = v.id
+        WHERE s.start_time::date >= %s {slot_filter}
+        ORDER BY v.id, s.start_time;
+    """, params)
+    slots = cur.fetchall()
+    if not slots:
+        return []
+
+    cur.execute(f"""
+        SELECT b.venue_id, b.start_time, b.end_time
+        FROM bookings b
+        WHERE b.end_time > %s
+          AND b.status IN ('pending', 'approved')
+          {booking_filter};
+    """, params)
+    busy = defaultdict(list)
+    for r in cur.fetchall():
+        busy[r["venue_id"]].append((r["start_time"], r["end_time"]))
+
+    by_venue = defaultdict(list)
+    for r in slots:
+        by_venue[r["venue_id"]].append(r)
+
+    result = []
+    for vid, venue_slots in by_venue.items():
+        result.extend(free_slots(venue_slots, busy[vid], key=lambda r: (r["start_time"], r["end_time"])))
+    return result
+
+# ---------- helper: 取得所有場地（記憶體內的場地清單，不查資料庫） ----------
 def get_all_venues():
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
-    cur.execute("SELECT id, name FROM venues ORDER BY id;")
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
-    return [{"id": r["id"], "name": r["name"]} for r in rows]
+    return [{"id": v.id, "name": v.name} for v in venue_catalog.all()]
 
 # ---------- helper: 所有場地名稱 ----------
 def get_all_venue_names():
@@ -72,12 +126,11 @@ def get_all_venue_names():
 
 # ---------- helper: 建立 QuickReply 按鈕 ----------
 def get_quickreply_for_venues():
-    venues = get_all_venues()
     buttons = []
-    for v in venues:
+    for v in venue_catalog.all():
         buttons.append(
             QuickReplyButton(
-                action=MessageAction(label=v["name"], text=v["name"])
+                action=MessageAction(label=v.name, text=v.name)
             )
         )
     return QuickReply(items=buttons)
@@ -86,13 +139,7 @@ def get_quickreply_for_venues():
 @router.get("/api/opened_venues")
 def api_opened_venues():
     try:
-        conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
-        cur.execute("SELECT id, name, capacity FROM venues ORDER BY id;")
-        rows = cur.fetchall()
-        venues = [{"id": r["id"], "name": r["name"], "capacity": r["capacity"]} for r in rows]
-        cur.close()
-        conn.close()
+        venues = [{"id": v.id, "name": v.name, "capacity": v.capacity} for v in venue_catalog.all()]
         return JSONResponse({"venues": venues})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -101,39 +148,32 @@ def api_opened_venues():
 @router.get("/api/available_slots")
 def api_available_slots(venue_id: int):
     try:
-        conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
-        cur.execute("SELECT name FROM venues WHERE id = %s;", (venue_id,))
-        v = cur.fetchone()
+        v = venue_catalog.by_id(venue_id)
         if not v:
-            cur.close()
-            conn.close()
             raise HTTPException(status_code=404, detail="Venue not found")
 
-        venue_name = v["name"]
+        venue_name = v.name
         today = datetime.now().date()
+        with db_cursor() as cur:
+            rows = fetch_free_slots(cur, today, venue_id)
 
-        cur.execute("""
-            SELECT s.start_time, s.end_time
-            FROM available_slots s
-            LEFT JOIN bookings b 
-              ON s.venue_id = b.venue_id 
-              AND s.start_time = b.start_time
-            WHERE s.venue_id = %s AND s.start_time::date >= %s AND b.id IS NULL
-            ORDER BY s.start_time;
-        """, (venue_id, today))
-        rows = cur.fetchall()
         slots = [{"start": format_time(r["start_time"]), "end": format_time(r["end_time"])} for r in rows]
-
-        cur.close()
-        conn.close()
         return JSONResponse({"venue": venue_name, "slots": slots})
+    except HTTPException:
+        raise
+    except DatabaseBusy as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 # ---------- LINE webhook: /callback ----------
 @router.post("/callback", response_class=PlainTextResponse)
 async def callback(request: Request):
+    """
+    驗證簽章後立即回 200；事件交給 dispatcher 在背景處理（同一使用者依序、不同使用者並行）。
+    LINE 重送的事件（webhookEventId 已處理過）在這裡就丟掉，不查資料庫也不回覆。
+    dispatcher 排隊已滿時回 503，讓 LINE 稍後重送。
+    """
     body = await request.body()
     signature = request.headers.get("x-line-signature") or request.headers.get("X-Line-Signature")
     if signature is None:
@@ -144,122 +184,115 @@ async def callback(request: Request):
     except InvalidSignatureError:
         raise HTTPException(status_code=400, detail="Invalid signature")
 
+    rejected = False
     for event in events:
         if event.type == "message" and event.message.type == "text":
-            user_text = event.message.text.strip()
-            reply_text = "請使用下方選單快速查詢：可預約時段 / 目前有開放的場地嗎"
-
-            # ----------- 可預約時段二階段 QuickReply -----------
-            if user_text == "可預約時段":
-                try:
-                    quickreply = get_quickreply_for_venues()
-                    line_bot_api.reply_message(
-                        event.reply_token,
-                        TextSendMessage(
-                            text="請先選擇場地：",
-                            quick_reply=quickreply
-                        )
-                    )
-                    continue  # 不執行後續 reply_text
-                except Exception as e:
-                    reply_text = f"查詢時發生錯誤：{e}"
-
-            # 使用者回覆場地名稱
-            elif user_text in get_all_venue_names():
-                try:
-                    venue_name = user_text
-                    conn = get_db_connection()
-                    cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
-                    cur.execute("SELECT id FROM venues WHERE name = %s;", (venue_name,))
-                    v = cur.fetchone()
-                    cur.close()
-                    conn.close()
-                    if not v:
-                        reply_text = "查無該場地。"
-                    else:
-                        venue_id = v["id"]
-                        reply_text = get_slots_text_for_venue(venue_id)
-                except Exception as e:
-                    reply_text = f"查詢時發生錯誤：{e}"
-
-            # ----------- 目前有開放的場地 -----------
-            elif user_text in ["目前有開放的場地嗎", "目前有開放的場地嗎?", "目前有開放的場地嗎？"] \
-                    or "目前有開放的場地" in user_text:
-                try:
-                    reply_text = get_open_venues_text()
-                except Exception as e:
-                    reply_text = f"查詢時發生錯誤：{e}"
-
-            # ----------- 指定場地時段 -----------
-            elif user_text.startswith("available:"):
-                try:
-                    _, vid = user_text.split(":", 1)
-                    vid = int(vid)
-                    reply_text = get_slots_text_for_venue(vid)
-                except:
-                    reply_text = "參數格式錯誤，請傳 available:<venue_id>（例如 available:4）"
-
-            # 回覆 LINE
-            try:
-                line_bot_api.reply_message(
-                    event.reply_token,
-                    TextSendMessage(text=reply_text)
-                )
-            except Exception as e:
-                print("LINE reply error:", e)
+            if await deduplicator.is_new(event) and not dispatcher.submit(event):
+                # 排隊已滿：撤銷去重紀錄，讓 LINE 重送時這個事件還能被處理（已排入的事件重送時會被去重擋掉）
+                await deduplicator.forget(event)
+                rejected = True
 
+    if rejected:
+        raise HTTPException(status_code=503, detail="LINE 事件處理忙碌中")
     return "OK"
 
 
+# ---------- 事件處理：build_reply 在 dispatcher 的 thread pool 執行（可以阻塞），回覆走 async client ----------
+def build_reply(user_text: str):
+    reply_text = "請使用下方選單快速查詢：可預約時段 / 目前有開放的場地嗎"
+
+    # ----------- 可預約時段二階段 QuickReply -----------
+    if user_text == "可預約時段":
+        try:
+            return TextSendMessage(text="請先選擇場地：", quick_reply=get_quickreply_for_venues())
+        except Exception as e:
+            reply_text = f"查詢時發生錯誤：{e}"
+
+    # 使用者回覆場地名稱（名稱 → id 由場地清單快取直接對應）
+    elif venue_catalog.by_name(user_text):
+        try:
+            reply_text = get_slots_text_for_venue(venue_catalog.by_name(user_text).id)
+        except Exception as e:
+            reply_text = f"查詢時發生錯誤：{e}"
+
+    # ----------- 目前有開放的場地 -----------
+    elif user_text in ["目前有開放的場地嗎", "目前有開放的場地嗎?", "目前有開放的場地嗎？"] \
+            or "目前有開放的場地" in user_text:
+        try:
+            reply_text = get_open_venues_text()
+        except Exception as e:
+            reply_text = f"查詢時發生錯誤：{e}"
+
+    # ----------- 指定場地時段 -----------
+    elif user_text.startswith("available:"):
+        try:
+            _, vid = user_text.split(":", 1)
+            vid = int(vid)
+            reply_text = get_slots_text_for_venue(vid)
+        except:
+            reply_text = "參數格式錯誤，請傳 available:<venue_id>（例如 available:4）"
+
+    # ----------- 跨場地最近空檔 -----------
+    elif user_text == "最近空檔" or user_text.startswith("next:"):
+        try:
+            duration, people = 60, 1
+            if user_text.startswith("next:"):
+                parts = user_text.split(":")[1:]
+                duration = int(parts[0])
+                if len(parts) > 1:
+                    people = int(parts[1])
+            reply_text = get_next_free_text(duration, people)
+        except ValueError:
+            reply_text = "參數格式錯誤，請傳 next:<分鐘>[:<人數>]（例如 next:60:4）"
+        except Exception as e:
+            reply_text = f"查詢時發生錯誤：{e}"
+
+    return TextSendMessage(text=reply_text)
+
+
+async def handle_event(event):
+    message = await dispatcher.run_blocking(build_reply, event.message.text.strip())
+
+    # 回覆 LINE
+    try:
+        await line_client.reply(event.reply_token, message, user_id=getattr(event.source, "user_id", None))
+    except Exception:
+        logger.exception("LINE 回覆失敗")
+
+
+dispatcher = LineEventDispatcher(handle_event)
+
+
 # ---------- helper: 開放場地查詢 ----------
 def get_open_venues_text():
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
-
-    cur.execute("""
-        SELECT id, name, capacity,
-               COALESCE(remarks, '無特殊備註') AS remarks,
-               COALESCE(is_open, TRUE) AS is_open
-        FROM venues
-        ORDER BY id;
-    """)
-    rows = cur.fetchall()
+    return reply_cache.get(("venues",), _render_open_venues_text)
 
-    if not rows:
+def _render_open_venues_text():
+    venues = venue_catalog.all()
+
+    if not venues:
         return "目前沒有開放的場地。"
 
     text_lines = ["🔹 目前場地概況："]
 
-    for r in rows:
-        status = "✅  開放中" if r["is_open"] else "⛔  關閉 / 維護中"
+    for v in venues:
+        status = "✅  開放中" if v.is_open else "⛔  關閉 / 維護中"
         text_lines.append(
-            f"• {r['name']}（至多 {r['capacity']} 人）\n"
+            f"• {v.name}（至多 {v.capacity} 人）\n"
             f"  {status}\n"
-            f"  💬 備註：{r['remarks']}"
+            f"  💬 備註：{v.remarks}"
         )
 
-    cur.close()
-    conn.close()
     return "\n".join(text_lines)
 
 # ---------- helper: 所有可預約時段 ----------
 def get_all_slots_text():
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
     today = datetime.now().date()
+    return reply_cache.get(("all", today), _render_all_slots_text, today)
 
-    cur.execute("""
-        SELECT s.venue_id, v.name AS venue_name, s.start_time, s.end_time
-        FROM available_slots s
-        JOIN venues v ON s.venue_id = v.id
-        LEFT JOIN bookings b 
-          ON s.venue_id = b.venue_id 
-          AND s.start_time = b.start_time
-        WHERE s.start_time::date >= %s AND b.id IS NULL
-        ORDER BY v.id, s.start_time;
-    """, (today,))
-    
-    rows = cur.fetchall()
+def _render_all_slots_text(today):
+    with db_cursor() as cur:
+        rows = fetch_free_slots(cur, today)
     if not rows:
         return "目前沒有可預約時段。"
 
@@ -272,36 +305,19 @@ def get_all_slots_text():
             text_lines.append(f"\n🏟️ {current_venue}")
         text_lines.append(f" - {format_time(r['start_time'])} ～ {format_time(r['end_time'])}")
 
-    cur.close()
-    conn.close()
     return "\n".join(text_lines)
 
 # ---------- helper: 指定場地時段 ----------
 def get_slots_text_for_venue(venue_id: int):
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
     today = datetime.now().date()
-
-    cur.execute("SELECT name FROM venues WHERE id = %s;", (venue_id,))
-    v = cur.fetchone()
+    v = venue_catalog.by_id(venue_id)
     if not v:
-        cur.close()
-        conn.close()
         return "查無該場地。"
+    return reply_cache.get(("venue", venue_id, today), _render_slots_text_for_venue, v.name, venue_id, today)
 
-    venue_name = v["name"]
-
-    cur.execute("""
-        SELECT s.start_time, s.end_time
-        FROM available_slots s
-        LEFT JOIN bookings b 
-          ON s.venue_id = b.venue_id 
-          AND s.start_time = b.start_time
-        WHERE s.venue_id = %s AND s.start_time::date >= %s AND b.id IS NULL
-        ORDER BY s.start_time;
-    """, (venue_id, today))
-
-    rows = cur.fetchall()
+def _render_slots_text_for_venue(venue_name, venue_id, today):
+    with db_cursor() as cur:
+        rows = fetch_free_slots(cur, today, venue_id)
     if not rows:
         return f"🏟️ {venue_name}\n目前沒有可預約時段。"
 
@@ -309,11 +325,42 @@ def get_slots_text_for_venue(venue_id: int):
     for r in rows:
         lines.append(f"• {format_time(r['start_time'])} ～ {format_time(r['end_time'])}")
 
-    cur.close()
-    conn.close()
+    return "\n".join(lines)
+
+# ---------- helper: 跨場地最近空檔 ----------
+def get_next_free_text(duration_minutes: int = 60, people_count: int = 1, limit: int = 5):
+    db = SessionLocal()
+    try:
+        found = find_next_free(db, duration_minutes, people_count, limit=limit)
+    finally:
+        db.close()
+
+    if not found:
+        return "近期沒有符合條件的空檔。"
+
+    lines = [f"⏱️ 最近的 {len(found)} 個空檔（{duration_minutes} 分鐘、{people_count} 人）："]
+    for f in found:
+        lines.append(f"• {f['start'].strftime('%m/%d')} {format_time(f['start'])} ～ {format_time(f['end'])}  {f['venue_name']}")
     return "\n".join(lines)
 
 # ---------- health check ----------
 @router.get("/health")
 def health():
     return {"status": "ok"}
+
+# ---------- 監控：背景事件處理狀況 ----------
+@router.get("/api/line_dispatcher/stats")
+def line_dispatcher_stats():
+    return dispatcher.stats()
+
+@router.get("/api/line_client/stats")
+def line_client_stats():
+    return line_client.stats()
+
+@router.get("/api/line_reply_cache/stats")
+def line_reply_cache_stats():
+    return reply_cache.stats()
+
+@router.get("/api/line_dedup/stats")
+def line_dedup_stats():
+    return deduplicator.stats()
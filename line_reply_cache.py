@@ -0,0 +1,71 @@
+# line_reply_cache.py
+# LINE bot 回覆文字的快取：大家問的多半是同樣幾個問題（開放場地、某場地的可預約時段），
+# 組好的文字依 key 存起來，命中時只是一次 dict 查詢，不必再查兩次資料庫、逐列 format_time。
+#   key：("venues",)、("all", 日期)、("venue", 場地 id, 日期)
+#   - 預約 / 時段異動：透過 availability_cache.add_listener 收到 (venue_id, day)，
+#     清掉該場地與總表中涵蓋這一天的文字（其他 worker 的異動由 availability_cache 的 listener 轉達）
+#   - 場地名稱 / 開放狀態改變：每筆快取記住產生時的場地清單快照，快照換新就視為過期
+#   - 清掉後不主動重建，下一次有人問時才重新產生；同一個 key 同時只有一個 thread 在產生
+import os
+import threading
+from datetime import date
+
+import availability_cache
+from memory_cache import LRUCache
+from venue_catalog import catalog as venue_catalog
+
+LINE_REPLY_CACHE_SIZE = int(os.getenv("LINE_REPLY_CACHE_SIZE", "512"))
+# 萬一漏掉失效通知，最久這麼多秒後重新產生
+LINE_REPLY_CACHE_TTL = float(os.getenv("LINE_REPLY_CACHE_TTL", "300"))
+
+
+class ReplyTextCache:
+    def __init__(self, maxsize: int = LINE_REPLY_CACHE_SIZE, ttl: float = LINE_REPLY_CACHE_TTL):
+        self._cache = LRUCache(maxsize=maxsize, ttl=ttl)   # key → (場地清單快照, 文字)
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        # 每次失效 +1；產生期間若有失效，產生出來的文字可能已過期，不放進快取
+        self._generation = 0
+        self.renders = 0
+        self.invalidations = 0
+
+    def _lock_for(self, key) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def get(self, key, render, *args) -> str:
+        catalog = venue_catalog.get()
+        entry = self._cache.get(key)
+        if entry is not None and entry[0] is catalog:
+            return entry[1]
+        with self._lock_for(key):
+            # 等鎖期間可能已經有其他 thread 產生好了
+            entry = self._cache.get(key)
+            if entry is not None and entry[0] is catalog:
+                return entry[1]
+            generation = self._generation
+            text = render(*args)
+            self.renders += 1
+            if generation == self._generation:
+                self._cache.set(key, (catalog, text))
+        return text
+
+    def invalidate(self, venue_id: int, day: date):
+        """場地 venue_id 在 day 有異動：day 當天以前產生的文字都涵蓋了這一天（查詢範圍是「今天以後」）。"""
+        self._generation += 1
+        self.invalidations += 1
+        self._cache.pop_where(
+            lambda key: (key[0] == "all" and key[1] <= day)
+            or (key[0] == "venue" and key[1] == venue_id and key[2] <= day)
+        )
+
+    def clear(self):
+        self._generation += 1
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        return {**self._cache.stats(), "renders": self.renders, "invalidations": self.invalidations}
+
+
+reply_cache = ReplyTextCache()
+availability_cache.add_listener(reply_cache.invalidate)
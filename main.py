@@ -1,12 +1,19 @@
 from fastapi import FastAPI, HTTPException, Depends
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
 from database import engine, get_db, test_connection, Base
 from models import Base, User
 from router.users import router as users_router
-from router import booking, cms, available_slots, my_reservations
+from router import booking, booking_series, cms, available_slots, my_reservations, admin_slot
 from sqlalchemy import text
-from line_integration import router as line_router
+from line_integration import router as line_router, dispatcher as line_dispatcher, line_client
+from email_outbox import EMAIL_OUTBOX_ENABLED, worker as email_worker
+from availability_cache import listener as availability_cache_listener
+from password_hashing import hasher as password_hasher
+from rate_limit import RateLimitMiddleware
+from username_index import index as username_index
+import logging
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from pathlib import Path
@@ -16,7 +23,11 @@ import json
 # 建立資料表
 Base.metadata.create_all(bind=engine)
 
-app = FastAPI()
+# 回應一律用 orjson 序列化（列表 endpoint 另以 schemas 的 response model 處理日期格式）
+app = FastAPI(default_response_class=ORJSONResponse)
+
+# 限流：/login、/register、/book（放在 CORS 內層，429 回應也帶 CORS header）
+app.add_middleware(RateLimitMiddleware)
 
 # CORS 設定
 app.add_middleware(
@@ -25,17 +36,46 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # 分頁資訊放在 header，跨網域時前端需要讀得到
+    expose_headers=["X-Next-Cursor", "X-Total-Count"],
 )
 
 # 掛載路由
 app.include_router(users_router)
 app.include_router(booking.router)
+app.include_router(booking_series.router)
 app.include_router(cms.router)
 app.include_router(available_slots.router, prefix="/api")
 app.include_router(booking.router, prefix="/api")
+app.include_router(booking_series.router, prefix="/api")
 app.include_router(my_reservations.router, prefix="/api")
+app.include_router(admin_slot.router)
 app.include_router(line_router)    # LINE Bot
 
+# 背景工作：寄信 worker（email_outbox）、可預約時段快取的跨 worker 失效監聽、密碼雜湊 process pool、帳號索引、LINE 事件處理
+@app.on_event("startup")
+def start_background_workers():
+    if EMAIL_OUTBOX_ENABLED:
+        email_worker.start()
+    availability_cache_listener.start()
+    password_hasher.start()
+    try:
+        username_index.build()
+    except Exception as e:
+        # 建立失敗時 /check_username 照舊查資料庫
+        logging.error(f"帳號索引建立失敗：{e}")
+
+@app.on_event("shutdown")
+def stop_background_workers():
+    email_worker.stop()
+    availability_cache_listener.stop()
+    password_hasher.stop()
+    line_dispatcher.stop()
+
+@app.on_event("shutdown")
+async def close_line_client():
+    # httpx.AsyncClient 要在 event loop 內關閉
+    await line_client.aclose()
 
 @app.get("/")
 def home():
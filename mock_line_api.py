@@ -0,0 +1,119 @@
+# mock_line_api.py
+# 本機用的 LINE Messaging API 替身，給測試與效能測試使用（不會真的送出訊息）：
+#   - 實作 reply / push，檢查 access token、訊息數上限、reply token 只能用一次、push 的 X-Line-Retry-Key
+#   - MOCK_LINE_LATENCY 模擬 LINE 的回應時間，MOCK_LINE_FAILURE_RATE 隨機回 500
+#   - 收到的訊息記在 app.state.received，GET /mock/received 可查看
+# 用法：uvicorn mock_line_api:app --port 8081，再以 LINE_API_BASE_URL=http://localhost:8081 啟動主程式；
+#      程式內測試可用 httpx.ASGITransport(app=mock_line_api.app) 直接接上 line_client，
+#      效能測試用 serve_in_background() 另開一個行程跑真的 HTTP server。
+import os
+import time
+import random
+import asyncio
+
+from fastapi import FastAPI, Header, HTTPException
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from typing import List, Optional
+
+from memory_cache import LRUCache
+
+MOCK_LINE_LATENCY = float(os.getenv("MOCK_LINE_LATENCY", "0.05"))
+MOCK_LINE_FAILURE_RATE = float(os.getenv("MOCK_LINE_FAILURE_RATE", "0"))
+MOCK_LINE_ACCESS_TOKEN = os.getenv("LINE_CHANNEL_ACCESS_TOKEN")
+
+app = FastAPI()
+app.state.latency = MOCK_LINE_LATENCY
+app.state.failure_rate = MOCK_LINE_FAILURE_RATE
+app.state.received = []
+_used_reply_tokens = LRUCache(maxsize=100000, ttl=600)
+_retry_keys = LRUCache(maxsize=100000, ttl=600)
+
+
+class ReplyRequest(BaseModel):
+    replyToken: str
+    messages: List[dict]
+
+
+class PushRequest(BaseModel):
+    to: str
+    messages: List[dict]
+
+
+async def _handle(authorization: Optional[str], messages: list, retry_key: Optional[str] = None):
+    if MOCK_LINE_ACCESS_TOKEN and authorization != f"Bearer {MOCK_LINE_ACCESS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Authentication failed")
+    if not 1 <= len(messages) <= 5:
+        raise HTTPException(status_code=400, detail="The request body has 1 error(s)")
+    if retry_key and retry_key in _retry_keys:
+        return JSONResponse({"message": "The retry key is already accepted"}, status_code=409)
+    await asyncio.sleep(app.state.latency)
+    if random.random() < app.state.failure_rate:
+        raise HTTPException(status_code=500, detail="Internal server error")
+    if retry_key:
+        _retry_keys.set(retry_key, True)
+    return None
+
+
+# ---------------------------
+# Messaging API
+# ---------------------------
+@app.post("/v2/bot/message/reply")
+async def reply(body: ReplyRequest, authorization: Optional[str] = Header(None)):
+    if body.replyToken in _used_reply_tokens:
+        raise HTTPException(status_code=400, detail="Invalid reply token")
+    await _handle(authorization, body.messages)
+    _used_reply_tokens.set(body.replyToken, True)
+    app.state.received.append({"type": "reply", "to": body.replyToken, "messages": body.messages})
+    return {}
+
+
+@app.post("/v2/bot/message/push")
+async def push(body: PushRequest, authorization: Optional[str] = Header(None),
+               x_line_retry_key: Optional[str] = Header(None)):
+    conflict = await _handle(authorization, body.messages, x_line_retry_key)
+    if conflict:
+        return conflict
+    app.state.received.append({"type": "push", "to": body.to, "messages": body.messages})
+    return {"sentMessages": [{"id": str(random.getrandbits(48))} for _ in body.messages]}
+
+
+# ---------------------------
+# 測試用：查看 / 清除收到的訊息
+# ---------------------------
+@app.get("/mock/received")
+def received():
+    return app.state.received
+
+
+@app.delete("/mock/received")
+def clear_received():
+    app.state.received.clear()
+    _used_reply_tokens.clear()
+    return {}
+
+
+
+def serve_in_background(port: int = 8081):
+    """
+    另開一個行程跑 uvicorn（不與被測程式搶 GIL / event loop），等到可以連線後回傳 (base URL, Popen)。
+    用完記得 process.terminate()。
+    """
+    import sys
+    import socket
+    import subprocess
+
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "mock_line_api:app", "--port", str(port), "--log-level", "warning"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    deadline = time.monotonic() + 30
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return f"http://127.0.0.1:{port}", process
+        except OSError:
+            if process.poll() is not None or time.monotonic() > deadline:
+                process.terminate()
+                raise RuntimeError("mock LINE API 啟動失敗")
+            time.sleep(0.1)
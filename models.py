@@ -1,7 +1,8 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Enum, TIMESTAMP
+from sqlalchemy import Column, Integer, BigInteger, String, ForeignKey, DateTime, Date, Time, Enum, TIMESTAMP, Text, Index, UniqueConstraint, text
 from sqlalchemy.orm import relationship
 from database import Base
 import enum
+from datetime import datetime
 from sqlalchemy.sql import func
 
 
@@ -14,6 +15,12 @@ class BookingStatus(str, enum.Enum):
     cancelled = "cancelled"    # 已取消
 
 
+class EmailStatus(str, enum.Enum):
+    pending = "pending"        # 等待寄送
+    sent = "sent"              # 已寄出
+    failed = "failed"          # 重試次數用完
+
+
 class User(Base):
     __tablename__ = "users"
 
@@ -49,6 +56,11 @@ class AvailableSlot(Base):
     # 與場地關聯
     venue = relationship("Venue", back_populates="available_slots")
 
+    # 可預約時段查詢：WHERE venue_id = ? AND start_time / end_time 範圍
+    __table_args__ = (
+        Index("ix_available_slots_venue_start_end", "venue_id", "start_time", "end_time"),
+    )
+
 class Booking(Base):
     __tablename__ = "bookings"
 
@@ -67,8 +79,95 @@ class Booking(Base):
     end_time = Column(DateTime, nullable=False)
     student_ids = Column(String(255), nullable=False)
     status = Column(Enum(BookingStatus), default=BookingStatus.pending, nullable=False)
+    # 每週固定預約產生的預約會指向同一個 series
+    series_id = Column(Integer, ForeignKey("booking_series.id"), nullable=True, index=True)
 
     # 關聯到 User
     user = relationship("User", back_populates="bookings")
     # 關聯到 Venue
-    venue = relationship("Venue", back_populates="bookings")
\ No newline at end of file
+    venue = relationship("Venue", back_populates="bookings")
+    # 關聯到 BookingSeries
+    series = relationship("BookingSeries", back_populates="bookings")
+
+    # 衝突檢查 / 可預約時段 / 我的預約 的熱門查詢（PostgreSQL 上只索引未取消的預約）
+    __table_args__ = (
+        Index(
+            "ix_bookings_venue_start_end_status",
+            "venue_id", "start_time", "end_time", "status",
+            postgresql_where=text("status != 'cancelled'"),
+        ),
+        Index("ix_bookings_user_start_end", "user_id", "start_time", "end_time"),
+        # 待審核佇列：status = pending 依開始時間分頁 / 計數
+        Index("ix_bookings_status_start_id", "status", "start_time", "id"),
+    )
+
+class BookingSeries(Base):
+    """每週固定時段的預約規則（例如系隊每週三 18:00-20:00，整學期）"""
+    __tablename__ = "booking_series"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    venue_id = Column(Integer, ForeignKey("venues.id"), nullable=False)
+    weekday = Column(Integer, nullable=False)          # 0 = 星期一 … 6 = 星期日
+    start_time = Column(Time, nullable=False)
+    end_time = Column(Time, nullable=False)
+    start_date = Column(Date, nullable=False)
+    end_date = Column(Date, nullable=False)
+    people_count = Column(Integer, nullable=False)
+    contact_phone = Column(String(20), nullable=False)
+    student_ids = Column(String(255), nullable=False)
+    created_at = Column(TIMESTAMP, nullable=False, server_default=func.now())
+
+    bookings = relationship("Booking", back_populates="series")
+    user = relationship("User")
+    venue = relationship("Venue")
+
+class EmailOutbox(Base):
+    """待寄送的通知信；與預約狀態變更寫在同一個 transaction，由 email_outbox 背景 worker 寄出"""
+    __tablename__ = "email_outbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+    to_email = Column(String(255), nullable=False)
+    subject = Column(String(255), nullable=False)
+    html_content = Column(Text, nullable=False)
+    status = Column(Enum(EmailStatus), default=EmailStatus.pending, nullable=False, index=True)
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(DateTime, default=datetime.now, nullable=False)
+    last_error = Column(String(500), nullable=True)
+    created_at = Column(TIMESTAMP, nullable=False, server_default=func.now())
+    sent_at = Column(DateTime, nullable=True)
+
+
+class CacheInvalidation(Base):
+    """可預約時段快取的失效紀錄；其他 uvicorn worker 輪詢（或 PostgreSQL LISTEN）後清掉自己的快取"""
+    __tablename__ = "cache_invalidations"
+
+    id = Column(Integer, primary_key=True, index=True)
+    venue_id = Column(Integer, nullable=False)
+    day = Column(Date, nullable=False)
+    created_at = Column(DateTime, default=datetime.now, nullable=False, index=True)
+
+
+class IdempotencyRecord(Base):
+    """帶 Idempotency-Key 的請求第一次成功時的回應；同一個 key + 使用者重送時直接回傳，不再重跑"""
+    __tablename__ = "idempotency_keys"
+
+    id = Column(Integer, primary_key=True, index=True)
+    key = Column(String(255), nullable=False)
+    user_id = Column(Integer, nullable=False)          # 無法識別使用者的端點存 0
+    endpoint = Column(String(255), nullable=False)
+    status_code = Column(Integer, nullable=False)
+    response_body = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.now, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+    __table_args__ = (
+        UniqueConstraint("key", "user_id", "endpoint", name="uq_idempotency_key_user_endpoint"),
+    )
+
+class TokenRevocation(Base):
+    """登出 / 停權紀錄：revoked_at（Unix 毫秒）與之前發出的 token 一律失效"""
+    __tablename__ = "token_revocations"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    revoked_at = Column(BigInteger, nullable=False)
@@ -0,0 +1,180 @@
+# password_hashing.py
+# bcrypt 雜湊 / 驗證移到獨立、有上限的 process pool：
+#   - hash / verify 是 coroutine，在 event loop 上等子行程的結果，不佔用 FastAPI 共用的 threadpool，
+#     登入尖峰時 /book 等其他 endpoint 不會被拖慢
+#   - 排隊數超過上限直接回 503（附 Retry-After），不讓請求無限堆積；逾時的工作取消，已在計算的算完才歸還名額
+#   - pool 在 FastAPI startup 建立並預先開好子行程，請求不會觸發 spawn
+#   - 記錄排隊等待時間與雜湊時間，stats() 提供給監控用
+import os
+import time
+import asyncio
+import threading
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_POOL_WORKERS = int(os.getenv("PASSWORD_POOL_WORKERS", str(min(2, os.cpu_count() or 1))))
+# 除了正在計算的工作外，最多還能排隊幾個
+PASSWORD_QUEUE_LIMIT = int(os.getenv("PASSWORD_QUEUE_LIMIT", str(PASSWORD_POOL_WORKERS * 8)))
+PASSWORD_HASH_TIMEOUT = float(os.getenv("PASSWORD_HASH_TIMEOUT", "10"))
+
+# rounds 調整後，舊的 hash 會被 needs_update() 判定需要重算
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+
+# ---------------------------
+# 在子行程執行的工作（需為模組層級函式才能 pickle）
+# ---------------------------
+def _timed(fn, *args):
+    started = time.time()
+    result = fn(*args)
+    return result, started, time.time() - started
+
+
+def _hash(password: str):
+    return _timed(pwd_context.hash, password)
+
+
+def _verify(password: str, hashed: str):
+    return _timed(lambda: (pwd_context.verify(password, hashed), pwd_context.needs_update(hashed)))
+
+
+def _noop():
+    return None
+
+
+def _busy() -> HTTPException:
+    return HTTPException(status_code=503, detail="系統忙碌中，請稍後再試", headers={"Retry-After": "1"})
+
+
+# ---------------------------
+# 統計
+# ---------------------------
+class _Timing:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total / self.count * 1000, 2) if self.count else 0.0,
+            "max_ms": round(self.max * 1000, 2),
+        }
+
+
+class PasswordHasher:
+    def __init__(self, workers: int = PASSWORD_POOL_WORKERS, queue_limit: int = PASSWORD_QUEUE_LIMIT,
+                 timeout: float = PASSWORD_HASH_TIMEOUT):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.timeout = timeout
+        self.in_flight = 0
+        self.rejected = 0
+        self.queue_wait = _Timing()
+        self.hash_time = _Timing()
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """在 FastAPI startup 呼叫：建立 pool 並先把子行程都開好，第一個登入請求不必等 spawn。"""
+        with self._lock:
+            if self._pool is not None:
+                return
+            # spawn：主行程有背景 thread，fork 可能複製到被鎖住的 lock
+            self._pool = pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        for future in [pool.submit(_noop) for _ in range(self.workers)]:
+            future.result()
+
+    def stop(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _restart(self, broken):
+        # 子行程異常結束：整個 pool 都不能再用，立刻換一個新的（子行程在下一次 submit 時才 spawn）
+        with self._lock:
+            if self._pool is not broken:
+                return
+            self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def _release(self, future):
+        with self._lock:
+            self.in_flight -= 1
+
+    def _submit(self, fn, *args):
+        """排入 pool 並回傳 concurrent future；pool 未啟動、排隊已滿或 pool 已損壞時丟出 503。"""
+        with self._lock:
+            pool = self._pool
+            if pool is None:
+                # 只在 startup 建立 pool；在沒有 __main__ 保護的腳本裡自動 spawn 子行程會出錯
+                logging.error("密碼雜湊 process pool 尚未啟動")
+                raise _busy()
+            if self.in_flight >= self.workers + self.queue_limit:
+                self.rejected += 1
+                raise _busy()
+            self.in_flight += 1
+        try:
+            future = pool.submit(fn, *args)
+        except (BrokenProcessPool, RuntimeError):
+            self._release(None)
+            self._restart(pool)
+            raise _busy()
+        # 名額在工作真正結束（或被取消）時才歸還：逾時但仍在計算的工作照樣佔用排隊上限
+        future.add_done_callback(self._release)
+        return pool, future
+
+    async def _run(self, fn, *args):
+        """
+        在 event loop 上等結果，不佔用 FastAPI 的 threadpool：登入尖峰時 /book 等同步 endpoint 照常有 thread 可用。
+        """
+        submitted = time.time()
+        pool, future = self._submit(fn, *args)
+        try:
+            result, started, elapsed = await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            # wait_for 逾時會取消還在排隊的工作；已經在計算的無法中斷，等它算完
+            future.cancel()
+            logging.error("密碼雜湊逾時")
+            raise _busy()
+        except BrokenProcessPool:
+            logging.error("密碼雜湊 process pool 異常，重新建立")
+            self._restart(pool)
+            raise _busy()
+        with self._lock:
+            self.queue_wait.add(max(started - submitted, 0.0))
+            self.hash_time.add(elapsed)
+        return result
+
+    async def hash(self, password: str) -> str:
+        return await self._run(_hash, password)
+
+    async def verify(self, password: str, hashed: str):
+        """回傳 (是否相符, 是否需要以目前設定重算 hash)。"""
+        return await self._run(_verify, password, hashed)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "queue_limit": self.queue_limit,
+            "in_flight": self.in_flight,
+            "rejected": self.rejected,
+            "queue_wait": self.queue_wait.as_dict(),
+            "hash_time": self.hash_time.as_dict(),
+        }
+
+
+hasher = PasswordHasher()
@@ -0,0 +1,227 @@
+# rate_limit.py
+# Token bucket 限流：保護 /login、/register（bcrypt 很吃 CPU）與 /book（衝突檢查 + 鎖）。
+#   - 每個 key（IP、使用者）一個 bucket，只記 (剩餘 token, 更新時間)，每次請求 O(1) 更新
+#   - 本機 backend：固定容量的 LRU，bucket 補滿後自動過期，記憶體有上限
+#   - 設定 RATE_LIMIT_REDIS_URL（且有安裝 redis 套件）時改用 Redis，多個 uvicorn worker 共用額度
+#   - 超過額度回 429 並附 Retry-After
+import os
+import math
+import asyncio
+import time
+import logging
+import threading
+from typing import NamedTuple
+
+from fastapi import HTTPException
+from fastapi.responses import ORJSONResponse
+
+from auth import decode_token
+from memory_cache import LRUCache
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") == "1"
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL")
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+# 部署在反向代理後面時，用 X-Forwarded-For 的第一個位址當作來源 IP
+RATE_LIMIT_TRUST_PROXY = os.getenv("RATE_LIMIT_TRUST_PROXY", "0") == "1"
+
+
+class Rule(NamedTuple):
+    capacity: int      # bucket 容量（瞬間最多幾次）
+    per_seconds: float  # 多久補滿
+
+    @property
+    def rate(self) -> float:
+        return self.capacity / self.per_seconds
+
+    @classmethod
+    def parse(cls, text: str):
+        """"10/60" → 60 秒內最多 10 次"""
+        capacity, per_seconds = text.split("/")
+        return cls(int(capacity), float(per_seconds))
+
+
+# 規則：環境變數格式為「次數/秒數」
+LOGIN_IP_RULE = Rule.parse(os.getenv("RATE_LIMIT_LOGIN_IP", "20/60"))
+LOGIN_USER_RULE = Rule.parse(os.getenv("RATE_LIMIT_LOGIN_USER", "5/60"))
+REGISTER_IP_RULE = Rule.parse(os.getenv("RATE_LIMIT_REGISTER_IP", "5/600"))
+BOOK_IP_RULE = Rule.parse(os.getenv("RATE_LIMIT_BOOK_IP", "60/60"))
+BOOK_USER_RULE = Rule.parse(os.getenv("RATE_LIMIT_BOOK_USER", "20/60"))
+
+
+# ---------------------------
+# backend
+# ---------------------------
+class LocalBackend:
+    """單一行程內的 bucket；也是測試時 Redis 的替身（介面相同）。"""
+
+    blocking = False   # 純記憶體操作，直接在 event loop 上做
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self._buckets = LRUCache(maxsize=max_keys)
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rule: Rule, cost: int = 1, now: float = None):
+        """扣 cost 個 token，回傳 (是否允許, 需等待秒數)。"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            tokens, updated = self._buckets.get(key) or (rule.capacity, now)
+            tokens = min(rule.capacity, tokens + (now - updated) * rule.rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            # 過了這段時間 bucket 已補滿，與新的 bucket 相同，可以丟掉
+            self._buckets.set(key, (tokens, now), ttl=max((rule.capacity - tokens) / rule.rate, 0.001))
+        retry_after = 0.0 if allowed else (cost - tokens) / rule.rate
+        return allowed, retry_after
+
+    def reset(self):
+        self._buckets.clear()
+
+
+class RedisBackend:
+    """多 worker 共用的 bucket，以 Lua script 在 Redis 端原子地更新。"""
+
+    blocking = True    # 網路呼叫，不在 event loop 上等
+
+    SCRIPT = """
+    local capacity = tonumber(ARGV[1])
+    local rate = tonumber(ARGV[2])
+    local now = tonumber(ARGV[3])
+    local cost = tonumber(ARGV[4])
+    local bucket = redis.call('HMGET', KEYS[1], 't', 'u')
+    local tokens = tonumber(bucket[1]) or capacity
+    local updated = tonumber(bucket[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+    local allowed = 0
+    if tokens >= cost then
+        tokens = tokens - cost
+        allowed = 1
+    end
+    redis.call('HSET', KEYS[1], 't', tokens, 'u', now)
+    redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate * 1000) + 1000)
+    return {allowed, tostring(tokens)}
+    """
+
+    def __init__(self, url: str, prefix: str = "ratelimit:"):
+        import redis   # 選用套件，只有設定 RATE_LIMIT_REDIS_URL 時才需要
+        self._redis = redis.Redis.from_url(url)
+        self._script = self._redis.register_script(self.SCRIPT)
+        self.prefix = prefix
+
+    def take(self, key: str, rule: Rule, cost: int = 1, now: float = None):
+        now = time.time() if now is None else now
+        allowed, tokens = self._script(keys=[self.prefix + key], args=[rule.capacity, rule.rate, now, cost])
+        tokens = float(tokens)
+        return bool(allowed), 0.0 if allowed else (cost - tokens) / rule.rate
+
+    def reset(self):
+        for key in self._redis.scan_iter(f"{self.prefix}*"):
+            self._redis.delete(key)
+
+
+def _create_backend():
+    if RATE_LIMIT_REDIS_URL:
+        try:
+            return RedisBackend(RATE_LIMIT_REDIS_URL)
+        except Exception as e:
+            logging.warning(f"⚠️ Redis 限流無法使用，改用本機 bucket：{e}")
+    return LocalBackend()
+
+
+class RateLimiter:
+    def __init__(self, backend=None):
+        self.backend = backend or _create_backend()
+        self.rejected = 0
+
+    async def check(self, key: str, rule: Rule, cost: int = 1):
+        """回傳需等待的秒數，0 代表允許。Redis 連線失敗時放行，不因限流拖垮服務。"""
+        if not RATE_LIMIT_ENABLED:
+            return 0
+        try:
+            if self.backend.blocking:
+                allowed, retry_after = await asyncio.to_thread(self.backend.take, key, rule, cost)
+            else:
+                allowed, retry_after = self.backend.take(key, rule, cost)
+        except Exception as e:
+            logging.error(f"限流檢查失敗：{e}")
+            return 0
+        if allowed:
+            return 0
+        self.rejected += 1
+        return max(1, math.ceil(retry_after))
+
+    async def enforce(self, key: str, rule: Rule, cost: int = 1):
+        """async endpoint 內使用：超過額度時丟出 HTTPException(429)。"""
+        retry_after = await self.check(key, rule, cost)
+        if retry_after:
+            raise HTTPException(status_code=429, detail="請求過於頻繁，請稍後再試",
+                                headers={"Retry-After": str(retry_after)})
+
+
+limiter = RateLimiter()
+
+
+# ---------------------------
+# middleware
+# ---------------------------
+def _client_ip(scope) -> str:
+    if RATE_LIMIT_TRUST_PROXY:
+        for name, value in scope.get("headers", []):
+            if name == b"x-forwarded-for":
+                return value.decode().split(",")[0].strip()
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+def _token_user(scope):
+    """有帶合法 token 時回傳 user id（只驗簽章，不查資料庫）。"""
+    for name, value in scope.get("headers", []):
+        if name == b"authorization":
+            value = value.decode()
+            if value.lower().startswith("bearer "):
+                try:
+                    return decode_token(value[7:].strip()).id
+                except HTTPException:
+                    return None
+    return None
+
+
+class RateLimitMiddleware:
+    """依 path 套用規則（/api 前綴視為相同 endpoint）；只限制 POST。"""
+
+    def __init__(self, app, limiter: RateLimiter = limiter):
+        self.app = app
+        self.limiter = limiter
+
+    def _rules(self, path: str):
+        if path == "/login":
+            return [("ip", LOGIN_IP_RULE)]   # 帳號的額度在 login 內檢查（需要讀表單）
+        if path == "/register":
+            return [("ip", REGISTER_IP_RULE)]
+        if path in ("/book", "/book/batch", "/book/series"):
+            return [("ip", BOOK_IP_RULE), ("user", BOOK_USER_RULE)]
+        return []
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST":
+            return await self.app(scope, receive, send)
+        path = scope["path"]
+        if path.startswith("/api/"):
+            path = path[4:]
+        for kind, rule in self._rules(path):
+            if kind == "ip":
+                key = f"ip:{_client_ip(scope)}:{path}"
+            else:
+                user_id = _token_user(scope)
+                if user_id is None:
+                    continue
+                key = f"user:{user_id}:book"
+            retry_after = await self.limiter.check(key, rule)
+            if retry_after:
+                response = ORJSONResponse(
+                    {"detail": "請求過於頻繁，請稍後再試"},
+                    status_code=429,
+                    headers={"Retry-After": str(retry_after)},
+                )
+                return await response(scope, receive, send)
+        return await self.app(scope, receive, send)
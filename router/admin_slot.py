@@ -1,8 +1,11 @@
 # routers/admin_slot.py
-from fastapi import APIRouter, Form, Depends
+from fastapi import APIRouter, Form, Depends, HTTPException
 from sqlalchemy.orm import Session
+from datetime import datetime
 from database import get_db
-from available_slots import AvailableSlot
+from models import AvailableSlot
+from availability_cache import mark_changed
+from auth import CurrentUser, require_admin
 
 router = APIRouter(prefix="/slots", tags=["Slot Management"])
 
@@ -11,13 +14,21 @@ def add_slot(
     venue_id: int = Form(...),
     start_time: str = Form(...),
     end_time: str = Form(...),
+    admin: CurrentUser = Depends(require_admin),
     db: Session = Depends(get_db)
 ):
+    try:
+        start_dt = datetime.fromisoformat(start_time.strip())
+        end_dt = datetime.fromisoformat(end_time.strip())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="時間格式錯誤（需 YYYY-MM-DD HH:MM）")
+
     slot = AvailableSlot(
         venue_id=venue_id,
-        start_time=start_time,
-        end_time=end_time
+        start_time=start_dt,
+        end_time=end_dt
     )
     db.add(slot)
+    mark_changed(db, venue_id, start_dt, end_dt)
     db.commit()
     return {"message": "時段新增成功"}
@@ -1,13 +1,22 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query
 from fastapi.responses import JSONResponse
 from database import get_db
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
-from models import AvailableSlot, Booking
+from typing import List, Optional
+import availability_cache
+from schedule_bitmap import DaySchedule, SLOT_MINUTES
+from models import Venue
+from slot_search import find_next_free, to_local_naive
+from venue_catalog import catalog as venue_catalog
+from auth import CurrentUser, require_admin
 
 
 router = APIRouter()
 
+# 一次最多查詢的天數
+MATRIX_MAX_DAYS = 31
+
 def to_seconds(dt):
     return dt.hour * 3600 + dt.minute * 60 + dt.second
 
@@ -21,52 +30,152 @@ def available_slots(venue_id: int, date: str, db: Session = Depends(get_db)):
         except ValueError:
             return {"error": "日期格式錯誤，需 YYYY-MM-DD"}
 
-        start_of_day = date_obj
-        start_of_next_day = start_of_day + timedelta(days=1)
-
-        # 2) 查 AvailableSlot
-        slots = (
-            db.query(AvailableSlot).filter(
-                AvailableSlot.venue_id == venue_id,
-                AvailableSlot.start_time >= start_of_day,
-                AvailableSlot.start_time < start_of_next_day
-            )
-            .order_by(AvailableSlot.start_time.asc())
-            .all()
-        )
-        print("slots:", [(s.id, s.start_time) for s in slots])
-
-        slot_list = []
-        for s in slots:
-            slot_info = {
+        # 2) 當日開放時段扣掉有效預約（先查快取，未命中才查資料庫）
+        free = availability_cache.get_free_slots(db, venue_id, date_obj.date())
+
+        filtered_slots = [
+            {
                 "id": s.id,
                 "venue_id": s.venue_id,
                 "start_time": to_seconds(s.start_time),
                 "end_time": to_seconds(s.end_time)
             }
-            slot_list.append(slot_info)
-
-        # 3) 查當日已預約時段
-        booked_slots = db.query(Booking).filter(
-            Booking.venue_id == venue_id,
-            Booking.start_time >= start_of_day,
-            Booking.start_time < start_of_next_day
-        ).all()
-        print("booked_slots:", [(b.id, b.start_time, b.end_time) for b in booked_slots])
-
-        # 4) 過濾衝突
-        filtered_slots = []
-        for s in slot_list:
-            conflict = False
-            for b in booked_slots:
-                if not (s["end_time"] <= to_seconds(b.start_time) or s["start_time"] >= to_seconds(b.end_time)):
-                    conflict = True
-                    break
-            if not conflict:
-                filtered_slots.append(s)
-
-        print("filtered_slots:", filtered_slots)  # ✅ 移到這裡
+            for s in free
+        ]
         return {"slots_count": len(filtered_slots), "slots": filtered_slots}
 
     except Exception as e:
-        return {"error": str(e)}
\ No newline at end of file
+        return {"error": str(e)}
+
+
+# ---------------------------
+# 多場地、多天的可預約矩陣（週曆一次取得）
+# ---------------------------
+@router.get("/availability_matrix")
+def availability_matrix(
+    start_date: str,
+    end_date: str,
+    venue_ids: Optional[List[int]] = Query(None),
+    format: str = "intervals",
+    db: Session = Depends(get_db)
+):
+    """
+    回傳日期區間（含頭尾）內各場地每天的空閒時段，秒數格式與 /available_slots 相同：
+    {
+      "start_date": "2025-09-22",
+      "end_date": "2025-09-28",
+      "venues": [
+        {"venue_id": 1, "venue_name": "羽球場", "days": {"2025-09-22": [[61200, 64800], ...], ...}}
+      ]
+    }
+    format=bitmask 時每天改回傳一個整數：第 i 個 bit 代表 00:00 + i × granularity_minutes 那一格空閒，
+    另附 any_free / all_free：每天任一 / 所有查詢場地都空閒的格子（同樣格式）。
+    不帶 venue_ids 時回傳所有場地；不論天數與場地數量都只用三個查詢（全部命中快取時只查場地）。
+    """
+    try:
+        first_day = datetime.strptime(start_date.strip(), "%Y-%m-%d")
+        last_day = datetime.strptime(end_date.strip(), "%Y-%m-%d")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="日期格式錯誤，需 YYYY-MM-DD")
+    if last_day < first_day:
+        raise HTTPException(status_code=400, detail="結束日期需晚於開始日期")
+    num_days = (last_day - first_day).days + 1
+    if num_days > MATRIX_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"查詢區間最多 {MATRIX_MAX_DAYS} 天")
+    if format not in ("intervals", "bitmask"):
+        raise HTTPException(status_code=400, detail="format 需為 intervals 或 bitmask")
+
+    venue_q = db.query(Venue.id, Venue.name).order_by(Venue.id)
+    if venue_ids:
+        venue_q = venue_q.filter(Venue.id.in_(venue_ids))
+    venues = venue_q.all()
+
+    days = [(first_day + timedelta(days=i)).date() for i in range(num_days)]
+    free = availability_cache.get_free_slots_by_day(db, [v.id for v in venues], days)
+
+    if format == "bitmask":
+        # free slots 已扣除預約，直接當成開放格子
+        schedules = {(v.id, d): DaySchedule.from_rows(d, free[v.id].get(d, [])) for v in venues for d in days}
+
+        def encode(venue_id, d):
+            return schedules[(venue_id, d)].open_bits
+    else:
+        def encode(venue_id, d):
+            return [[to_seconds(s.start_time), to_seconds(s.end_time)] for s in free[venue_id].get(d, [])]
+
+    result = {
+        "start_date": days[0].isoformat(),
+        "end_date": days[-1].isoformat(),
+        "venues": [
+            {
+                "venue_id": v.id,
+                "venue_name": v.name,
+                "days": {d.isoformat(): encode(v.id, d) for d in days}
+            }
+            for v in venues
+        ]
+    }
+    if format == "bitmask":
+        result["granularity_minutes"] = SLOT_MINUTES
+        # 跨場地：any_free 為任一場地空閒的格子（聯集），all_free 為所有場地都空閒的格子（交集）
+        by_day = {d: [schedules[(v.id, d)] for v in venues] for d in days}
+        result["any_free"] = {d.isoformat(): DaySchedule.union(by_day[d]) for d in days}
+        result["all_free"] = {d.isoformat(): DaySchedule.intersection(by_day[d]) for d in days}
+    return result
+
+
+# ---------------------------
+# 跨場地找最近的空檔
+# ---------------------------
+@router.get("/next_free_slots")
+def next_free_slots(
+    duration_minutes: int = Query(60, ge=1, le=24 * 60),
+    people_count: int = Query(1, ge=1),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = Query(5, ge=1, le=50),
+    db: Session = Depends(get_db)
+):
+    """
+    回傳最早的 limit 個可預約空檔（場地容量需 >= people_count），時間格式與 /available_slots 相同：
+    {"slots": [{"venue_id": 1, "venue_name": "羽球場", "date": "2025-09-26", "start_time": 61200, "end_time": 64800}]}
+    """
+    start, end = to_local_naive(start), to_local_naive(end)
+    if start and end and end <= start:
+        raise HTTPException(status_code=400, detail="結束時間需晚於開始時間")
+
+    found = find_next_free(db, duration_minutes, people_count, start, end, limit)
+    return {
+        "slots": [
+            {
+                "venue_id": f["venue_id"],
+                "venue_name": f["venue_name"],
+                "date": f["start"].date().isoformat(),
+                "start_time": to_seconds(f["start"]),
+                "end_time": to_seconds(f["end"])
+            }
+            for f in found
+        ]
+    }
+
+
+# ---------------------------
+# 可預約時段快取統計
+# ---------------------------
+@router.get("/availability_cache/stats")
+def availability_cache_stats():
+    return availability_cache.stats()
+
+
+# ---------------------------
+# 場地清單快取：修改場地後清除本 worker 的快取（其他 worker 於 VENUE_CATALOG_TTL 內更新）
+# ---------------------------
+@router.get("/venue_catalog/stats")
+def venue_catalog_stats():
+    return venue_catalog.stats()
+
+
+@router.post("/venue_catalog/refresh")
+def refresh_venue_catalog(admin: CurrentUser = Depends(require_admin)):
+    venue_catalog.invalidate()
+    return {"message": "場地清單已重新載入", "venues": len(venue_catalog.all())}
@@ -1,18 +1,29 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, Response
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from database import get_db
-from models import Booking, User, Venue, AvailableSlot, BookingStatus
-from pydantic import BaseModel, validator
-from schemas import BookingOut
+from models import Booking, User, Venue, BookingStatus
+from pydantic import BaseModel, ConfigDict, field_validator
+from schemas import BookingOut, PendingBookingPage
 from datetime import datetime
 import traceback
-from router.send_email import send_email
+import logging
+from email_outbox import enqueue_email
+from booking_engine import booking_locks, check_bookable, ensure_bookable
+from availability_cache import mark_changed
+import idempotency
+from auth import CurrentUser, get_current_user, require_admin, resolve_user_id
+from crud import (
+    user_bookings_page, pending_bookings_page, count_pending_bookings,
+    parse_date_range, PAGE_DEFAULT_LIMIT, PAGE_MAX_LIMIT
+)
 
 router = APIRouter()
 
 class BookingCreate(BaseModel):
-    user_id: int
+    model_config = ConfigDict(from_attributes=True)
+
+    user_id: Optional[int] = None   # 選填，預設為登入者本人
     venue_id: int
     date: str               # "YYYY-MM-DD"
     time_slots: List[str]   # ["17:00","18:00"]
@@ -20,105 +31,106 @@ class BookingCreate(BaseModel):
     contact_phone: str
     student_ids: List[str] = []
 
-    @validator("time_slots")
+    @field_validator("time_slots")
+    @classmethod
     def slots_must_have_two(cls, v):
         if not isinstance(v, list) or len(v) != 2:
             raise ValueError("time_slots 需為兩個時間，例如 ['17:00','18:00']")
         return v
 
-    @validator("student_ids", always=True)
+    @field_validator("student_ids", mode="before")
+    @classmethod
     def ensure_student_ids(cls, v):
         return v or []
 
-    class Config:
-        orm_mode = True
+def parse_booking(data: BookingCreate):
+    """解析時間字串成 datetime 並整理學號，格式不符時丟出 HTTPException(400)。"""
+    try:
+        start_dt = datetime.strptime(f"{data.date} {data.time_slots[0]}:00", "%Y-%m-%d %H:%M:%S")
+        end_dt   = datetime.strptime(f"{data.date} {data.time_slots[1]}:00", "%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="時間格式錯誤（需 YYYY-MM-DD 與 HH:MM）")
+
+    if end_dt <= start_dt:
+        raise HTTPException(status_code=400, detail="結束時間需晚於開始時間")
+
+    # 學號數量檢查
+    student_ids_clean = [s.strip() for s in data.student_ids if s.strip()]
+    if len(student_ids_clean) != data.people_count:
+        raise HTTPException(status_code=400, detail="學號數量需與人數一致")
+    return start_dt, end_dt, student_ids_clean
 
 # ---------------------------
 # 取得使用者所有預約
 # ---------------------------
 @router.get("/my_bookings", response_model=List[BookingOut])
-def get_my_bookings(user_id: int, db: Session = Depends(get_db)):
-    bookings = db.query(Booking).filter(Booking.user_id == user_id).all()
-    return bookings
+def get_my_bookings(
+    response: Response,
+    user_id: Optional[int] = None,
+    status: Optional[BookingStatus] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(PAGE_DEFAULT_LIMIT, ge=1, le=PAGE_MAX_LIMIT),
+    current_user: CurrentUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    user_id = resolve_user_id(current_user, user_id)
+    # 依開始時間由新到舊分頁；還有下一頁時 cursor 放在 X-Next-Cursor header，回傳內容維持 list
+    start, end = parse_date_range(date_from, date_to)
+    rows, next_cursor = user_bookings_page(db, user_id, status, start, end, cursor, limit)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return rows
 
 
 @router.post("/book")
-def create_booking(data: BookingCreate, db: Session = Depends(get_db)):
+def create_booking(
+    data: BookingCreate,
+    idempotency_key: Optional[str] = Header(None),
+    current_user: CurrentUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    data.user_id = resolve_user_id(current_user, data.user_id)
     try:
-        # 0) 檢查 user / venue 存不存在
-        if not db.query(User).filter(User.id == data.user_id).first():
-            raise HTTPException(status_code=404, detail="User not found")
-        if not db.query(Venue).filter(Venue.id == data.venue_id).first():
-            raise HTTPException(status_code=404, detail="Venue not found")
-
-        # 1) 解析時間字串成 datetime
-        try:
-            start_dt = datetime.strptime(f"{data.date} {data.time_slots[0]}:00", "%Y-%m-%d %H:%M:%S")
-            end_dt   = datetime.strptime(f"{data.date} {data.time_slots[1]}:00", "%Y-%m-%d %H:%M:%S")
-        except ValueError:
-            raise HTTPException(status_code=400, detail="時間格式錯誤（需 YYYY-MM-DD 與 HH:MM）")
-
-        if end_dt <= start_dt:
-            raise HTTPException(status_code=400, detail="結束時間需晚於開始時間")
-
-        # 2) 學號數量檢查
-        student_ids_clean = [s.strip() for s in data.student_ids if s.strip()]
-        if len(student_ids_clean) != data.people_count:
-            raise HTTPException(status_code=400, detail="學號數量需與人數一致")
-
-        # 3) 確認在可預約時段內（AvailableSlot）
-        slot_ok = db.query(AvailableSlot).filter(
-            AvailableSlot.venue_id == data.venue_id,
-            AvailableSlot.start_time <= start_dt,
-            AvailableSlot.end_time >= end_dt
-        ).first()
-        if not slot_ok:
-            raise HTTPException(status_code=400, detail="所選時間段不在可預約時段內")
-        # 4a) 同 user 跨場地衝突檢查
-        user_conflict = db.query(Booking).filter(
-            Booking.user_id == data.user_id,
-            Booking.start_time < end_dt,
-            Booking.end_time > start_dt,
-            Booking.status != BookingStatus.cancelled
-        ).first()
-        if user_conflict:
-            raise HTTPException(status_code=409, detail="您在此時間段已經有其他場地的預約")
-        # 4b) 與既有預約衝突檢查（同場地，用 Booking 表）
-        conflict = db.query(Booking).filter(
-            Booking.venue_id == data.venue_id,
-            Booking.start_time < end_dt,
-            Booking.end_time > start_dt,
-            Booking.status != BookingStatus.cancelled
-        ).first()
-        if conflict:
-            raise HTTPException(status_code=409, detail="該時段已被預約")
-
-        # 5) 建立 booking
-        new_b = Booking(
-            user_id=data.user_id,
-            venue_id=data.venue_id,
-            start_time=start_dt,
-            end_time=end_dt,
-            contact_phone=data.contact_phone,
-            people_count=data.people_count,
-            student_ids=",".join(student_ids_clean),
-            status=BookingStatus.pending
-        )
-        db.add(new_b)
-        db.commit()
-        db.refresh(new_b)
-        # === 🔽 在這裡插入寄信功能 🔽 =====================
-
-        # 取得使用者 email
-        user = db.query(User).filter(User.id == data.user_id).first()
-
-        # 取得場地名稱
-        venue = db.query(Venue).filter(Venue.id == data.venue_id).first()
+        # 1) 解析時間、檢查學號數量
+        start_dt, end_dt, student_ids_clean = parse_booking(data)
+
+        # 3) 鎖住 user / venue（同時確認存在），檢查與寫入在同一個鎖定範圍內完成
+        with booking_locks(db, [data.user_id], [data.venue_id]) as (users, venues):
+            user = users.get(data.user_id)
+            if not user:
+                raise HTTPException(status_code=404, detail="User not found")
+            venue = venues.get(data.venue_id)
+            if not venue:
+                raise HTTPException(status_code=404, detail="Venue not found")
+
+            # 重送的請求（同一個 Idempotency-Key）直接回傳第一次的結果；在鎖內查，避免兩個重送同時執行
+            replayed = idempotency.replay(db, idempotency_key, data.user_id, "POST /book")
+            if replayed:
+                return replayed
+
+            # 4) 可預約時段 / 同 user 跨場地 / 同場地衝突檢查
+            ensure_bookable(db, data.user_id, data.venue_id, start_dt, end_dt)
+
+            # 5) 建立 booking
+            new_b = Booking(
+                user_id=data.user_id,
+                venue_id=data.venue_id,
+                start_time=start_dt,
+                end_time=end_dt,
+                contact_phone=data.contact_phone,
+                people_count=data.people_count,
+                student_ids=",".join(student_ids_clean),
+                status=BookingStatus.pending
+            )
+            db.add(new_b)
+            mark_changed(db, data.venue_id, start_dt, end_dt)
 
-        # 🔹寄送預約成功通知
-        if user.email:
-            try:
-                send_email(
+            # 6) 預約成功通知寫進 outbox，與 booking 一起 commit，由背景 worker 寄出
+            if user.email:
+                enqueue_email(
+                    db,
                     to_email=user.email,
                     subject="體育館預約成功通知",
                     html_content=f"""
@@ -130,14 +142,16 @@ def create_booking(data: BookingCreate, db: Session = Depends(get_db)):
                         <p>請留意後續審核結果通知。</p>
                     """
                 )
-            except Exception as e:
-                print("❌ Email 寄送失敗:", e)
-        return {
-            "success": True,
-            "message": "預約成功",
-            "booking_id": new_b.id,
-            "status": new_b.status.value
-        }
+
+            db.flush()
+            result = {
+                "success": True,
+                "message": "預約成功",
+                "booking_id": new_b.id,
+                "status": new_b.status.value
+            }
+            replayed = idempotency.commit(db, idempotency_key, data.user_id, "POST /book", result)
+        return replayed or result
     except HTTPException:
         # 已經是明確的 HTTPException，直接丟出
         raise
@@ -147,11 +161,126 @@ def create_booking(data: BookingCreate, db: Session = Depends(get_db)):
         traceback.print_exc()  
         raise HTTPException(status_code=500, detail=str(e))
     
+# ---------------------------
+# 批次預約（社團 / 系隊一次預約多個時段）
+# ---------------------------
+BATCH_MAX_ITEMS = 50
+
+@router.post("/book/batch")
+def create_bookings_batch(
+    items: List[BookingCreate],
+    current_user: CurrentUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    一次送出多筆預約，在同一個 transaction 內處理，逐筆回傳結果：
+    {"success_count": 2, "results": [{"index": 0, "success": true, "booking_id": 10}, {"index": 1, "success": false, "status_code": 409, "detail": "..."}]}
+    衝突檢查（含同一批彼此之間）固定只用兩個查詢；每位使用者只會收到一封彙總通知信。
+    """
+    if not items:
+        raise HTTPException(status_code=400, detail="至少需要一筆預約")
+    if len(items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"一次最多 {BATCH_MAX_ITEMS} 筆預約")
+
+    results = [None] * len(items)
+
+    def fail(i, e: HTTPException):
+        results[i] = {"index": i, "success": False, "status_code": e.status_code, "detail": e.detail}
+
+    # 1) 逐筆解析格式
+    parsed = {}
+    for i, data in enumerate(items):
+        try:
+            data.user_id = resolve_user_id(current_user, data.user_id)
+            parsed[i] = parse_booking(data)
+        except HTTPException as e:
+            fail(i, e)
+
+    try:
+        with booking_locks(db, [items[i].user_id for i in parsed], [items[i].venue_id for i in parsed]) as (users, venues):
+            # 2) user / venue 是否存在
+            for i in list(parsed):
+                if items[i].user_id not in users:
+                    fail(i, HTTPException(status_code=404, detail="User not found"))
+                    del parsed[i]
+                elif items[i].venue_id not in venues:
+                    fail(i, HTTPException(status_code=404, detail="Venue not found"))
+                    del parsed[i]
+
+            # 3) 可預約時段 / 衝突檢查（含同一批內的衝突）
+            order = list(parsed)
+            errors = check_bookable(db, [
+                (items[i].user_id, items[i].venue_id, parsed[i][0], parsed[i][1]) for i in order
+            ])
+
+            # 4) 一次寫入所有通過檢查的預約
+            created = {}
+            for i, error in zip(order, errors):
+                if error:
+                    fail(i, error)
+                    continue
+                data = items[i]
+                start_dt, end_dt, student_ids_clean = parsed[i]
+                created[i] = Booking(
+                    user_id=data.user_id,
+                    venue_id=data.venue_id,
+                    start_time=start_dt,
+                    end_time=end_dt,
+                    contact_phone=data.contact_phone,
+                    people_count=data.people_count,
+                    student_ids=",".join(student_ids_clean),
+                    status=BookingStatus.pending
+                )
+                mark_changed(db, data.venue_id, start_dt, end_dt)
+            db.add_all(created.values())
+            db.flush()
+
+            # 5) 每位使用者一封彙總通知信
+            per_user = {}
+            for i, b in created.items():
+                per_user.setdefault(b.user_id, []).append(b)
+            for user_id, bookings in per_user.items():
+                user = users[user_id]
+                if not user.email:
+                    continue
+                rows = "".join(
+                    f"<li>{venues[b.venue_id].name}：{b.start_time.strftime('%Y-%m-%d %H:%M')} - {b.end_time.strftime('%H:%M')}</li>"
+                    for b in sorted(bookings, key=lambda b: b.start_time)
+                )
+                enqueue_email(
+                    db,
+                    to_email=user.email,
+                    subject="體育館預約成功通知",
+                    html_content=f"""
+                        <h2>預約成功！</h2>
+                        <p>您已成功預約以下 {len(bookings)} 個時段：</p>
+                        <ul>{rows}</ul>
+                        <br/>
+                        <p>請留意後續審核結果通知。</p>
+                    """
+                )
+            booking_ids = {i: b.id for i, b in created.items()}
+            db.commit()
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.exception(f"批次預約失敗：{e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    for i, booking_id in booking_ids.items():
+        results[i] = {"index": i, "success": True, "booking_id": booking_id}
+    return {"success_count": len(booking_ids), "results": results}
+
 # ---------------------------
 # 更新預約狀態（管理員用）
 # ---------------------------
 @router.put("/update_booking_status/{booking_id}")
-def update_booking_status(booking_id: int, status: str, db: Session = Depends(get_db)):
+def update_booking_status(
+    booking_id: int,
+    status: str,
+    admin: CurrentUser = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
     booking = db.query(Booking).filter(Booking.id == booking_id).first()
     if not booking:
         raise HTTPException(status_code=404, detail="Booking not found")
@@ -161,7 +290,8 @@ def update_booking_status(booking_id: int, status: str, db: Session = Depends(ge
     except ValueError:
         print(f"❌ Invalid status value received: {status}")
         raise HTTPException(status_code=400, detail="Invalid status value")
-        
+
+    mark_changed(db, booking.venue_id, booking.start_time, booking.end_time)
     db.commit()
     db.refresh(booking)
     return {"status": "success", "booking": booking.id, "new_status": status}
@@ -170,10 +300,15 @@ def update_booking_status(booking_id: int, status: str, db: Session = Depends(ge
 # 刪除預約
 # ---------------------------
 @router.delete("/delete_booking/{booking_id}")
-def delete_booking(booking_id: int, db: Session = Depends(get_db)):
+def delete_booking(
+    booking_id: int,
+    admin: CurrentUser = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
     booking = db.query(Booking).filter(Booking.id == booking_id).first()
     if not booking:
         raise HTTPException(status_code=404, detail="Booking not found")
+    mark_changed(db, booking.venue_id, booking.start_time, booking.end_time)
     db.delete(booking)
     db.commit()
     return {"status": "success", "deleted_booking_id": booking_id}
@@ -183,26 +318,58 @@ def delete_booking(booking_id: int, db: Session = Depends(get_db)):
 # 使用者取消預約
 # ---------------------------
 @router.put("/bookings/{booking_id}/cancel")
-def cancel_booking(booking_id: int, db: Session = Depends(get_db)):
+def cancel_booking(
+    booking_id: int,
+    idempotency_key: Optional[str] = Header(None),
+    current_user: CurrentUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    endpoint = f"PUT /bookings/{booking_id}/cancel"
+    replayed = idempotency.replay(db, idempotency_key, current_user.id, endpoint)
+    if replayed:
+        return replayed
+
     booking = db.query(Booking).filter(Booking.id == booking_id).first()
     if not booking:
         raise HTTPException(status_code=404, detail="找不到該預約")
+    if booking.user_id != current_user.id and not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="只能取消自己的預約")
 
     if booking.status == BookingStatus.cancelled:
         raise HTTPException(status_code=400, detail="此預約已被取消")
 
     # 更新狀態為「取消」
     booking.status = BookingStatus.cancelled
-    db.commit()
-    db.refresh(booking)
+    mark_changed(db, booking.venue_id, booking.start_time, booking.end_time)
+    result = {"message": "預約已成功取消", "booking_id": booking_id, "status": BookingStatus.cancelled.value}
+    replayed = idempotency.commit(db, idempotency_key, current_user.id, endpoint, result)
 
-    return {"message": "預約已成功取消", "booking_id": booking_id, "status": booking.status.value}
+    return replayed or result
 
 # ---------------------------
 # 後端管理員審核
 # ---------------------------
+def review_email_html(result: str, venue_name: str, start_time: datetime, end_time: datetime) -> str:
+    return f"""
+        <h2>預約審核結果</h2>
+        <p>您的預約已被<strong>{result}</strong></p>
+        <p>場地：{venue_name}</p>
+        <p>日期：{start_time.date()}</p>
+        <p>時間：{start_time.strftime('%H:%M')} - {end_time.strftime('%H:%M')}</p>
+    """
+
 @router.put("/bookings/{booking_id}/approve")
-def approve_booking(booking_id: int, db: Session = Depends(get_db)):
+def approve_booking(
+    booking_id: int,
+    idempotency_key: Optional[str] = Header(None),
+    admin: CurrentUser = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    endpoint = f"PUT /bookings/{booking_id}/approve"
+    replayed = idempotency.replay(db, idempotency_key, admin.id, endpoint)
+    if replayed:
+        return replayed
+
     booking = db.query(Booking).filter(Booking.id == booking_id).first()
     if not booking:
         raise HTTPException(status_code=404, detail="預約不存在")
@@ -210,35 +377,38 @@ def approve_booking(booking_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=400, detail="此預約無法審核")
     
     booking.status = BookingStatus.approved
-    db.commit()
-    db.refresh(booking)
-
-     # ✨ 在這裡加入 email 寄送
-    if not booking.user or not booking.user.email:
-        return {"message": "預約已通過，但使用者無 email 無法寄送通知"}
-
-    # 🔹 寄送審核通過通知
-    if booking.user and booking.user.email:
-        try:
-            send_email(
-                to_email=booking.user.email,
-                subject="預約審核結果通知",
-                html_content=f"""
-                    <h2>預約審核結果</h2>
-                    <p>您的預約已被<strong>通過</strong></p>
-                    <p>場地：{booking.venue.name}</p>
-                    <p>日期：{booking.start_time.date()}</p>
-                    <p>時間：{booking.start_time.strftime('%H:%M')} - {booking.end_time.strftime('%H:%M')}</p>
-                """
-            )
-        except Exception as e:
-            print("❌ Email 寄送失敗:", e)
+    mark_changed(db, booking.venue_id, booking.start_time, booking.end_time)
+
+    # ✨ 審核結果通知寫進 outbox，與狀態變更一起 commit
+    has_email = bool(booking.user and booking.user.email)
+    if has_email:
+        enqueue_email(
+            db,
+            to_email=booking.user.email,
+            subject="預約審核結果通知",
+            html_content=review_email_html("通過", booking.venue.name, booking.start_time, booking.end_time)
+        )
+    if not has_email:
+        result = {"message": "預約已通過，但使用者無 email 無法寄送通知"}
+    else:
+        result = {"message": "預約已通過", "new_status": "已通過"}  # 回傳中文狀態
+    replayed = idempotency.commit(db, idempotency_key, admin.id, endpoint, result)
 
-    return {"message": "預約已通過", "new_status": "已通過"}  # 回傳中文狀態
+    return replayed or result
 
 
 @router.put("/bookings/{booking_id}/reject")
-def reject_booking(booking_id: int, db: Session = Depends(get_db)):
+def reject_booking(
+    booking_id: int,
+    idempotency_key: Optional[str] = Header(None),
+    admin: CurrentUser = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    endpoint = f"PUT /bookings/{booking_id}/reject"
+    replayed = idempotency.replay(db, idempotency_key, admin.id, endpoint)
+    if replayed:
+        return replayed
+
     booking = db.query(Booking).filter(Booking.id == booking_id).first()
     if not booking:
         raise HTTPException(status_code=404, detail="預約不存在")
@@ -246,50 +416,166 @@ def reject_booking(booking_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=400, detail="此預約無法拒絕")
     
     booking.status = BookingStatus.rejected
-    db.commit()
-    db.refresh(booking)
-    
-    # ✨ 在這裡加入 email 寄送
-    if not booking.user or not booking.user.email:
-        return {"message": "預約已拒絕，但使用者無 email 無法寄送通知"}
+    mark_changed(db, booking.venue_id, booking.start_time, booking.end_time)
+
+    # ✨ 審核結果通知寫進 outbox，與狀態變更一起 commit
+    has_email = bool(booking.user and booking.user.email)
+    if has_email:
+        enqueue_email(
+            db,
+            to_email=booking.user.email,
+            subject="預約審核結果通知",
+            html_content=review_email_html("拒絕", booking.venue.name, booking.start_time, booking.end_time)
+        )
+    if not has_email:
+        result = {"message": "預約已拒絕，但使用者無 email 無法寄送通知"}
+    else:
+        result = {"message": "預約已拒絕", "new_status": "已拒絕"}  # 回傳中文狀態
+    replayed = idempotency.commit(db, idempotency_key, admin.id, endpoint, result)
 
-    if booking.user and booking.user.email:
-        try:
-            send_email(
-                to_email=booking.user.email,
+    return replayed or result
+
+
+# ---------------------------
+# 批次審核
+# ---------------------------
+REVIEW_MAX_ITEMS = 500
+REVIEW_RESULTS = {BookingStatus.approved: "通過", BookingStatus.rejected: "拒絕"}
+
+class ReviewItem(BaseModel):
+    booking_id: int
+    decision: BookingStatus   # "approved" 或 "rejected"
+
+    @field_validator("decision")
+    @classmethod
+    def decision_must_be_review(cls, v):
+        if v not in REVIEW_RESULTS:
+            raise ValueError("decision 需為 approved 或 rejected")
+        return v
+
+
+@router.post("/bookings/review/batch")
+def review_bookings_batch(
+    items: List[ReviewItem],
+    idempotency_key: Optional[str] = Header(None),
+    admin: CurrentUser = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """
+    一次審核多筆預約，逐筆回傳結果：
+    {"approved_count": 2, "rejected_count": 1, "results": [{"booking_id": 10, "success": true, "status": "approved"},
+                                                           {"booking_id": 11, "success": false, "status_code": 400, "detail": "..."}]}
+    固定只用一個查詢 + 每種決定一個 UPDATE（條件含 status = 'pending'），通知信每位使用者一封、寫進 outbox。
+    """
+    if not items:
+        raise HTTPException(status_code=400, detail="至少需要一筆審核")
+    if len(items) > REVIEW_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"一次最多審核 {REVIEW_MAX_ITEMS} 筆")
+
+    endpoint = "POST /bookings/review/batch"
+    replayed = idempotency.replay(db, idempotency_key, admin.id, endpoint)
+    if replayed:
+        return replayed
+
+    # 同一筆出現多次時以最後一次為準
+    decisions = {item.booking_id: item.decision for item in items}
+    results = {}
+
+    try:
+        # 1) 一次取出所有預約（鎖住 bookings 列，避免和單筆審核 / 取消同時改到）
+        rows = (
+            db.query(
+                Booking.id, Booking.status, Booking.user_id, Booking.venue_id,
+                Booking.start_time, Booking.end_time,
+                User.email, Venue.name.label("venue_name")
+            )
+            .join(User, User.id == Booking.user_id)
+            .join(Venue, Venue.id == Booking.venue_id)
+            .filter(Booking.id.in_(list(decisions)))
+            .with_for_update(of=Booking)
+            .all()
+        )
+        found = {r.id: r for r in rows}
+
+        by_decision = {status: [] for status in REVIEW_RESULTS}
+        for booking_id, decision in decisions.items():
+            r = found.get(booking_id)
+            if not r:
+                results[booking_id] = {"booking_id": booking_id, "success": False, "status_code": 404, "detail": "預約不存在"}
+            elif r.status != BookingStatus.pending:
+                results[booking_id] = {"booking_id": booking_id, "success": False, "status_code": 400, "detail": "此預約無法審核"}
+            else:
+                by_decision[decision].append(r)
+
+        # 2) 每種決定一個 UPDATE；status = 'pending' 條件確保不會覆蓋已被其他請求處理的預約
+        per_user = {}
+        counts = {}
+        for decision, group in by_decision.items():
+            counts[decision] = 0
+            if not group:
+                continue
+            counts[decision] = (
+                db.query(Booking)
+                .filter(Booking.id.in_([r.id for r in group]), Booking.status == BookingStatus.pending)
+                .update({Booking.status: decision}, synchronize_session=False)
+            )
+            for r in group:
+                mark_changed(db, r.venue_id, r.start_time, r.end_time)
+                results[r.id] = {"booking_id": r.id, "success": True, "status": decision.value}
+                if r.email:
+                    per_user.setdefault(r.email, []).append((decision, r))
+
+        # 3) 每位使用者一封彙總通知信
+        for email, reviewed in per_user.items():
+            lines = "".join(
+                f"<li>{r.venue_name}：{r.start_time.strftime('%Y-%m-%d %H:%M')} - {r.end_time.strftime('%H:%M')}"
+                f"　<strong>{REVIEW_RESULTS[decision]}</strong></li>"
+                for decision, r in sorted(reviewed, key=lambda x: x[1].start_time)
+            )
+            enqueue_email(
+                db,
+                to_email=email,
                 subject="預約審核結果通知",
                 html_content=f"""
                     <h2>預約審核結果</h2>
-                    <p>您的預約已被<strong>拒絕</strong></p>
-                    <p>場地：{booking.venue.name}</p>
-                    <p>日期：{booking.start_time.date()}</p>
-                    <p>時間：{booking.start_time.strftime('%H:%M')} - {booking.end_time.strftime('%H:%M')}</p>
+                    <p>您有 {len(reviewed)} 筆預約已完成審核：</p>
+                    <ul>{lines}</ul>
                 """
             )
-        except Exception as e:
-            print("❌ Email 寄送失敗:", e)
-
-    return {"message": "預約已拒絕", "new_status": "已拒絕"}  # 回傳中文狀態
 
+        response = {
+            "approved_count": counts[BookingStatus.approved],
+            "rejected_count": counts[BookingStatus.rejected],
+            "results": [results[booking_id] for booking_id in decisions]
+        }
+        replayed = idempotency.commit(db, idempotency_key, admin.id, endpoint, response)
+        if replayed:
+            return replayed
+    except HTTPException:
+        raise
+    except Exception as e:
+        db.rollback()
+        logging.exception(f"批次審核失敗：{e}")
+        raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/bookings/pending")
-def get_pending_bookings(db: Session = Depends(get_db)):
-    # 從 bookings 表抓 status = 'pending' 的資料
-    pending_bookings = db.query(Booking).filter(Booking.status == BookingStatus.pending).all()
-    
-    result = []
-    for b in pending_bookings:
-        result.append({
-            "booking_id": b.id,
-            "username": b.user.username,      # 修正這裡
-            "venue_name": b.venue.name,        # 對應 venues 表
-            "start_time": b.start_time.isoformat(),
-            "end_time": b.end_time.isoformat(),
-            "people_count": b.people_count,
-            "contact_phone": b.contact_phone,
-            "student_ids": b.student_ids,             # 新增欄位
-            "created_at": b.created_at.isoformat(),   # 新增欄位
-            "status": b.status.value
-        })
-    
-    return {"bookings": result}
\ No newline at end of file
+    return response
+
+
+@router.get("/bookings/pending", response_model=PendingBookingPage)
+def get_pending_bookings(
+    response: Response,
+    venue_id: Optional[int] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(PAGE_DEFAULT_LIMIT, ge=1, le=PAGE_MAX_LIMIT),
+    admin: CurrentUser = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    # 從 bookings 表抓 status = 'pending' 的資料，JOIN users / venues 一次取得名稱
+    start, end = parse_date_range(date_from, date_to)
+    rows, next_cursor = pending_bookings_page(db, venue_id, start, end, cursor, limit)
+    response.headers["X-Total-Count"] = str(count_pending_bookings(db, venue_id, start, end))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return {"bookings": rows, "next_cursor": next_cursor}
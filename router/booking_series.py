@@ -0,0 +1,263 @@
+# router/booking_series.py
+# 每週固定預約：一條規則（星期幾、時段、起訖日期）在後端展開成每週一筆預約，
+# 用一次範圍查詢 + 記憶體內的區間比對檢查衝突；取消 / 審核以一個 UPDATE 作用在整個 series。
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from pydantic import BaseModel, field_validator
+from datetime import datetime, timedelta
+import logging
+from database import get_db
+from models import Booking, BookingSeries, BookingStatus
+from booking_engine import booking_locks, check_bookable
+from availability_cache import mark_changed
+from email_outbox import enqueue_email
+from auth import CurrentUser, get_current_user, require_admin, resolve_user_id
+
+router = APIRouter()
+
+# 一個 series 最多展開的週數（約一學期）
+SERIES_MAX_WEEKS = 26
+WEEKDAY_NAMES = ["一", "二", "三", "四", "五", "六", "日"]
+
+class BookingSeriesCreate(BaseModel):
+    user_id: Optional[int] = None   # 選填，預設為登入者本人
+    venue_id: int
+    weekday: int            # 0 = 星期一 … 6 = 星期日
+    time_slots: List[str]   # ["17:00","18:00"]
+    start_date: str         # "YYYY-MM-DD"
+    end_date: str           # "YYYY-MM-DD"
+    people_count: int
+    contact_phone: str
+    student_ids: List[str] = []
+    skip_conflicts: bool = False   # True：略過衝突的那幾週，其餘照常預約
+
+    @field_validator("weekday")
+    @classmethod
+    def weekday_in_range(cls, v):
+        if not 0 <= v <= 6:
+            raise ValueError("weekday 需為 0（星期一）到 6（星期日）")
+        return v
+
+    @field_validator("time_slots")
+    @classmethod
+    def slots_must_have_two(cls, v):
+        if not isinstance(v, list) or len(v) != 2:
+            raise ValueError("time_slots 需為兩個時間，例如 ['17:00','18:00']")
+        return v
+
+    @field_validator("student_ids", mode="before")
+    @classmethod
+    def ensure_student_ids(cls, v):
+        return v or []
+
+
+def expand_occurrences(weekday, start_time, end_time, start_date, end_date):
+    """把規則展開成每週一筆 (start_dt, end_dt)。"""
+    first = start_date + timedelta(days=(weekday - start_date.weekday()) % 7)
+    occurrences = []
+    day = first
+    while day <= end_date:
+        occurrences.append((datetime.combine(day, start_time), datetime.combine(day, end_time)))
+        day += timedelta(days=7)
+    return occurrences
+
+
+def _series_occurrences(series: BookingSeries):
+    return expand_occurrences(series.weekday, series.start_time, series.end_time, series.start_date, series.end_date)
+
+
+# ---------------------------
+# 建立每週固定預約
+# ---------------------------
+@router.post("/book/series")
+def create_booking_series(
+    data: BookingSeriesCreate,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    data.user_id = resolve_user_id(current_user, data.user_id)
+    try:
+        start_time = datetime.strptime(data.time_slots[0], "%H:%M").time()
+        end_time = datetime.strptime(data.time_slots[1], "%H:%M").time()
+        start_date = datetime.strptime(data.start_date, "%Y-%m-%d").date()
+        end_date = datetime.strptime(data.end_date, "%Y-%m-%d").date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="時間格式錯誤（需 YYYY-MM-DD 與 HH:MM）")
+    if end_time <= start_time:
+        raise HTTPException(status_code=400, detail="結束時間需晚於開始時間")
+    if end_date < start_date:
+        raise HTTPException(status_code=400, detail="結束日期需晚於開始日期")
+
+    student_ids_clean = [s.strip() for s in data.student_ids if s.strip()]
+    if len(student_ids_clean) != data.people_count:
+        raise HTTPException(status_code=400, detail="學號數量需與人數一致")
+
+    occurrences = expand_occurrences(data.weekday, start_time, end_time, start_date, end_date)
+    if not occurrences:
+        raise HTTPException(status_code=400, detail="日期區間內沒有符合的星期")
+    if len(occurrences) > SERIES_MAX_WEEKS:
+        raise HTTPException(status_code=400, detail=f"每週固定預約最多 {SERIES_MAX_WEEKS} 週")
+
+    try:
+        with booking_locks(db, [data.user_id], [data.venue_id]) as (users, venues):
+            user = users.get(data.user_id)
+            if not user:
+                raise HTTPException(status_code=404, detail="User not found")
+            venue = venues.get(data.venue_id)
+            if not venue:
+                raise HTTPException(status_code=404, detail="Venue not found")
+
+            errors = check_bookable(db, [(data.user_id, data.venue_id, s, e) for s, e in occurrences])
+            conflicts = [
+                {"date": s.date().isoformat(), "status_code": err.status_code, "detail": err.detail}
+                for (s, _), err in zip(occurrences, errors) if err
+            ]
+            accepted = [occ for occ, err in zip(occurrences, errors) if not err]
+            if conflicts and not data.skip_conflicts:
+                raise HTTPException(status_code=409, detail={"message": "部分日期無法預約", "conflicts": conflicts})
+            if not accepted:
+                raise HTTPException(status_code=409, detail={"message": "所有日期皆無法預約", "conflicts": conflicts})
+
+            series = BookingSeries(
+                user_id=data.user_id,
+                venue_id=data.venue_id,
+                weekday=data.weekday,
+                start_time=start_time,
+                end_time=end_time,
+                start_date=start_date,
+                end_date=end_date,
+                people_count=data.people_count,
+                contact_phone=data.contact_phone,
+                student_ids=",".join(student_ids_clean)
+            )
+            db.add(series)
+            db.flush()
+            db.add_all([
+                Booking(
+                    user_id=data.user_id,
+                    venue_id=data.venue_id,
+                    start_time=s,
+                    end_time=e,
+                    contact_phone=data.contact_phone,
+                    people_count=data.people_count,
+                    student_ids=series.student_ids,
+                    status=BookingStatus.pending,
+                    series_id=series.id
+                )
+                for s, e in accepted
+            ])
+            for s, e in accepted:
+                mark_changed(db, data.venue_id, s, e)
+
+            if user.email:
+                enqueue_email(
+                    db,
+                    to_email=user.email,
+                    subject="體育館預約成功通知",
+                    html_content=f"""
+                        <h2>每週固定預約成功！</h2>
+                        <p>您已成功預約 <strong>{venue.name}</strong></p>
+                        <p>每週{WEEKDAY_NAMES[data.weekday]} {data.time_slots[0]} - {data.time_slots[1]}</p>
+                        <p>期間：{accepted[0][0].date()} ～ {accepted[-1][0].date()}，共 {len(accepted)} 次</p>
+                        <br/>
+                        <p>請留意後續審核結果通知。</p>
+                    """
+                )
+            series_id = series.id
+            db.commit()
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.exception(f"週期預約失敗：{e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return {
+        "success": True,
+        "message": "預約成功",
+        "series_id": series_id,
+        "booking_count": len(accepted),
+        "skipped": conflicts
+    }
+
+
+def _update_series_status(db: Session, series_id: int, new_status: BookingStatus, from_statuses, future_only=False):
+    series = db.query(BookingSeries).filter(BookingSeries.id == series_id).first()
+    if not series:
+        raise HTTPException(status_code=404, detail="找不到該每週固定預約")
+
+    q = db.query(Booking).filter(Booking.series_id == series_id, Booking.status.in_(from_statuses))
+    if future_only:
+        q = q.filter(Booking.start_time >= datetime.now())
+    updated = q.update({Booking.status: new_status}, synchronize_session=False)
+
+    if updated:
+        for s, e in _series_occurrences(series):
+            mark_changed(db, series.venue_id, s, e)
+    return series, updated
+
+
+# ---------------------------
+# 取消整個 series（只取消尚未開始的場次）
+# ---------------------------
+@router.put("/bookings/series/{series_id}/cancel")
+def cancel_booking_series(
+    series_id: int,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    owner_id = db.query(BookingSeries.user_id).filter(BookingSeries.id == series_id).scalar()
+    if owner_id is not None and owner_id != current_user.id and not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="只能取消自己的預約")
+    _, updated = _update_series_status(
+        db, series_id, BookingStatus.cancelled,
+        (BookingStatus.pending, BookingStatus.approved), future_only=True
+    )
+    db.commit()
+    return {"message": "每週固定預約已取消", "series_id": series_id, "cancelled_count": updated}
+
+
+# ---------------------------
+# 管理員審核整個 series
+# ---------------------------
+def _review_series(db: Session, series_id: int, new_status: BookingStatus, result: str):
+    series, updated = _update_series_status(db, series_id, new_status, (BookingStatus.pending,))
+    if not updated:
+        raise HTTPException(status_code=400, detail="此每週固定預約沒有待審核的場次")
+
+    user, venue = series.user, series.venue
+    if user and user.email:
+        enqueue_email(
+            db,
+            to_email=user.email,
+            subject="預約審核結果通知",
+            html_content=f"""
+                <h2>預約審核結果</h2>
+                <p>您的每週固定預約已被<strong>{result}</strong></p>
+                <p>場地：{venue.name}</p>
+                <p>每週{WEEKDAY_NAMES[series.weekday]} {series.start_time.strftime('%H:%M')} - {series.end_time.strftime('%H:%M')}</p>
+                <p>期間：{series.start_date} ～ {series.end_date}，共 {updated} 次</p>
+            """
+        )
+    db.commit()
+    return updated
+
+
+@router.put("/bookings/series/{series_id}/approve")
+def approve_booking_series(
+    series_id: int,
+    admin: CurrentUser = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    updated = _review_series(db, series_id, BookingStatus.approved, "通過")
+    return {"message": "每週固定預約已通過", "series_id": series_id, "updated_count": updated}
+
+
+@router.put("/bookings/series/{series_id}/reject")
+def reject_booking_series(
+    series_id: int,
+    admin: CurrentUser = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    updated = _review_series(db, series_id, BookingStatus.rejected, "拒絕")
+    return {"message": "每週固定預約已拒絕", "series_id": series_id, "updated_count": updated}
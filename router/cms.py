@@ -1,17 +1,36 @@
-from fastapi import APIRouter, Form, HTTPException, Depends
+from fastapi import APIRouter, Form, HTTPException, Depends, Query, Response
 from sqlalchemy.orm import Session
+from typing import List, Optional
 from database import get_db
 from models import Booking, BookingStatus
+from availability_cache import mark_changed
+from schemas import CmsPendingBookingOut
+from auth import CurrentUser, require_admin
+from crud import pending_bookings_page, count_pending_bookings, parse_date_range, PAGE_DEFAULT_LIMIT, PAGE_MAX_LIMIT
 
 router = APIRouter(prefix="/cms", tags=["cms"])
 
 # -------------------------------
 # GET /pending_bookings - 取得待審核預約
 # -------------------------------
-@router.get("/pending_bookings")
-def get_pending_bookings(db: Session = Depends(get_db)):
-    # 直接用字串比對，不需要 BookingStatus
-    return db.query(Booking).filter(Booking.status == BookingStatus.pending).all()
+@router.get("/pending_bookings", response_model=List[CmsPendingBookingOut])
+def get_pending_bookings(
+    response: Response,
+    venue_id: Optional[int] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(PAGE_DEFAULT_LIMIT, ge=1, le=PAGE_MAX_LIMIT),
+    admin: CurrentUser = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    # 只取列表需要的欄位；總筆數放在 X-Total-Count，下一頁 cursor 放在 X-Next-Cursor
+    start, end = parse_date_range(date_from, date_to)
+    rows, next_cursor = pending_bookings_page(db, venue_id, start, end, cursor, limit)
+    response.headers["X-Total-Count"] = str(count_pending_bookings(db, venue_id, start, end))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return rows
 
 # -------------------------------
 # POST /review_booking - 審核預約
@@ -20,6 +39,7 @@ def get_pending_bookings(db: Session = Depends(get_db)):
 def review_booking(
     booking_id: int = Form(...),
     decision: str = Form(...),  # 前端會送 "approved" 或 "rejected"
+    admin: CurrentUser = Depends(require_admin),
     db: Session = Depends(get_db)
 ):
     # 確保 decision 合法
@@ -32,6 +52,7 @@ def review_booking(
 
     # 直接存字串
     booking.status = decision
+    mark_changed(db, booking.venue_id, booking.start_time, booking.end_time)
     db.commit()
     db.refresh(booking)
 
@@ -1,18 +1,31 @@
 # router/my_reservations.py
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from database import get_db
-from models import Booking, Venue  # 調整成你專案真實 model 名稱
+from models import Booking, Venue, BookingStatus  # 調整成你專案真實 model 名稱
+from schemas import ReservationPage
+from auth import CurrentUser, get_current_user, resolve_user_id
+from crud import user_bookings_page, parse_date_range, PAGE_DEFAULT_LIMIT, PAGE_MAX_LIMIT
 from datetime import datetime
 import mysql.connector
 
 router = APIRouter(tags=["reservations"])
 
-@router.get("/my_reservations")
-def get_my_reservations(user_id: int, db: Session = Depends(get_db)):
+@router.get("/my_reservations", response_model=ReservationPage)
+def get_my_reservations(
+    user_id: Optional[int] = None,
+    status: Optional[BookingStatus] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(PAGE_DEFAULT_LIMIT, ge=1, le=PAGE_MAX_LIMIT),
+    current_user: CurrentUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
     """
-    回傳該 user 的預約紀錄（依日期遞減）。
+    回傳該 user 的預約紀錄（依日期遞減），可用 status、date_from / date_to（YYYY-MM-DD）篩選。
+    一次最多 limit 筆；還有下一頁時帶回 next_cursor，下次請求帶 cursor=next_cursor 繼續。
     回傳格式：
     {
       "reservations": [
@@ -24,44 +37,15 @@ def get_my_reservations(user_id: int, db: Session = Depends(get_db)):
           "end_time": "2025-09-26 19:00:00",
           "status": "pending"
         }, ...
-      ]
+      ],
+      "next_cursor": "MjAyNS0wOS0yNlQxODowMDowMHwx"
     }
     """
-    # 檢查 user_id 是否存在（若你想要）
-    # user = db.query(User).filter(User.id == user_id).first()
-    # if not user:
-    #     raise HTTPException(status_code=404, detail="User not found")
-
-    bookings = (
-        db.query(Booking)
-        .filter(Booking.user_id == user_id)
-        .order_by(Booking.start_time.desc())
-        .all()
-    )
-
-    result = []
-    for b in bookings:
-        # 若你的 Booking model 已經有 venue relationship，則可用 b.venue.name
-        venue_name = None
-        try:
-            venue_name = b.venue.name
-        except Exception:
-            v = db.query(Venue).filter(Venue.id == b.venue_id).first()
-            venue_name = v.name if v else ""
-
-        result.append({
-            "booking_id": b.id,
-            "venue_id": b.venue_id,
-            "venue_name": venue_name,
-            "start_time": b.start_time.strftime("%Y-%m-%d %H:%M:%S"),
-            "end_time": b.end_time.strftime("%Y-%m-%d %H:%M:%S"),
-            "people_count": getattr(b, "people_count", None),
-            "contact_phone": getattr(b, "contact_phone", None),
-            "student_ids": getattr(b, "student_ids", None),
-            "status": getattr(b, "status", None).value if getattr(b, "status", None) is not None else getattr(b, "status", None)
-        })
-
-    return {"reservations": result}
+    user_id = resolve_user_id(current_user, user_id)
+    start, end = parse_date_range(date_from, date_to)
+    # 單一查詢 JOIN venues 取得場地名稱，不再每筆 lazy load
+    rows, next_cursor = user_bookings_page(db, user_id, status, start, end, cursor, limit)
+    return {"reservations": rows, "next_cursor": next_cursor}
 
 @router.put("/{reservation_id}/cancel")
 def cancel_reservation(reservation_id: int):
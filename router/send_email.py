@@ -8,6 +8,15 @@ load_dotenv()  # 讀取根目錄的 .env 檔案
 SENDGRID_API_KEY = os.getenv("SENDGRID_API_KEY")  
 EMAIL_FROM = os.getenv("EMAIL_FROM")
 
+_client = None
+
+# 整個行程共用一個 SendGrid client，不必每封信都重建
+def get_client():
+    global _client
+    if _client is None:
+        _client = SendGridAPIClient(SENDGRID_API_KEY)
+    return _client
+
 def send_email(to_email: str, subject: str, html_content: str):
     try:
         message = Mail(
@@ -16,8 +25,7 @@ def send_email(to_email: str, subject: str, html_content: str):
             subject=subject,
             html_content=html_content,
         )
-        sg = SendGridAPIClient(SENDGRID_API_KEY)
-        response = sg.send(message)
+        response = get_client().send(message)
         print(f"Email sent: {response.status_code}")
         return True
     except Exception as e:
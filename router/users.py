@@ -1,11 +1,16 @@
 import re
+import hmac
 import logging
-from fastapi import APIRouter, HTTPException, Form, Depends
+from fastapi import APIRouter, HTTPException, Form, Depends, BackgroundTasks
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from passlib.context import CryptContext
 
-from database import get_db
+from database import get_db, SessionLocal
 from models import User
+from password_hashing import hasher
+from rate_limit import limiter, LOGIN_USER_RULE
+from username_index import index as username_index
+from auth import AUTH_TOKEN_TTL, CurrentUser, create_token, get_current_user, revoke_tokens
 
 # 設定 logging 格式
 logging.basicConfig(
@@ -14,7 +19,30 @@ logging.basicConfig(
 )
 
 router = APIRouter()
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+# 登入成功後在背景把舊格式（明文或舊 cost）的密碼重算成目前設定的 bcrypt
+async def rehash_password(user_id: int, password: str, old_hash: str):
+    try:
+        new_hashed = await hasher.hash(password)
+    except HTTPException:
+        logging.info(f"雜湊佇列忙碌，使用者 {user_id} 的密碼下次登入再重算")
+        return
+    await run_in_threadpool(_store_rehash, user_id, new_hashed, old_hash)
+
+def _store_rehash(user_id: int, new_hashed: str, old_hash: str):
+    db = SessionLocal()
+    try:
+        # 只在密碼沒被其他請求改過時更新
+        db.query(User).filter(User.id == user_id, User.password == old_hash).update(
+            {User.password: new_hashed}, synchronize_session=False
+        )
+        db.commit()
+        logging.info(f"使用者 {user_id} 密碼已重算")
+    except Exception as e:
+        db.rollback()
+        logging.error(f"使用者 {user_id} 密碼重算失敗：{e}")
+    finally:
+        db.close()
 
 # 密碼格式驗證函式
 def is_valid_password(password: str) -> bool:
@@ -41,14 +69,19 @@ def get_users(db: Session = Depends(get_db)):
     return [{"id": u.id, "username": u.username} for u in result]
 
 # 使用者登入
+# login / register 是 async：bcrypt 在 process pool 計算時只等在 event loop 上，資料庫查詢另外丟到 threadpool
 @router.post("/login", operation_id="user_login")
-def login(
+async def login(
+    background_tasks: BackgroundTasks,
     username: str = Form(...),
     password: str = Form(...),
     db: Session = Depends(get_db)
 ):
     logging.info(f"登入請求：username={username}")
-    user = db.query(User).filter(User.username == username).first()
+    # 同一帳號短時間內嘗試太多次（可能是猜密碼），不再做 bcrypt 驗證；
+    # key 只用帳號，換 IP 也繞不過（每個 IP 的總額度由 middleware 另外限制）
+    await limiter.enforce(f"login:{username}", LOGIN_USER_RULE)
+    user = await run_in_threadpool(lambda: db.query(User).filter(User.username == username).first())
 
     if not user:
         logging.warning(f"登入失敗：使用者 {username} 不存在")
@@ -56,28 +89,43 @@ def login(
 
     db_password = user.password
 
-    # 如果密碼不是 bcrypt 開頭，進行轉換
+    # 如果密碼不是 bcrypt 開頭（舊資料的明文），直接比對，登入成功後再於背景轉換
     if not db_password.startswith("$2"):
-        logging.warning(f"使用者 {username} 密碼不是加密格式，進行轉換")
-        new_hashed = pwd_context.hash(db_password)
-        user.password = new_hashed
-        db.commit()
-        db_password = new_hashed
+        logging.warning(f"使用者 {username} 密碼不是加密格式，登入後轉換")
+        ok, needs_update = hmac.compare_digest(password.encode(), db_password.encode()), True
+    else:
+        ok, needs_update = await hasher.verify(password, db_password)
 
-    if not pwd_context.verify(password, db_password):
+    if not ok:
         logging.warning(f"使用者 {username} 登入失敗：密碼錯誤")
         raise HTTPException(status_code=401, detail="帳號或密碼錯誤")
 
+    if needs_update:
+        background_tasks.add_task(rehash_password, user.id, password, db_password)
+
     logging.info(f"使用者 {username} 登入成功")
     return {
         "message": f"登入成功，歡迎 {username}！",
         "user_id": user.id,
-        "username": username
+        "username": username,
+        "role": user.role,
+        # 之後的請求以 Authorization: Bearer <access_token> 帶上
+        "access_token": create_token(user.id, user.role),
+        "token_type": "bearer",
+        "expires_in": AUTH_TOKEN_TTL
     }
 
+# 登出：目前發出的 token 全部失效
+@router.post("/logout", operation_id="user_logout")
+def logout(current_user: CurrentUser = Depends(get_current_user), db: Session = Depends(get_db)):
+    revoke_tokens(db, current_user.id)
+    db.commit()
+    logging.info(f"使用者 {current_user.id} 已登出")
+    return {"message": "已登出"}
+
 # 註冊帳號
 @router.post("/register", operation_id="user_register")
-def register(
+async def register(
     username: str = Form(...),
     password: str = Form(...),
     email: str = Form(...),
@@ -92,23 +140,43 @@ def register(
             detail="密碼格式錯誤，需包含大小寫英文與數字，且長度至少8位"
         )
 
-    if db.query(User).filter(User.username == username).first():
+    if await run_in_threadpool(lambda: db.query(User.id).filter(User.username == username).first()):
         logging.warning(f"註冊失敗：帳號 {username} 已存在")
         raise HTTPException(status_code=400, detail="帳號已存在")
 
-    hashed_password = pwd_context.hash(password[:72])
-    new_user = User(username=username, password=hashed_password, email=email)
-    db.add(new_user)
-    db.commit()
+    hashed_password = await hasher.hash(password[:72])
+    user_id = await run_in_threadpool(_create_user, db, username, hashed_password, email)
+    username_index.add(username, email, user_id)
 
     logging.info(f"使用者 {username} 註冊成功")
     return {"message": "註冊成功"}
 
-# 檢查帳號是否存在
+def _create_user(db: Session, username: str, hashed_password: str, email: str) -> int:
+    new_user = User(username=username, password=hashed_password, email=email)
+    db.add(new_user)
+    db.commit()
+    return new_user.id
+
+# 檢查帳號是否存在（註冊表單每打一個字就會呼叫，多數情況由記憶體內索引直接回答）
 @router.get("/check_username", operation_id="check_username_exists")
 def check_username(username: str, db: Session = Depends(get_db)):
-    logging.info(f"檢查帳號是否存在：{username}")
-    user = db.query(User).filter(User.username == username).first()
-    exists = bool(user)
-    logging.info(f"帳號 {username} 是否存在：{exists}")
+    exists = username_index.username_exists(db, username)
+    logging.debug(f"帳號 {username} 是否存在：{exists}")
     return {"exists": exists}
+
+# 檢查 email 是否已被註冊
+@router.get("/check_email", operation_id="check_email_exists")
+def check_email(email: str, db: Session = Depends(get_db)):
+    exists = username_index.email_exists(db, email)
+    logging.debug(f"email {email} 是否存在：{exists}")
+    return {"exists": exists}
+
+# 帳號索引的大小與省下的查詢次數
+@router.get("/username_index/stats", operation_id="username_index_stats")
+def username_index_stats():
+    return username_index.stats()
+
+# 密碼雜湊 process pool 的排隊 / 計算時間
+@router.get("/password_hash/stats", operation_id="password_hash_stats")
+def password_hash_stats():
+    return hasher.stats()
@@ -0,0 +1,146 @@
+# schedule_bitmap.py
+# 場地單日時段的 bitmap 表示法：把一天切成固定長度的格子（預設 30 分鐘，一天 48 格），
+# 第 i 個 bit 代表 day 00:00 + i × granularity 開始的那一格。
+# 衝突檢查、找連續空檔、跨場地聯集 / 交集都變成整數的位元運算。
+# 使用處：booking_engine.check_bookable 的佔用衝突檢查、/api/availability_matrix 的 bitmask 格式與跨場地 any / all。
+from datetime import date, datetime, time, timedelta
+
+SLOT_MINUTES = 30
+
+
+class DaySchedule:
+    def __init__(self, day: date, granularity: int = SLOT_MINUTES, open_bits: int = 0, busy_bits: int = 0):
+        if (24 * 60) % granularity:
+            raise ValueError("granularity 需能整除一天的分鐘數")
+        self.day = day
+        self.granularity = granularity
+        self.cells = 24 * 60 // granularity
+        self.open_bits = open_bits
+        self.busy_bits = busy_bits
+
+    # ---------- 建立 ----------
+    @classmethod
+    def from_rows(cls, day: date, slots, bookings=(), granularity: int = SLOT_MINUTES):
+        """
+        slots / bookings 可以是 ORM 物件、查詢結果列（有 start_time / end_time）或 (start, end) tuple。
+        開放時段只算完整落在時段內的格子；預約只要碰到就整格算佔用。
+        """
+        schedule = cls(day, granularity)
+        for s in slots:
+            start, end = _interval(s)
+            schedule.open_bits |= schedule.mask(start, end, inner=True)
+        for b in bookings:
+            start, end = _interval(b)
+            schedule.busy_bits |= schedule.mask(start, end, inner=False)
+        return schedule
+
+    def _cell(self, value, round_up: bool) -> int:
+        if isinstance(value, time):
+            minutes = value.hour * 60 + value.minute + value.second / 60
+        else:
+            delta = value - datetime.combine(self.day, time.min)
+            minutes = delta.total_seconds() / 60
+        cell = minutes / self.granularity
+        cell = int(-(-cell // 1)) if round_up else int(cell // 1)
+        return min(max(cell, 0), self.cells)
+
+    def mask(self, start, end, inner: bool = True) -> int:
+        """[start, end) 對應的位元遮罩；inner=True 只取完整涵蓋的格子，否則取所有碰到的格子。"""
+        first = self._cell(start, round_up=inner)
+        last = self._cell(end, round_up=not inner)
+        if last <= first:
+            return 0
+        return ((1 << (last - first)) - 1) << first
+
+    @classmethod
+    def full_day(cls, day: date, granularity: int = SLOT_MINUTES):
+        """整天開放、只記佔用的 schedule，衝突檢查用（開放時段另外判斷）。"""
+        schedule = cls(day, granularity)
+        schedule.open_bits = (1 << schedule.cells) - 1
+        return schedule
+
+    def reserve(self, start, end):
+        """把 [start, end) 碰到的格子標成佔用。"""
+        self.busy_bits |= self.mask(start, end, inner=False)
+
+    def aligned(self, start, end) -> bool:
+        """[start, end) 的兩端都落在格線上、且在這一天之內；此時 bitmap 的判斷與逐一比對區間完全相同。"""
+        day_start = datetime.combine(self.day, time.min)
+        step = timedelta(minutes=self.granularity)
+        return (day_start <= start <= end <= day_start + timedelta(days=1)
+                and (start - day_start) % step == timedelta(0) and (end - day_start) % step == timedelta(0))
+
+    # ---------- 查詢 ----------
+    @property
+    def free_bits(self) -> int:
+        return self.open_bits & ~self.busy_bits
+
+    def is_range_free(self, start, end) -> bool:
+        need = self.mask(start, end, inner=False)
+        return bool(need) and (self.free_bits & need) == need
+
+    def first_free_run(self, k: int, after=None):
+        """回傳第一段連續 k 格都空閒的 (start, end) datetime；after 之前的格子不考慮。沒有則回傳 None。"""
+        if k <= 0:
+            raise ValueError("k 需大於 0")
+        bits = self.free_bits
+        if after is not None:
+            bits &= ~((1 << self._cell(after, round_up=True)) - 1)
+        # run 的第 i 個 bit 為 1 代表從第 i 格開始連續 k 格都空閒
+        run = bits
+        for i in range(1, k):
+            run &= bits >> i
+            if not run:
+                return None
+        if not run:
+            return None
+        first = (run & -run).bit_length() - 1
+        return self.cell_start(first), self.cell_start(first + k)
+
+    def free_runs(self):
+        """把空閒格子合併成連續區段，回傳 [(start, end), ...]。"""
+        runs = []
+        bits = self.free_bits
+        i = 0
+        while bits:
+            if bits & 1:
+                j = i
+                while bits & 1:
+                    bits >>= 1
+                    j += 1
+                runs.append((self.cell_start(i), self.cell_start(j)))
+                i = j
+            else:
+                skip = (bits & -bits).bit_length() - 1
+                bits >>= skip
+                i += skip
+        return runs
+
+    def cell_start(self, index: int) -> datetime:
+        return datetime.combine(self.day, time.min) + timedelta(minutes=index * self.granularity)
+
+    # ---------- 跨場地 ----------
+    @staticmethod
+    def union(schedules) -> int:
+        """任一場地空閒的格子。"""
+        bits = 0
+        for s in schedules:
+            bits |= s.free_bits
+        return bits
+
+    @staticmethod
+    def intersection(schedules) -> int:
+        """所有場地都空閒的格子。"""
+        schedules = list(schedules)
+        if not schedules:
+            return 0
+        bits = schedules[0].free_bits
+        for s in schedules[1:]:
+            bits &= s.free_bits
+        return bits
+
+
+def _interval(item):
+    if isinstance(item, tuple) and len(item) == 2:
+        return item
+    return item.start_time, item.end_time
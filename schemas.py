@@ -1,26 +1,90 @@
-# # schemas.py
-# from pydantic import BaseModel
+# schemas.py
+# 回應用的 Pydantic v2 model。
+#   - from_attributes：router 直接回傳查詢結果列（Row）或 ORM 物件，由 FastAPI 驗證、轉成 JSON
+#   - 日期 / 時間格式由序列化器處理，router 不再逐列呼叫 strftime / isoformat
+from datetime import date, datetime
+from typing import Annotated, List, Optional
 
-# class BookingOut(BaseModel):
-#     id: int
-#     venue_name: str
-#     date: str
-#     start_time: str
-#     end_time: str
-#     status: str
+from pydantic import AliasChoices, BaseModel, ConfigDict, Field, PlainSerializer, computed_field
 
-#     class Config:
-#         orm_mode = True
+from models import BookingStatus
+
+# 輸出格式
+DateTimeText = Annotated[datetime, PlainSerializer(lambda v: v.strftime("%Y-%m-%d %H:%M:%S"), return_type=str)]
+ClockText = Annotated[datetime, PlainSerializer(lambda v: v.strftime("%H:%M"), return_type=str)]
 
-from pydantic import BaseModel
 
 class BookingOut(BaseModel):
+    """/my_bookings：{"id", "venue_name", "date": "2025-09-26", "start_time": "18:00", "end_time": "19:00", "status"}"""
+    model_config = ConfigDict(from_attributes=True)
+
     id: int
     venue_name: str
-    date: str
-    start_time: str
-    end_time: str
-    status: str
+    start_time: ClockText
+    end_time: ClockText
+    status: BookingStatus
+
+    @computed_field
+    @property
+    def date(self) -> date:
+        return self.start_time.date()
+
+
+class ReservationOut(BaseModel):
+    """/api/my_reservations 的一筆；時間格式為 "2025-09-26 18:00:00"。"""
+    model_config = ConfigDict(from_attributes=True)
+
+    booking_id: int = Field(validation_alias=AliasChoices("booking_id", "id"))
+    venue_id: int
+    venue_name: str
+    start_time: DateTimeText
+    end_time: DateTimeText
+    people_count: Optional[int] = None
+    contact_phone: Optional[str] = None
+    student_ids: Optional[str] = None
+    status: Optional[BookingStatus] = None
+
+
+class ReservationPage(BaseModel):
+    reservations: List[ReservationOut]
+    next_cursor: Optional[str] = None
+
 
-    class Config:
-        orm_mode = True
+class PendingBookingOut(BaseModel):
+    """/bookings/pending 的一筆；時間為 ISO 8601。"""
+    model_config = ConfigDict(from_attributes=True)
+
+    booking_id: int = Field(validation_alias=AliasChoices("booking_id", "id"))
+    username: str
+    venue_name: str
+    start_time: datetime
+    end_time: datetime
+    people_count: int
+    contact_phone: str
+    student_ids: str
+    created_at: datetime
+    status: BookingStatus
+
+
+class PendingBookingPage(BaseModel):
+    bookings: List[PendingBookingOut]
+    next_cursor: Optional[str] = None
+
+
+class CmsPendingBookingOut(BaseModel):
+    """/cms/pending_bookings 的一筆，欄位與 bookings 表相同，另附 username / venue_name。"""
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    user_id: int
+    username: str
+    venue_id: int
+    venue_name: str
+    start_time: datetime
+    end_time: datetime
+    people_count: int
+    contact_phone: str
+    student_ids: str
+    created_at: datetime
+    status: BookingStatus
+    series_id: Optional[int] = None
@@ -0,0 +1,66 @@
+# slot_search.py
+# 「幫我找最近的空檔」：跨所有場地，由 start 開始一天一天往後掃，
+# 找到 limit 個符合時長、人數的空檔就停止，不必把每個場地的完整行程都算出來。
+from datetime import datetime, timedelta
+
+from sqlalchemy.orm import Session
+
+import availability_cache
+from models import Venue
+
+# 最多往後找幾天
+SEARCH_MAX_DAYS = 30
+
+
+def to_local_naive(dt: datetime) -> datetime:
+    # 資料庫存的是本地時間（無時區）；帶時區的參數（例如 2025-09-26T17:00:00+08:00）先換成本地時間
+    if dt is not None and dt.tzinfo is not None:
+        return dt.astimezone().replace(tzinfo=None)
+    return dt
+
+
+def find_next_free(db: Session, duration_minutes: int, people_count: int = 1,
+                   start: datetime = None, end: datetime = None, limit: int = 5):
+    """
+    回傳最早的 limit 個空檔 [{"venue_id", "venue_name", "start", "end"}, ...]，依開始時間排序。
+    候選一律從某個空閒時段的開頭起算、且完整落在該時段內，和 /book 的檢查規則一致，找到的都能直接預約。
+    """
+    start = to_local_naive(start) or datetime.now()
+    end = to_local_naive(end)
+    end = end or start + timedelta(days=SEARCH_MAX_DAYS)
+    end = min(end, start + timedelta(days=SEARCH_MAX_DAYS))
+    duration = timedelta(minutes=duration_minutes)
+
+    venues = (
+        db.query(Venue.id, Venue.name)
+        .filter(Venue.capacity >= people_count)
+        .order_by(Venue.id)
+        .all()
+    )
+    if not venues:
+        return []
+    names = {v.id: v.name for v in venues}
+
+    found = []
+    day = start.date()
+    chunk = 1
+    while day <= end.date() and len(found) < limit:
+        # 先看一天，沒湊滿再逐步擴大每次查詢的天數（1 → 2 → 4 → 7），空檔很少時查詢次數也有上限
+        days = [day + timedelta(days=i) for i in range(chunk) if day + timedelta(days=i) <= end.date()]
+        free = availability_cache.get_free_slots_by_day(db, list(names), days)
+        for vid in names:
+            for d in days:
+                for s in free[vid].get(d, []):
+                    if s.start_time >= start and s.start_time + duration <= min(s.end_time, end):
+                        found.append({
+                            "venue_id": vid,
+                            "venue_name": names[vid],
+                            "start": s.start_time,
+                            "end": s.start_time + duration,
+                        })
+        # 這一批的候選一定早於之後的日子，湊滿就可以停
+        day = days[-1] + timedelta(days=1)
+        chunk = min(chunk * 2, 7)
+
+    found.sort(key=lambda f: (f["start"], f["venue_id"]))
+    return found[:limit]
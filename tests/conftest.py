@@ -0,0 +1,34 @@
+# tests/conftest.py
+# 測試共用設定：匯入任何模組前先給好環境變數，並讓 tests/ 底下可以直接 import 專案根目錄的模組。
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "test.db"))
+os.environ.setdefault("LINE_CHANNEL_SECRET", "test-secret")
+os.environ.setdefault("LINE_CHANNEL_ACCESS_TOKEN", "test-token")
+os.environ.setdefault("AUTH_SECRET", "test-auth-secret")
+os.environ.setdefault("EMAIL_OUTBOX_ENABLED", "0")
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+
+@pytest.fixture
+def db():
+    """每個測試一個全新的 in-memory SQLite（含 models 宣告的索引）。"""
+    import models  # noqa: F401  註冊所有資料表
+    from database import Base
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine, autoflush=False)()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
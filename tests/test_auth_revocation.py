@@ -0,0 +1,68 @@
+# tests/test_auth_revocation.py
+# 登出後同一個 token 立即失效：登入、登出、再用同一個 token 發請求，全在同一秒內完成也要回 401。
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import auth
+import rate_limit
+from auth import CurrentUser, get_current_user
+from database import Base, get_db
+from models import User
+from password_hashing import hasher
+from router.users import router as users_router
+
+
+def _client(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'auth.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+
+    def get_test_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app = FastAPI()
+    app.include_router(users_router)
+    app.dependency_overrides[get_db] = get_test_db
+
+    @app.get("/me")
+    def me(current_user: CurrentUser = Depends(get_current_user)):
+        return {"id": current_user.id}
+
+    db = Session()
+    db.add(User(username="alice", password="Passw0rd", email="a@x"))   # 明碼舊帳號，登入時才重新雜湊
+    db.commit()
+    db.close()
+    return TestClient(app), engine
+
+
+def _login(client):
+    response = client.post("/login", data={"username": "alice", "password": "Passw0rd"})
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def test_token_is_rejected_right_after_logout(tmp_path, monkeypatch):
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_ENABLED", False)
+    client, engine = _client(tmp_path)
+    hasher.start()
+    try:
+        headers = _login(client)
+        assert client.get("/me", headers=headers).status_code == 200
+        assert client.post("/logout", headers=headers).status_code == 200
+
+        assert client.get("/me", headers=headers).status_code == 401
+        # 其他 worker 沒有快取，從 token_revocations 讀到的結果一樣
+        auth._revocations.clear()
+        assert client.get("/me", headers=headers).status_code == 401
+
+        # 重新登入拿到的新 token 不受影響
+        assert client.get("/me", headers=_login(client)).status_code == 200
+    finally:
+        hasher.stop()
+        engine.dispose()
@@ -0,0 +1,47 @@
+# tests/test_availability_cache.py
+# 查詢進行中剛好有預約 commit（快取被清掉）時，查到的舊資料不可以回填快取。
+from datetime import date, datetime
+
+import availability_cache
+
+DAY = date(2030, 1, 7)
+STALE = [("slot", datetime(2030, 1, 7, 10), datetime(2030, 1, 7, 11))]
+
+
+def setup_function():
+    availability_cache.cache.clear()
+
+
+def test_invalidation_during_query_is_not_overwritten(monkeypatch):
+    calls = []
+
+    def find_free_slots(db, venue_id, start, end):
+        calls.append(venue_id)
+        if len(calls) == 1:
+            # 查詢期間另一個請求 commit 了這個時段的預約
+            availability_cache._invalidate_local(venue_id, DAY)
+        return STALE
+
+    monkeypatch.setattr(availability_cache, "find_free_slots", find_free_slots)
+    assert availability_cache.get_free_slots(None, 1, DAY) == STALE
+    assert (1, DAY) not in availability_cache.cache
+
+    # 沒有異動時正常回填，下一次直接命中
+    availability_cache.get_free_slots(None, 1, DAY)
+    availability_cache.get_free_slots(None, 1, DAY)
+    assert len(calls) == 2
+
+
+def test_invalidation_during_range_query_skips_only_changed_days(monkeypatch):
+    other_day = date(2030, 1, 8)
+
+    def find_free_slots_by_day(db, venue_ids, range_start, range_end):
+        availability_cache._invalidate_local(1, DAY)
+        return {vid: {DAY: STALE, other_day: STALE} for vid in venue_ids}
+
+    monkeypatch.setattr(availability_cache, "find_free_slots_by_day", find_free_slots_by_day)
+    result = availability_cache.get_free_slots_by_day(None, [1, 2], [DAY, other_day])
+    assert result[1][DAY] == STALE
+    assert (1, DAY) not in availability_cache.cache
+    assert (1, other_day) in availability_cache.cache
+    assert (2, DAY) in availability_cache.cache
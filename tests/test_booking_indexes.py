@@ -0,0 +1,92 @@
+# tests/test_booking_indexes.py
+# 衝突檢查與列表查詢要走 7c2e9b1d4a63 / d83a4c6f2b10 建立的索引：
+# 記錄程式實際送出的 SQL，再用 EXPLAIN QUERY PLAN 確認（SQLite；PostgreSQL 的 partial index 需另外在正式資料庫確認）。
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, text
+
+import crud
+from availability import find_free_slots
+from booking_engine import check_bookable
+from models import AvailableSlot, Booking, BookingStatus, User, Venue
+
+DAY = datetime(2030, 1, 7)
+
+
+@contextmanager
+def captured_selects(db):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    engine = db.get_bind()
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+
+def query_plan(db, statement, parameters) -> str:
+    rows = db.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+    return "\n".join(r[-1] for r in rows)
+
+
+def seed(db):
+    """50 個使用者、5 個場地、兩個月的預約，跑過 ANALYZE，讓查詢規劃器依實際分布選索引。"""
+    db.add_all([User(id=u, username=f"u{u}", password="x", email=f"u{u}@example.com") for u in range(1, 51)])
+    db.add_all([Venue(id=v, name=f"場地{v}", capacity=10) for v in range(1, 6)])
+    statuses = [BookingStatus.approved, BookingStatus.approved, BookingStatus.pending, BookingStatus.cancelled]
+    for d in range(60):
+        day = DAY + timedelta(days=d)
+        for v in range(1, 6):
+            db.add(AvailableSlot(venue_id=v, start_time=day + timedelta(hours=8), end_time=day + timedelta(hours=22)))
+            for h in range(8, 22, 2):
+                db.add(Booking(user_id=(d * 7 + v * 3 + h) % 50 + 1, venue_id=v,
+                               start_time=day + timedelta(hours=h), end_time=day + timedelta(hours=h + 1),
+                               people_count=1, contact_phone="0900000000", student_ids="s1",
+                               status=statuses[(d + h) % len(statuses)]))
+    db.commit()
+    db.execute(text("ANALYZE"))
+
+
+def plans_for(db, fn):
+    with captured_selects(db) as statements:
+        fn()
+    assert statements, "沒有送出任何查詢"
+    return [query_plan(db, s, p) for s, p in statements]
+
+
+def test_conflict_check_uses_indexes(db):
+    seed(db)
+    slot_plan, booking_plan = plans_for(
+        db, lambda: check_bookable(db, [(1, 1, DAY + timedelta(hours=10), DAY + timedelta(hours=11))])
+    )
+    assert "ix_available_slots_venue_start_end" in slot_plan
+    # user_id IN (...) OR venue_id IN (...)：兩個條件各走自己的索引
+    assert "ix_bookings_user_start_end" in booking_plan
+    assert "ix_bookings_venue_start_end_status" in booking_plan
+    assert "SCAN bookings" not in booking_plan
+
+
+def test_free_slot_listing_uses_indexes(db):
+    seed(db)
+    slot_plan, booking_plan = plans_for(db, lambda: find_free_slots(db, 1, DAY, DAY + timedelta(days=1)))
+    assert "ix_available_slots_venue_start_end" in slot_plan
+    assert "ix_bookings_venue_start_end_status" in booking_plan
+
+
+def test_my_bookings_listing_uses_user_index(db):
+    seed(db)
+    (plan,) = plans_for(db, lambda: crud.user_bookings_page(db, 1, limit=10))
+    assert "ix_bookings_user_start_end" in plan
+    assert "SCAN bookings" not in plan
+
+
+def test_pending_queue_uses_status_index(db):
+    seed(db)
+    plans = plans_for(db, lambda: crud.pending_bookings_page(db, limit=10))
+    assert all("ix_bookings_status_start_id" in plan for plan in plans)
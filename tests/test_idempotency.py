@@ -0,0 +1,31 @@
+# tests/test_idempotency.py
+# 兩個帶同一個 Idempotency-Key 的請求同時通過 replay() 檢查：後 commit 的那個要回傳先完成的回應，而不是 500。
+import json
+from datetime import datetime
+
+import idempotency
+from models import IdempotencyRecord
+
+ENDPOINT = "PUT /bookings/1/cancel"
+
+
+def test_concurrent_commit_replays_first_response(db):
+    idempotency._cache.clear()
+    # 另一個請求已經 commit 了同一個 key
+    db.add(IdempotencyRecord(
+        key="k1", user_id=7, endpoint=ENDPOINT, status_code=200,
+        response_body=json.dumps({"message": "first"}),
+        expires_at=datetime(2100, 1, 1),
+    ))
+    db.commit()
+
+    replayed = idempotency.commit(db, "k1", 7, ENDPOINT, {"message": "second"})
+    assert replayed is not None
+    assert json.loads(replayed.body) == {"message": "first"}
+    assert replayed.headers["Idempotent-Replayed"] == "true"
+    assert db.query(IdempotencyRecord).count() == 1
+
+
+def test_commit_without_conflict_returns_none(db):
+    assert idempotency.commit(db, "k2", 7, ENDPOINT, {"message": "ok"}) is None
+    assert db.query(IdempotencyRecord).filter(IdempotencyRecord.key == "k2").count() == 1
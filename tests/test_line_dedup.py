@@ -0,0 +1,42 @@
+# tests/test_line_dedup.py
+# 去重紀錄只在事件真的排入處理後才算數：排入失敗時 forget()，LINE 重送的同一事件要能再處理。
+import asyncio
+from types import SimpleNamespace
+
+from line_dedup import EventDeduplicator
+
+
+class FakeSharedStore:
+    def __init__(self):
+        self.keys = set()
+
+    def add(self, key, ttl):
+        if key in self.keys:
+            return False
+        self.keys.add(key)
+        return True
+
+    def discard(self, key):
+        self.keys.discard(key)
+
+
+def event(event_id, redelivery=False):
+    return SimpleNamespace(webhook_event_id=event_id, reply_token="token",
+                           delivery_context=SimpleNamespace(is_redelivery=redelivery))
+
+
+def test_forget_lets_redelivery_through():
+    shared = FakeSharedStore()
+    dedup = EventDeduplicator(shared=shared)
+
+    async def scenario():
+        assert await dedup.is_new(event("E1"))
+        assert not await dedup.is_new(event("E1", redelivery=True))
+        # 排入失敗：本機與共用紀錄都要撤銷
+        await dedup.forget(event("E1"))
+        assert shared.keys == set()
+        assert await dedup.is_new(event("E1", redelivery=True))
+
+    asyncio.run(scenario())
+    assert dedup.stats()["duplicates_dropped"] == 1
+    assert dedup.stats()["forgotten"] == 1
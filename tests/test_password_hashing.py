@@ -0,0 +1,77 @@
+# tests/test_password_hashing.py
+# 登入尖峰時 bcrypt 在 process pool 計算、login 只等在 event loop 上：
+# 把 threadpool 縮到很小，一批登入進行中，同步的 endpoint 仍然馬上有 thread 可用。
+import asyncio
+import time
+
+import anyio
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import rate_limit
+from database import Base, get_db
+from models import User
+from password_hashing import hasher
+from router.users import router as users_router
+
+LOGINS = 6
+THREADS = 2
+
+
+def test_sync_routes_are_served_during_login_burst(tmp_path, monkeypatch):
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_ENABLED", False)
+    engine = create_engine(f"sqlite:///{tmp_path / 'burst.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+
+    def get_test_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app = FastAPI()
+    app.include_router(users_router)
+    app.dependency_overrides[get_db] = get_test_db
+
+    @app.get("/ping")
+    def ping():   # 同步 endpoint，和 /book 一樣在 threadpool 執行
+        return {"ok": True}
+
+    hasher.start()
+    try:
+        async def scenario():
+            anyio.to_thread.current_default_thread_limiter().total_tokens = THREADS
+            db = Session()
+            db.add(User(username="alice", password=await hasher.hash("Passw0rd"), email="a@x"))
+            db.commit()
+            db.close()
+
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                started = time.perf_counter()
+                logins = asyncio.gather(*(
+                    client.post("/login", data={"username": "alice", "password": "Passw0rd"}) for _ in range(LOGINS)
+                ))
+                await asyncio.sleep(0.05)
+                ping_latency = []
+                for _ in range(5):
+                    t = time.perf_counter()
+                    assert (await client.get("/ping")).status_code == 200
+                    ping_latency.append(time.perf_counter() - t)
+                pinged = time.perf_counter() - started
+                responses = await logins
+                burst = time.perf_counter() - started
+            return ping_latency, pinged, burst, responses
+
+        ping_latency, pinged, burst, responses = asyncio.run(scenario())
+    finally:
+        hasher.stop()
+        engine.dispose()
+
+    assert [r.status_code for r in responses] == [200] * LOGINS
+    # 登入還在進行時 /ping 就都回來了，且每次都很快
+    assert pinged < burst
+    assert max(ping_latency) < 0.5, ping_latency
@@ -0,0 +1,73 @@
+# tests/test_rate_limit.py
+# 限流檢查不在 event loop 上等網路：blocking 的 backend（Redis）改在 thread 執行。
+import asyncio
+import threading
+
+import rate_limit
+from rate_limit import LocalBackend, RateLimiter, RateLimitMiddleware, Rule
+
+
+class SlowBackend(LocalBackend):
+    """模擬 Redis：take 會阻塞，並記下在哪個 thread 執行。"""
+
+    blocking = True
+
+    def __init__(self):
+        super().__init__(max_keys=100)
+        self.threads = []
+
+    def take(self, key, rule, cost=1, now=None):
+        self.threads.append(threading.get_ident())
+        threading.Event().wait(0.2)
+        return super().take(key, rule, cost, now)
+
+
+def test_blocking_backend_runs_off_the_event_loop(monkeypatch):
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_ENABLED", True)
+    backend = SlowBackend()
+    limiter = RateLimiter(backend)
+
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        retry_after = await limiter.check("k", Rule(1, 60))
+        task.cancel()
+        return retry_after, ticks
+
+    retry_after, ticks = asyncio.run(scenario())
+    assert retry_after == 0
+    assert backend.threads and backend.threads[0] != threading.get_ident()
+    # 等 Redis 的 0.2 秒內，event loop 仍在跑其他工作
+    assert ticks >= 5
+
+
+def test_middleware_rejects_with_retry_after(monkeypatch):
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(rate_limit, "REGISTER_IP_RULE", Rule(1, 600))
+    calls = []
+
+    async def app(scope, receive, send):
+        calls.append(scope["path"])
+
+    middleware = RateLimitMiddleware(app, RateLimiter(SlowBackend()))
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    scope = {"type": "http", "method": "POST", "path": "/register", "headers": [], "client": ("10.0.0.1", 1)}
+    asyncio.run(middleware(scope, receive, send))
+    asyncio.run(middleware(scope, receive, send))
+    assert calls == ["/register"]
+    assert sent[0]["status"] == 429
+    assert (b"retry-after", b"600") in sent[0]["headers"]
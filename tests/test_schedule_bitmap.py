@@ -0,0 +1,87 @@
+# tests/test_schedule_bitmap.py
+# DaySchedule 的區間檢查、找連續空檔、跨場地聯集 / 交集，以及 check_bookable 用 bitmap 時結果與逐一比對相同。
+from datetime import date, datetime, timedelta
+
+from fastapi import HTTPException
+
+from booking_engine import check_bookable
+from models import AvailableSlot, Booking, BookingStatus, User, Venue
+from schedule_bitmap import DaySchedule
+
+DAY = date(2030, 1, 7)
+
+
+def at(hour, minute=0, day=DAY):
+    return datetime(day.year, day.month, day.day) + timedelta(hours=hour, minutes=minute)
+
+
+def test_range_free_respects_open_and_busy_cells():
+    schedule = DaySchedule.from_rows(DAY, [(at(8), at(12))], [(at(9), at(10))])
+    assert schedule.is_range_free(at(8), at(9))
+    assert schedule.is_range_free(at(10), at(12))
+    assert not schedule.is_range_free(at(8), at(10))      # 碰到 9:00 的預約
+    assert not schedule.is_range_free(at(11), at(13))     # 超出開放時段
+    assert not schedule.is_range_free(at(9, 30), at(9, 30))
+
+
+def test_partial_cells():
+    # 開放時段只算完整的格子；預約碰到就整格佔用
+    schedule = DaySchedule.from_rows(DAY, [(at(8, 10), at(10))], [(at(9, 40), at(9, 50))])
+    assert not schedule.is_range_free(at(8), at(8, 30))
+    assert schedule.is_range_free(at(8, 30), at(9, 30))
+    assert not schedule.is_range_free(at(9, 30), at(10))
+
+
+def test_first_free_run_and_free_runs():
+    schedule = DaySchedule.from_rows(DAY, [(at(8), at(12)), (at(14), at(18))], [(at(9), at(10)), (at(15), at(16))])
+    assert schedule.first_free_run(2) == (at(8), at(9))
+    assert schedule.first_free_run(3) == (at(10), at(11, 30))
+    assert schedule.first_free_run(3, after=at(11)) == (at(16), at(17, 30))
+    assert schedule.first_free_run(5) is None
+    assert schedule.free_runs() == [(at(8), at(9)), (at(10), at(12)), (at(14), at(15)), (at(16), at(18))]
+
+
+def test_union_and_intersection():
+    a = DaySchedule.from_rows(DAY, [(at(8), at(10))])
+    b = DaySchedule.from_rows(DAY, [(at(9), at(11))])
+    assert DaySchedule.union([a, b]) == a.mask(at(8), at(11))
+    assert DaySchedule.intersection([a, b]) == a.mask(at(9), at(10))
+    assert DaySchedule.intersection([]) == 0
+
+
+def test_aligned():
+    schedule = DaySchedule.full_day(DAY)
+    assert schedule.aligned(at(8), at(9, 30))
+    assert schedule.aligned(at(23), at(0, day=DAY + timedelta(days=1)))
+    assert not schedule.aligned(at(8, 15), at(9))
+    assert not schedule.aligned(at(23), at(1, day=DAY + timedelta(days=1)))
+
+
+def _codes(results):
+    return [r.status_code if isinstance(r, HTTPException) else None for r in results]
+
+
+def test_check_bookable_bitmap_matches_interval_fallback(db):
+    db.add_all([User(id=1, username="u1", password="x", email="u1@x"), User(id=2, username="u2", password="x", email="u2@x"),
+                Venue(id=1, name="羽球場", capacity=10), Venue(id=2, name="桌球室", capacity=4)])
+    for vid in (1, 2):
+        db.add(AvailableSlot(venue_id=vid, start_time=at(8), end_time=at(22)))
+    db.add(Booking(user_id=1, venue_id=1, start_time=at(10), end_time=at(11), contact_phone="0",
+                   people_count=1, student_ids="s", status=BookingStatus.approved))
+    db.commit()
+
+    requests = [
+        (2, 1, at(10, 30), at(11, 30)),   # 場地衝突
+        (1, 2, at(10), at(12)),           # 同一使用者另一個場地
+        (2, 1, at(11), at(12)),           # 緊接在後，可預約
+        (2, 2, at(11, 30), at(12, 30)),   # 與上一筆（同一批）的使用者時段重疊
+        (2, 1, at(7), at(9)),             # 不在開放時段內
+    ]
+    expected = [409, 409, None, 409, 400]
+    assert _codes(check_bookable(db, requests)) == expected
+
+    # 同樣的情境錯開 1 分鐘（無法用 30 分鐘的格子表示），改走逐一比對，結果相同
+    shifted = [(u, v, s + timedelta(minutes=1), e + timedelta(minutes=1)) for u, v, s, e in requests]
+    db.query(Booking).update({Booking.start_time: at(10, 1), Booking.end_time: at(11, 1)})
+    db.commit()
+    assert _codes(check_bookable(db, shifted)) == expected
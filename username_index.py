@@ -0,0 +1,167 @@
+# username_index.py
+# 註冊表單打字時的帳號 / email 是否已存在檢查：
+#   - Bloom filter 記住所有已存在的 username / email，說「沒有」就一定沒有，直接回答可用、不查資料庫
+#   - 說「可能有」時：本 worker 最近註冊的帳號直接回答已存在，其餘再用一個走唯一索引的查詢確認
+#   - 其他 worker 新增的帳號：最多每 USERNAME_INDEX_REFRESH_SECONDS 秒以 id > 上次最大值 補進來
+import os
+import math
+import hashlib
+import logging
+import threading
+import time
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models import User
+
+USERNAME_INDEX_ERROR_RATE = float(os.getenv("USERNAME_INDEX_ERROR_RATE", "0.01"))
+USERNAME_INDEX_REFRESH_SECONDS = float(os.getenv("USERNAME_INDEX_REFRESH_SECONDS", "5"))
+# 最近註冊的帳號保留幾筆
+RECENT_LIMIT = 1000
+
+
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float = USERNAME_INDEX_ERROR_RATE):
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str):
+        # double hashing：一次 blake2b 拆成兩個 64-bit 值，組出 k 個位置
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def add(self, item: str):
+        for p in self._positions(item):
+            self.bits[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self._positions(item))
+
+
+class UsernameIndex:
+    def __init__(self, session_factory=SessionLocal, refresh_seconds: float = USERNAME_INDEX_REFRESH_SECONDS):
+        self.session_factory = session_factory
+        self.refresh_seconds = refresh_seconds
+        self.ready = False
+        self.db_lookups = 0
+        self.skipped_lookups = 0
+        self._bloom = BloomFilter(1024)
+        self._recent = {}   # "u:<username>" / "e:<email>" → True，依加入順序保留最近 RECENT_LIMIT 筆
+        self._last_id = 0
+        self._last_refresh = 0.0
+        self._lock = threading.Lock()
+        self._rebuilding = False
+
+    # ---------- 建立 / 更新 ----------
+    def build(self):
+        """啟動時讀入所有帳號；每位使用者有 username、email 兩個 key，容量取目前 key 數的兩倍，預留成長空間。"""
+        db = self.session_factory()
+        try:
+            users, emails = db.query(func.count(User.id), func.count(User.email)).one()
+            bloom = BloomFilter(max(1024, (users + emails) * 2))
+            last_id = 0
+            for user_id, username, email in db.query(User.id, User.username, User.email).yield_per(5000):
+                bloom.add(f"u:{username}")
+                if email:
+                    bloom.add(f"e:{email}")
+                last_id = max(last_id, user_id)
+        finally:
+            db.close()
+        with self._lock:
+            # 建立期間本 worker 新註冊的帳號可能不在查詢結果裡，補進新的 filter
+            for key in self._recent:
+                if key not in bloom:
+                    bloom.add(key)
+            self._bloom = bloom
+            self._last_id = max(self._last_id, last_id)
+            self._last_refresh = time.monotonic()
+            self.ready = True
+        logging.info(f"帳號索引建立完成：{users} 筆")
+
+    def _rebuild(self):
+        try:
+            self.build()
+        except Exception as e:
+            # 重建失敗時沿用舊的 filter（只是誤判率較高），下次超過容量再試
+            logging.error(f"帳號索引重建失敗：{e}")
+        finally:
+            self._rebuilding = False
+
+    def add(self, username: str, email: str = None, user_id: int = None):
+        with self._lock:
+            for key in (f"u:{username}", f"e:{email}" if email else None):
+                if key is None:
+                    continue
+                self._bloom.add(key)
+                self._recent[key] = True
+                if len(self._recent) > RECENT_LIMIT:
+                    self._recent.pop(next(iter(self._recent)))
+            if user_id:
+                self._last_id = max(self._last_id, user_id)
+            # 超過設計容量後誤判率上升：在背景重建一份更大的，不拖慢註冊請求
+            rebuild = self._bloom.count > self._bloom.capacity and not self._rebuilding
+            if rebuild:
+                self._rebuilding = True
+        if rebuild:
+            threading.Thread(target=self._rebuild, name="username-index-rebuild", daemon=True).start()
+
+    def _refresh(self):
+        """補進其他 worker 新增的帳號（只查 id 大於上次最大值的列）。"""
+        now = time.monotonic()
+        if now - self._last_refresh < self.refresh_seconds:
+            return
+        self._last_refresh = now
+        db = self.session_factory()
+        try:
+            rows = db.query(User.id, User.username, User.email).filter(User.id > self._last_id).all()
+        finally:
+            db.close()
+        for row in rows:
+            self.add(row.username, row.email, row.id)
+
+    # ---------- 查詢 ----------
+    def _exists(self, key: str, db: Session, column, value: str) -> bool:
+        if not self.ready:
+            self.db_lookups += 1
+            return db.query(User.id).filter(column == value).first() is not None
+        try:
+            self._refresh()
+        except Exception as e:
+            logging.error(f"帳號索引更新失敗：{e}")
+        with self._lock:
+            if key not in self._bloom:
+                self.skipped_lookups += 1
+                return False
+            if key in self._recent:
+                self.skipped_lookups += 1
+                return True
+        self.db_lookups += 1
+        return db.query(User.id).filter(column == value).first() is not None
+
+    def username_exists(self, db: Session, username: str) -> bool:
+        return self._exists(f"u:{username}", db, User.username, username)
+
+    def email_exists(self, db: Session, email: str) -> bool:
+        return self._exists(f"e:{email}", db, User.email, email)
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "entries": self._bloom.count,
+            "capacity": self._bloom.capacity,
+            "bits": self._bloom.size,
+            "hash_count": self._bloom.hash_count,
+            "db_lookups": self.db_lookups,
+            "skipped_lookups": self.skipped_lookups,
+        }
+
+
+index = UsernameIndex()
@@ -0,0 +1,111 @@
+# venue_catalog.py
+# 場地清單（id、名稱、容量、是否開放、備註）的行程內快取。
+# 場地幾乎不會變動：LINE bot 每則訊息都要比對場地名稱，改由記憶體回答，不再查資料庫。
+#   - 過期（VENUE_CATALOG_TTL 秒）後下一次讀取時重新載入
+#   - 修改場地後呼叫 invalidate()，其他 worker 最慢 TTL 後更新
+import os
+import time
+import logging
+import threading
+from typing import NamedTuple, Optional
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+from database import engine
+
+VENUE_CATALOG_TTL = float(os.getenv("VENUE_CATALOG_TTL", "600"))
+
+
+class VenueInfo(NamedTuple):
+    id: int
+    name: str
+    capacity: int
+    is_open: bool
+    remarks: str
+
+
+class Catalog:
+    """某個時間點的場地清單快照；建立後不再修改，可在多個 thread 間共用。"""
+
+    def __init__(self, venues):
+        self.venues = sorted(venues, key=lambda v: v.id)
+        self.by_id = {v.id: v for v in self.venues}
+        self.by_name = {v.name: v for v in self.venues}
+        self.loaded_at = time.monotonic()
+
+
+def _load() -> Catalog:
+    with engine.connect() as conn:
+        try:
+            rows = conn.execute(text("""
+                SELECT id, name, capacity,
+                       COALESCE(remarks, '無特殊備註') AS remarks,
+                       COALESCE(is_open, TRUE) AS is_open
+                FROM venues
+            """)).all()
+        except DBAPIError:
+            # remarks / is_open 不在 ORM model 裡，新建的資料庫可能沒有這兩個欄位
+            conn.rollback()
+            rows = [
+                (r.id, r.name, r.capacity, "無特殊備註", True)
+                for r in conn.execute(text("SELECT id, name, capacity FROM venues")).all()
+            ]
+    return Catalog(
+        VenueInfo(id=r[0], name=r[1], capacity=r[2], remarks=r[3], is_open=bool(r[4]))
+        for r in rows
+    )
+
+
+class VenueCatalogCache:
+    def __init__(self, ttl: float = VENUE_CATALOG_TTL, loader=_load):
+        self.ttl = ttl
+        self.loader = loader
+        self.loads = 0
+        self._catalog: Optional[Catalog] = None
+        self._lock = threading.Lock()
+
+    def get(self) -> Catalog:
+        catalog = self._catalog
+        if catalog is not None and time.monotonic() - catalog.loaded_at < self.ttl:
+            return catalog
+        with self._lock:
+            # 等鎖期間可能已經有其他 thread 載入完成
+            catalog = self._catalog
+            if catalog is None or time.monotonic() - catalog.loaded_at >= self.ttl:
+                try:
+                    catalog = self.loader()
+                    self.loads += 1
+                except Exception as e:
+                    if catalog is None:
+                        raise
+                    # 資料庫暫時有問題時先用舊的清單
+                    logging.error(f"場地清單重新載入失敗，沿用舊資料：{e}")
+                    catalog.loaded_at = time.monotonic()
+                self._catalog = catalog
+        return catalog
+
+    def invalidate(self):
+        self._catalog = None
+
+    # ---------- 常用查詢 ----------
+    def all(self):
+        return self.get().venues
+
+    def by_id(self, venue_id: int) -> Optional[VenueInfo]:
+        return self.get().by_id.get(venue_id)
+
+    def by_name(self, name: str) -> Optional[VenueInfo]:
+        return self.get().by_name.get(name)
+
+    def stats(self) -> dict:
+        catalog = self._catalog
+        return {
+            "venues": len(catalog.venues) if catalog else 0,
+            "age_seconds": round(time.monotonic() - catalog.loaded_at, 1) if catalog else None,
+            "ttl": self.ttl,
+            "loads": self.loads,
+        }
+
+
+catalog = VenueCatalogCache()